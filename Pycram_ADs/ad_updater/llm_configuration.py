@@ -1,3 +1,4 @@
+import os
 from langchain_openai import ChatOpenAI
 from dotenv import load_dotenv, find_dotenv
 load_dotenv(find_dotenv(), override=True)
@@ -10,7 +11,15 @@ load_dotenv(find_dotenv(), override=True)
 from langchain_ollama.llms import OllamaLLM
 from langchain_ollama import ChatOllama
 
-ollama_llm = ChatOllama(model="qwen3:8b")
+from .src.llm_client import ServiceChatOllama, llm_latency
+from .src.llm_cassette import cassette_from_env
+from .src.llm_hedging import hedge_from_env
+
+# LLM_CASSETTE_MODE=record|replay captures or serves every LLM call of the service,
+# LLM_HEDGE_BASE_URL / LLM_HEDGE_MODEL duplicate slow calls to a secondary backend
+# OLLAMA_KEEP_ALIVE keeps the models loaded between requests (Ollama unloads idle models after 5m by default)
+ollama_llm = ServiceChatOllama(model="qwen3:8b", keep_alive=os.getenv("OLLAMA_KEEP_ALIVE", "30m"),
+                               cassette=cassette_from_env(), hedge=hedge_from_env("qwen3:8b", llm_latency))
 # ollama_llm = ChatOllama(model="qwen3:4b")
 
 # ollama_llm = ChatOllama(model="gemma3:4b")
\ No newline at end of file
@@ -1,72 +1,546 @@
+import gc
+import math
+import os
+from functools import partial
 from flask import Flask, request, jsonify
 from .src.sv_graph import *
+from .src.single_flight import SingleFlight, canonical_request_hash
+from .src.job_queue import JobQueue
+from .src.admission import AdmissionController, AdmissionRejected, PRIORITY_CLASSES
+from .src.failure_rules import record_failed_request, rule_based_candidates
+from .src.graph import FailureSolution, ParameterReasoner, ad_memory
+from .src.designator_normalizer import render_designator
+from .src.wire_format import (UnsupportedContentType, designator_from_json, designator_to_json, decode_request_body,
+                              encode_response_body)
+from .src.pycram_agent import Actions, pycram_memory
+from .src.request_profiler import RequestProfile, ProfileStore
+from .src.memory_diagnostics import MemoryTracker, checkpointer_stats, gc_object_counts, rss_bytes
+from .src.sv_graph import memory as supervisor_memory
+from .src.deadlines import DeadlineExceeded, deadline_after_ms, deadline_scope, deadline_stats
+from .src.llm_client import llm_latency
+from .src.structured_repair import repair_stats
+from .src.warmup import Readiness, preload_model, start_warmup, wait_for_backend
+from .src.concept_index import concept_index
+from .src.candidate_generator import outcome_history
+from .src.correction_history import correction_history, recording_paused
+from .src.incremental import node_cache, session_scope
+from .src.plan_graph import plan_grapher
+from .src.input_parser import parse_designator
+from .src.instruction_cache import instruction_cache
+from .src.instruction_parser import INSTRUCTION_PARSER, instruction_parser
+from .src.instruct_agent import human_instruction
+from .src.comment_intents import COMMENT_INTENTS, comment_candidate, comment_intent_stats
+from .src.frame_transforms import transform_tree
+from pydantic import BaseModel
 app = Flask(__name__)
 
+# Identical /update payloads arriving while the first one is still running share its result
+update_flight = SingleFlight()
+
+# Bounds concurrent pipeline runs and sheds low-value load before Ollama is saturated
+admission = AdmissionController(max_concurrency=int(os.getenv("ADMISSION_MAX_CONCURRENCY", "1")),
+                                max_predicted_latency=float(os.getenv("ADMISSION_MAX_LATENCY_S", "120")))
+
+# Known structured failures without a human comment are corrected by rules, without the LLM pipeline
+RULE_BASED_CORRECTIONS = os.getenv("RULE_BASED_CORRECTIONS", "1") == "1"
+RULE_CANDIDATES = int(os.getenv("RULE_CANDIDATES", "3"))
+
+# Profiles of requests sent with X-Profile: 1 (or ?profile=1), served by /debug/profiles
+profile_store = ProfileStore(max_profiles=int(os.getenv("PROFILE_STORE_SIZE", "50")))
+
+# tracemalloc diffs for /debug/memory, off unless MEMORY_TRACEMALLOC=1 or enabled at runtime
+memory_tracker = MemoryTracker()
+if os.getenv("MEMORY_TRACEMALLOC", "0") == "1":
+    memory_tracker.start()
+
 @app.route('/')
 def hello_world():
     return 'Hello, World!'
 
-@app.route('/update' , methods=['POST'])
-def update_designator():
+def rule_based_response(candidates, action_designator, correction_source='rules'):
+    best = candidates[0]
+    return {
+        'updated_action_designator': best.designator,
+        'model_failure_reasoning': FailureSolution(failure_reasons=best.reasons,
+                                                   solution=[best.solution]).model_dump_json(),
+        'parameters_updated': ParameterReasoner(updated_parameter_value=best.updated_parameters,
+                                                reason_parameter_value=[best.solution]).model_dump_json(),
+        'human_instruction': human_instruction(action_designator)['ad_instruction'],
+        'candidate_designators': [c.designator for c in candidates[:RULE_CANDIDATES]],
+        'correction_source': correction_source,
+        'plan_insertion': best.plan_insertion
+    }
+
+def local_correction(_action_designator, _reason_for_failure="", _human_comment="", plan_insertions=False):
+    """
+    Correction by the failure rules or, for comments that only ask for another arm, grasp, color or object,
+    by the comment rules. None when the request needs the LLM pipeline.
+
+    :param plan_insertions: whether the rules may answer with a step to insert after the failed one, which
+        only a plan correction can use
+    """
+    if not _human_comment and RULE_BASED_CORRECTIONS:
+        candidates = rule_based_candidates(_action_designator, _reason_for_failure, plan_insertions)
+        if candidates:
+            return rule_based_response(candidates, _action_designator)
+
+    if _human_comment and COMMENT_INTENTS:
+        candidate = comment_candidate(_action_designator, _human_comment)
+        if candidate:
+            return rule_based_response([candidate], _action_designator, correction_source='comment_rules')
+    return None
+
+def run_update_pipeline(_instruction, _action_designator, _reason_for_failure="", _human_comment=""):
+    """
+    Runs a correction (action_designator) or generation (instruction) request through sv_grapher.
+    """
+    # Model Invocation
+    _config = {"configurable": {"thread_id": 1}}
+
+    if not _instruction:
+        final_graph_state = sv_grapher.invoke(
+            {"action_designator": _action_designator, "reason_for_failure": _reason_for_failure,
+             "human_comment": _human_comment}, config=_config, stream_mode="updates")
+        model_failure_reasoning = sv_grapher.get_state(_config).values["failure_reasons_solutions"]
+        parameters_updated = sv_grapher.get_state(_config).values["update_parameters_reasons"]
+        updated_action_designator = sv_grapher.get_state(_config).values["updated_action_designator"]
+
+        human_instruction_dict = sv_grapher.get_state(config=_config).values['human_instruction']
+        human_instruction = human_instruction_dict.get('ad_instruction', "")
+
+        model_response = {
+            'updated_action_designator': updated_action_designator,
+            'model_failure_reasoning': model_failure_reasoning,
+            'parameters_updated': parameters_updated,
+            'human_instruction': human_instruction
+        }
+    else:
+        final_graph_state = sv_grapher.invoke({"instruction" : _instruction}, config = _config,stream_mode="updates")
+        updated_action_designator = sv_grapher.get_state(_config).values["updated_action_designator"]
+        model_response = {
+            'updated_action_designator': updated_action_designator
+        }
+
+    return model_response
+
+def run_plan_pipeline(_plan, _failed_index, _reason_for_failure="", _human_comment="", _local_response=None):
+    """
+    Corrects the failing step of a plan through plan_grapher and carries its object, arm and pose changes
+    over to the later steps. With a local_correction response for the failed step, only the local
+    propagation runs. A plan_insertion response adds its step after the failed one instead.
+    """
+    plan_input = {"plan": _plan, "failed_index": _failed_index, "reason_for_failure": _reason_for_failure,
+                  "human_comment": _human_comment, "updated_action_designator": "", "insert_after_failed": False}
+    correction_source = 'llm'
+
+    if _local_response is not None:
+        plan_input.update(updated_action_designator=_local_response['updated_action_designator'],
+                          failure_reasons_solutions=_local_response['model_failure_reasoning'],
+                          update_parameters_reasons=_local_response['parameters_updated'],
+                          ad_human_instruction={'ad_instruction': _local_response['human_instruction']},
+                          insert_after_failed=_local_response['plan_insertion'])
+        correction_source = _local_response['correction_source']
+
+    final_plan_state = plan_grapher.invoke(plan_input)
+    corrected_index = _failed_index + 1 if plan_input['insert_after_failed'] else _failed_index
+
+    return {
+        'updated_plan': final_plan_state['updated_plan'],
+        'updated_action_designator': final_plan_state['updated_plan'][corrected_index],
+        'inserted_index': corrected_index if plan_input['insert_after_failed'] else None,
+        'model_failure_reasoning': final_plan_state.get('failure_reasons_solutions', ""),
+        'parameters_updated': final_plan_state.get('update_parameters_reasons', ""),
+        'human_instruction': (final_plan_state.get('ad_human_instruction') or {}).get('ad_instruction', ""),
+        'propagated_changes': final_plan_state['propagated_changes'],
+        'correction_source': correction_source
+    }
+
+def format_designator(designator, as_json):
+    """Python-source string (default) or typed JSON form of a pipeline output designator."""
+    if isinstance(designator, Actions):
+        return [designator_to_json(model) for model in designator.models] if as_json else str(designator)
+    if isinstance(designator, BaseModel):
+        return designator_to_json(designator) if as_json else render_designator(designator)
+    return str(designator)
+
+def format_model_response(model_response, as_json):
+    formatted = dict(model_response)
+    formatted['updated_action_designator'] = format_designator(model_response['updated_action_designator'], as_json)
+    if 'candidate_designators' in model_response:
+        formatted['candidate_designators'] = [format_designator(d, as_json) for d in model_response['candidate_designators']]
+    if 'updated_plan' in model_response:
+        formatted['updated_plan'] = [format_designator(d, as_json) for d in model_response['updated_plan']]
+    return formatted
+
+def partial_model_response(completed):
+    """Response fields available from the graph state computed before a missed deadline."""
+    return {
+        'updated_action_designator': completed.get('updated_action_designator', ""),
+        'model_failure_reasoning': completed.get('failure_reasons_solutions', ""),
+        'parameters_updated': completed.get('update_parameters_reasons', ""),
+        'human_instruction': (completed.get('ad_human_instruction') or {}).get('ad_instruction', "")
+    }
+
+def run_admitted_pipeline(priority_class, deadline, shed, session_id, *pipeline_args, pipeline=run_update_pipeline):
+    # The deadline is checked again before every LLM call made by the graph nodes, the session lets them
+    # reuse outputs of earlier requests of the same session
+    with admission.admit(priority_class, deadline=deadline, shed=shed), deadline_scope(deadline), \
+            session_scope(session_id):
+        return pipeline(*pipeline_args)
+
+def formatted_deadline_exceeded(e, as_json):
+    deadline_stats.add("exceeded_requests")
+    # Coalesced callers share e, so the formatted partial goes into a new exception
+    exceeded = DeadlineExceeded(e.reason)
+    exceeded.partial = format_model_response(partial_model_response(e.partial), as_json)
+    return exceeded
+
+def process_update_request(data, priority_class=None, deadline=None, shed=True, session_id=None):
+    """
+    Validates an /update payload and runs it, sharing the run with identical in-flight payloads.
+
+    :param priority_class: admission class, derived from the request type if not given
+    :param deadline: absolute time.time() after which the caller no longer needs the result, defaults to
+        the payload's deadline_ms
+    :param shed: whether the request may be rejected under overload instead of waiting
+    :param session_id: session of follow-up requests for the same designator, defaults to the payload's session_id
+    :raises DeadlineExceeded: with the formatted partial response, when the deadline is missed
+    """
+    # Extract parameters
+    _instruction = data.get('instruction')
+    _action_designator = data.get('action_designator')
+    _reason_for_failure = data.get('reason_for_failure',"")
+    _human_comment = data.get('human_comment',"")
+
+    # Validate required fields
+    if not _instruction and not _action_designator:
+        raise ValueError('action_designator/instruction is required')
+    if priority_class is None:
+        priority_class = "instruction" if _instruction else "correction"
+    if deadline is None:
+        deadline = deadline_after_ms(data.get('deadline_ms'))
+    if session_id is None:
+        session_id = data.get('session_id')
+
+    # Designators sent as typed JSON are answered in typed JSON as well
+    as_json = data.get('format') == 'json' or isinstance(_action_designator, dict)
+
+    request_key = canonical_request_hash({
+        'instruction': _instruction,
+        'action_designator': _action_designator,
+        'reason_for_failure': _reason_for_failure,
+        'human_comment': _human_comment,
+        'session_id': session_id
+    })
+    if isinstance(_action_designator, dict):
+        _action_designator = designator_from_json(_action_designator)
+    if isinstance(_reason_for_failure, dict):
+        _reason_for_failure = designator_from_json(_reason_for_failure)
+
+    # Rule and comment corrections, common command shapes and repeated instructions are answered locally,
+    # without waiting for admission behind LLM requests
+    if not _instruction:
+        local_response = local_correction(_action_designator, _reason_for_failure, _human_comment)
+        if local_response is not None:
+            record_failed_request(_action_designator, _reason_for_failure)
+            return format_model_response(local_response, as_json)
+    if _instruction and INSTRUCTION_PARSER:
+        parsed_actions = instruction_parser.parse_confident(_instruction)
+        if parsed_actions is not None:
+            return format_model_response({'updated_action_designator': parsed_actions,
+                                          'instruction_source': 'parser'}, as_json)
+    if _instruction:
+        cached_actions = instruction_cache.get_actions(_instruction)
+        if cached_actions is not None:
+            return format_model_response({'updated_action_designator': cached_actions}, as_json)
+
     try:
-        # Get data from request (works with JSON or form-data)
-        data = request.get_json() if request.is_json else request.form
-
-        # Extract parameters
-        _instruction = data.get('instruction')
-        _action_designator = data.get('action_designator')
-        _reason_for_failure = data.get('reason_for_failure',"")
-        _human_comment = data.get('human_comment',"")
-
-        # Validate required fields
-        # if not _action_designator:
-        #     return jsonify({'error': 'action_designator is required'}), 400
-
-        # Process the data (here we just echo it back)
-        # parsed_response = {
-        #     'status': 'success',
-        #     'data': {
-        #         'action_designator': action_designator,
-        #         'reason_for_failure': reason_for_failure,
-        #         'human_comment': human_comment
-        #     }
-        # }
-
-        # Model Invocation
-        _config = {"configurable": {"thread_id": 1}}
-
-        if not _instruction:
-            if not _action_designator:
-                return jsonify({'error': 'action_designator/instruction is required'}), 400
+        model_response, coalesced = update_flight.do(request_key, run_admitted_pipeline, priority_class, deadline,
+                                                     shed, session_id, _instruction, _action_designator,
+                                                     _reason_for_failure, _human_comment, deadline=deadline)
+    except DeadlineExceeded as e:
+        raise formatted_deadline_exceeded(e, as_json) from e
+    # The outcome history counts each failure once, coalesced duplicates were counted by their leader
+    if coalesced:
+        print(f"Coalesced duplicate request {request_key[:12]}")
+    elif not _instruction:
+        record_failed_request(_action_designator, _reason_for_failure)
+    return format_model_response(model_response, as_json)
+
+def process_plan_request(data, priority_class=None, deadline=None, shed=True, session_id=None):
+    """
+    Validates an /update_plan payload and runs it, like process_update_request.
+
+    The payload holds the ordered plan (designator strings or typed JSON), the failed_index of the step
+    that failed, and optionally reason_for_failure, human_comment, deadline_ms, session_id and format.
+    """
+    _plan = data.get('plan')
+    _failed_index = data.get('failed_index')
+    _reason_for_failure = data.get('reason_for_failure', "")
+    _human_comment = data.get('human_comment', "")
+
+    if not isinstance(_plan, list) or not _plan:
+        raise ValueError('plan must be a non-empty list of action designators')
+    if isinstance(_failed_index, bool) or not isinstance(_failed_index, int) or not 0 <= _failed_index < len(_plan):
+        raise ValueError(f'failed_index must be an index into plan (0 to {len(_plan) - 1})')
+    if deadline is None:
+        deadline = deadline_after_ms(data.get('deadline_ms'))
+    if session_id is None:
+        session_id = data.get('session_id')
+
+    as_json = data.get('format') == 'json' or any(isinstance(step, dict) for step in _plan)
+
+    request_key = canonical_request_hash({
+        'plan': _plan,
+        'failed_index': _failed_index,
+        'reason_for_failure': _reason_for_failure,
+        'human_comment': _human_comment,
+        'session_id': session_id
+    })
+    _plan = [designator_from_json(step) if isinstance(step, dict) else step for step in _plan]
+    for step in _plan:
+        parse_designator(step)
+    if isinstance(_reason_for_failure, dict):
+        _reason_for_failure = designator_from_json(_reason_for_failure)
+
+    # The propagation after a local correction needs no LLM, so it does not wait for admission either
+    local_response = local_correction(_plan[_failed_index], _reason_for_failure, _human_comment, plan_insertions=True)
+    if local_response is not None:
+        record_failed_request(_plan[_failed_index], _reason_for_failure)
+        return format_model_response(run_plan_pipeline(_plan, _failed_index, _reason_for_failure, _human_comment,
+                                                       local_response), as_json)
+    try:
+        model_response, coalesced = update_flight.do(request_key, run_admitted_pipeline,
+                                                     priority_class or "correction", deadline, shed, session_id,
+                                                     _plan, _failed_index, _reason_for_failure, _human_comment,
+                                                     pipeline=run_plan_pipeline, deadline=deadline)
+    except DeadlineExceeded as e:
+        raise formatted_deadline_exceeded(e, as_json) from e
+    if coalesced:
+        print(f"Coalesced duplicate plan request {request_key[:12]}")
+    else:
+        record_failed_request(_plan[_failed_index], _reason_for_failure)
+    return format_model_response(model_response, as_json)
+
+def run_job(payload):
+    # Queued jobs never get shed, they wait behind interactive requests instead
+    return process_update_request(payload, priority_class="batch", shed=False)
+
+# Queued /jobs requests are drained through the same path as /update. Callbacks only go to the hosts
+# listed in JOB_CALLBACK_HOSTS (comma separated, wildcards allowed)
+job_queue = JobQueue(os.getenv("JOB_QUEUE_PATH", "jobs.sqlite3"), handler=run_job,
+                     num_workers=int(os.getenv("JOB_WORKERS", "1")),
+                     lease=float(os.getenv("JOB_LEASE_S", "60")),
+                     callback_hosts=[host.strip() for host in os.getenv("JOB_CALLBACK_HOSTS", "").split(",")
+                                     if host.strip()])
+
+# Canned requests run once at startup, so the first real request does not pay for model loading,
+# schema generation and first-call costs
+WARMUP_DESIGNATOR = ("PickUpAction(object_designator=Object(name='Cup',concept='Cup', color='blue'), arm=Arms.LEFT, "
+                     "grasp_description=GraspDescription(approach_direction=Grasp.TOP,vertical_alignment=Grasp.TOP, "
+                     "rotate_gripper=True))")
+WARMUP_FAILURE = "object was not grasped"
+# Not understood by the local comment rules, so the correction step really runs the LLM graphs
+WARMUP_COMMENT = "the cup is slippery, hold it more firmly"
+WARMUP_INSTRUCTION = "pick the cup from the table"
+
+readiness = Readiness()
+
+def run_warmup_request(*pipeline_args):
+    # Admitted like a queued job, so the canned runs never overlap real requests on the shared graph thread,
+    # and kept out of the correction history
+    with recording_paused():
+        return run_admitted_pipeline("batch", None, False, None, *pipeline_args)
+
+def warmup_steps():
+    """Waits for every configured Ollama backend and loads its model, then runs the canned requests."""
+    steps = []
+    replaying = ollama_llm.cassette is not None and ollama_llm.cassette.mode == "replay"
+    if not replaying:
+        backends = [(ollama_llm.base_url, ollama_llm.model)]
+        if ollama_llm.hedge is not None:
+            backends.append((ollama_llm.hedge.backend.base_url, ollama_llm.hedge.backend.model))
+        timeout = float(os.getenv("WARMUP_TIMEOUT_S", "300"))
+        for base_url, model in backends:
+            steps.append((f"wait for {base_url or 'ollama'}", partial(wait_for_backend, base_url, timeout), True))
+            steps.append((f"load {model}", partial(preload_model, base_url, model, ollama_llm.keep_alive), True))
+    steps.append(("correction request", partial(run_warmup_request, "", WARMUP_DESIGNATOR, WARMUP_FAILURE,
+                                                WARMUP_COMMENT), False))
+    steps.append(("instruction request", partial(run_warmup_request, WARMUP_INSTRUCTION, ""), False))
+    return steps
+
+# The job workers start once the warm-up is over, so queued jobs do not compete with it
+if os.getenv("WARMUP", "1") == "1":
+    start_warmup(readiness, warmup_steps(), on_finished=job_queue.start)
+else:
+    readiness.mark_ready()
+    job_queue.start()
+
+def serve_update_request(process_request):
+    """Decodes the request body and headers, runs process_request and encodes its answer or error."""
+    try:
+        # Get data from request (works with JSON, msgpack or form-data)
+        try:
+            data = decode_request_body(request.content_type, request.get_data())
+        except UnsupportedContentType as e:
+            return jsonify({'error': str(e)}), 415
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        if data is None:
+            data = request.form
+
+        priority_class = request.headers.get('X-Priority')
+        if priority_class is not None and priority_class not in PRIORITY_CLASSES:
+            return jsonify({'error': f'X-Priority must be one of {list(PRIORITY_CLASSES)}'}), 400
+        try:
+            deadline = deadline_after_ms(request.headers.get('X-Deadline-Ms'), 'X-Deadline-Ms')
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        session_id = request.headers.get('X-Session-Id')
+
+        profile = None
+        if request.headers.get('X-Profile') == '1' or request.args.get('profile') == '1':
+            profile = RequestProfile()
+            profile_store.add(profile)
+
+        try:
+            if profile is None:
+                model_response = process_request(data, priority_class=priority_class, deadline=deadline,
+                                                 session_id=session_id)
             else:
-                final_graph_state = sv_grapher.invoke(
-                    {"action_designator": _action_designator, "reason_for_failure": _reason_for_failure,
-                     "human_comment": _human_comment}, config=_config, stream_mode="updates")
-                model_failure_reasoning = sv_grapher.get_state(_config).values["failure_reasons_solutions"]
-                parameters_updated = sv_grapher.get_state(_config).values["update_parameters_reasons"]
-                updated_action_designator = sv_grapher.get_state(_config).values["updated_action_designator"]
-
-                human_instruction_dict = sv_grapher.get_state(config=_config).values['human_instruction']
-                human_instruction = human_instruction_dict.get('ad_instruction', "")
-
-                model_response = {
-                    'updated_action_designator': str(updated_action_designator),
-                    'model_failure_reasoning': model_failure_reasoning,
-                    'parameters_updated': parameters_updated,
-                    'human_instruction': human_instruction
-                }
-        else:
-            final_graph_state = sv_grapher.invoke({"instruction" : _instruction}, config = _config,stream_mode="updates")
-            updated_action_designator = sv_grapher.get_state(_config).values["updated_action_designator"]
-            model_response = {
-                'updated_action_designator': str(updated_action_designator)
-            }
-
-
-        return jsonify(model_response), 200
+                model_response = profile.run(process_request, data, priority_class=priority_class,
+                                             deadline=deadline, session_id=session_id)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        except AdmissionRejected as e:
+            response = jsonify({'error': e.reason})
+            response.headers['Retry-After'] = str(max(1, math.ceil(e.retry_after)))
+            return response, e.status_code
+        except DeadlineExceeded as e:
+            return jsonify({'error': f'deadline exceeded: {e.reason}', 'partial': e.partial}), 504
+
+        body, mimetype = encode_response_body(model_response, request.headers.get('Accept'))
+        response = app.response_class(body, status=200, mimetype=mimetype)
+        if profile is not None:
+            response.headers['X-Profile-Id'] = profile.id
+        return response
 
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/update' , methods=['POST'])
+def update_designator():
+    return serve_update_request(process_update_request)
+
+@app.route('/update_plan', methods=['POST'])
+def update_plan():
+    """Corrects the failed step of a plan and the steps after it that depend on it."""
+    return serve_update_request(process_plan_request)
+
+@app.route('/jobs', methods=['POST'])
+def submit_job():
+    try:
+        data = decode_request_body(request.content_type, request.get_data())
+    except UnsupportedContentType as e:
+        return jsonify({'error': str(e)}), 415
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if data is None:
+        data = request.form
+    payload = {key: data.get(key) for key in ('instruction', 'action_designator', 'reason_for_failure', 'human_comment',
+                                              'format', 'session_id')
+               if data.get(key) is not None}
+    if not payload.get('instruction') and not payload.get('action_designator'):
+        return jsonify({'error': 'action_designator/instruction is required'}), 400
+
+    try:
+        job_id = job_queue.submit(payload, callback_url=data.get('callback_url'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'job_id': job_id, 'status': 'queued'}), 202
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({'error': f'unknown job {job_id}'}), 404
+    return jsonify(job), 200
+
+@app.route('/ready', methods=['GET'])
+def ready():
+    """Readiness probe: 200 once the warm-up has finished, 503 before (or if it failed)."""
+    return jsonify(readiness.snapshot()), 200 if readiness.ready else 503
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    return jsonify({'single_flight': update_flight.stats(), 'jobs': job_queue.stats(),
+                    'admission': admission.stats(), 'deadlines': deadline_stats.stats(),
+                    'llm_latency': llm_latency.stats(),
+                    'llm_hedging': ollama_llm.hedge.stats() if ollama_llm.hedge is not None else None,
+                    'structured_repair': repair_stats.stats(),
+                    'correction_history': correction_history.stats(),
+                    'sessions': node_cache.stats(),
+                    'instruction_cache': instruction_cache.stats(),
+                    'instruction_parser': instruction_parser.stats(),
+                    'comment_intents': comment_intent_stats.stats(),
+                    'frame_transforms': transform_tree.stats()}), 200
+
+@app.route('/debug/profiles', methods=['GET'])
+def list_profiles():
+    return jsonify(profile_store.list()), 200
+
+@app.route('/debug/profiles/<profile_id>', methods=['GET'])
+def get_profile(profile_id):
+    """
+    Summary and pstats listing of a profiled request. ?format=pstats returns the raw stats
+    (as written by cProfile's dump_stats), ?sort= picks the pstats sort key.
+    """
+    profile = profile_store.get(profile_id)
+    if profile is None or profile.stats is None:
+        return jsonify({'error': f'unknown profile {profile_id}'}), 404
+    if request.args.get('format') == 'pstats':
+        return app.response_class(profile.pstats_dump(), mimetype='application/octet-stream',
+                                  headers={'Content-Disposition': f'attachment; filename={profile_id}.prof'})
+    try:
+        listing = profile.pstats_text(sort=request.args.get('sort', 'cumulative'))
+    except KeyError as e:
+        return jsonify({'error': f'unknown sort key {e}'}), 400
+    return jsonify({**profile.summary(), 'pstats': listing}), 200
+
+@app.route('/debug/memory', methods=['GET'])
+def debug_memory():
+    """
+    RSS, checkpoint and cache sizes, and tracemalloc growth if tracing. ?objects=1 adds the most
+    common live object types (walks the whole heap).
+    """
+    cassette = ollama_llm.cassette
+    report = {
+        'rss_bytes': rss_bytes(),
+        'gc': {'counts': gc.get_count(), 'tracked_objects': len(gc.get_objects())},
+        'checkpointers': {'supervisor': checkpointer_stats(supervisor_memory),
+                          'correction_graph': checkpointer_stats(ad_memory),
+                          'pycram_agent': checkpointer_stats(pycram_memory)},
+        'caches': {'concept_resolve': concept_index.resolve.cache_info()._asdict(),
+                   'profiles': len(profile_store),
+                   'outcome_history': outcome_history.stats(),
+                   'llm_cassette': cassette.stats() if cassette is not None else None,
+                   'single_flight': update_flight.stats(),
+                   'instruction_cache': instruction_cache.stats()},
+        'tracemalloc': memory_tracker.report(limit=int(request.args.get('limit', 15))),
+    }
+    if request.args.get('objects') == '1':
+        report['gc']['most_common_types'] = gc_object_counts()
+    return jsonify(report), 200
+
+@app.route('/debug/memory/tracemalloc', methods=['POST'])
+def toggle_tracemalloc():
+    data = request.get_json(silent=True) or {}
+    if data.get('enabled', True):
+        memory_tracker.start()
+    else:
+        memory_tracker.stop()
+    return jsonify({'tracing': memory_tracker.tracing}), 200
+
 if __name__ == '__main__':
-    app.run(debug=True, host='0.0.0.0', port=5001)
\ No newline at end of file
+    # No reloader: it imports this module in a second process, with its own job workers and warm-up
+    app.run(debug=True, use_reloader=False, host='0.0.0.0', port=5001)
@@ -1,3 +1,4 @@
+import re
 from dataclasses import field
 
 from pydantic import BaseModel, Field
@@ -426,3 +427,77 @@ class SearchAction(ActionDescription):
     action_type :str = "SearchAction"
     target_location: PoseStampedModel = Field(description="Location around which to look for a target object.")
     object_type: str = Field(description="SOMA - PhysicalObject concept of the object which is searched for.")
+
+
+########### === Instruction Templates === ###########
+
+# Human-readable instruction per action, each {field} is replaced by the phrase for that field's value
+INSTRUCTION_TEMPLATES = {
+    "PickUpAction": "Pick up {object_designator} with {arm}",
+    "PlaceAction": "Place {object_designator} at {target_location} with {arm}",
+    "NavigateAction": "Go to {target_location}",
+    "SetGripperAction": "{motion} the gripper of {gripper}",
+    "LookAtAction": "Look at {target}",
+    "MoveTorsoAction": "Move the torso {torso_state}",
+    "GripAction": "Grip {object_designator} with the gripper of {gripper}",
+    "ParkArmsAction": "Park {arm}",
+    "MoveAndPickUpAction": "Go to {standing_position} and pick up {object_designator} with {arm}",
+    "MoveAndPlaceAction": "Go to {standing_position} and place {object_designator} at {target_location} with {arm}",
+    "OpenAction": "Open {object_designator} with {arm}",
+    "CloseAction": "Close {object_designator} with {arm}",
+    "GraspingAction": "Grasp {object_designator} with {arm}",
+    "ReachToPickUpAction": "Reach for {object_designator} with {arm}",
+    "TransportAction": "Bring {object_designator} to {target_location} with {arm}",
+    "SearchAction": "Search for the {object_type} around {target_location}",
+    "FaceAtAction": "Face {pose}",
+    "DetectAction": "Detect {object_designator}",
+}
+
+
+def _words(name: str) -> str:
+    return re.sub(r"(?<=[a-z])(?=[A-Z])", " ", str(name)).replace("_", " ").lower()
+
+
+def _number(value: float) -> str:
+    return f"{value:g}"
+
+
+def instruction_phrase(value) -> str:
+    """Phrase for a designator field value: "the blue cup", "the left arm", "the table", "(1, 2, 0)"."""
+    if value is None:
+        return "the object"
+    if isinstance(value, Object):
+        name = _words(value.name)
+        color = f"{value.color.lower()} " if value.color and value.color.lower() not in name else ""
+        return f"the {color}{name}"
+    if isinstance(value, Arms):
+        return "both arms" if value == Arms.BOTH else f"the {value.name.lower()} arm"
+    if isinstance(value, GripperState):
+        return value.name.capitalize()
+    if isinstance(value, TorsoState):
+        return {"HIGH": "up", "MID": "to the middle", "LOW": "down"}[value.name]
+    if isinstance(value, PoseStamped):
+        position = value.pose.position.to_list()
+        frame = value.header.frame_id
+        # A pose at the origin of a named frame is that place ("the table")
+        if frame != "map" and not any(position):
+            return f"the {_words(frame)}"
+        in_frame = f" in the {_words(frame)} frame" if frame != "map" else ""
+        return f"({', '.join(_number(p) for p in position)}){in_frame}"
+    if isinstance(value, PoseStampedModel):
+        return f"({', '.join(_number(p) for p in value.position)})"
+    if isinstance(value, Enum):
+        return value.name.lower()
+    return _words(value)
+
+
+def render_instruction(designator: BaseModel) -> str:
+    """
+    Instruction for a designator from INSTRUCTION_TEMPLATES, e.g. "Pick up the blue cup with the left arm."
+    Returns "" for actions without a template.
+    """
+    template = INSTRUCTION_TEMPLATES.get(getattr(designator, "action_type", type(designator).__name__))
+    if template is None:
+        return ""
+    fields = re.findall(r"{(\w+)}", template)
+    return template.format(**{name: instruction_phrase(getattr(designator, name, None)) for name in fields}) + "."
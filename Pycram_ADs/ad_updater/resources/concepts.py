@@ -0,0 +1,42 @@
+Concepts = [
+    "World", "Floor", "Milk", "Robot", "Cereal", "Kitchen", "Food", "Fruit", "Apple",
+    "Environment", "Apartment", "Cup", "Spoon", "Bowl", "PreferredGraspAlignment",
+    "XAxis", "YAxis", "NoAlignment", "Truthy", "Falsy", "Cabinet", "Washer",
+    "Drawer", "Refrigerator", "Sink", "Door", "Cutting", "Pouring", "Handle", "Link",
+    "PhysicalObject", "PouringTool", "CuttingTool", "MixingTool", "Agent", "Human",
+    "Room", "Location", "Container", "Joint", "ContinuousJoint", "HingeJoint",
+    "FixedJoint", "MovableJoint", "FloatingJoint", "PlanarJoint", "PrismaticJoint",
+    "RevoluteJoint", "DesignedFurniture", "Surface", "PhysicalTask", "Action", "Event",
+    "Entity", "Task", "RootLink", "Supporter", "SupportedObject"
+]
+
+# Everyday words for objects mapped to the concept they should be stored as
+CONCEPT_SYNONYMS = {
+    "Cup": ["mug", "glass", "tumbler", "beaker", "teacup"],
+    "Bowl": ["dish", "basin"],
+    "Spoon": ["teaspoon", "tablespoon", "ladle"],
+    "Milk": ["milk carton", "milk box", "milk pack", "milk bottle"],
+    "Cereal": ["cereal box", "cornflakes", "muesli", "granola"],
+    "Apple": ["apples"],
+    "Fruit": ["banana", "orange", "pear", "peach", "fruits"],
+    "Food": ["snack", "meal", "bread"],
+    "Refrigerator": ["fridge", "freezer", "icebox", "cooler"],
+    "Cabinet": ["cupboard", "closet", "wardrobe", "locker"],
+    "Drawer": ["drawers"],
+    "Washer": ["washing machine", "dishwasher"],
+    "Sink": ["wash basin", "washbasin"],
+    "Door": ["gate", "hatch"],
+    "Handle": ["knob", "grip", "pull"],
+    "CuttingTool": ["knife", "scissors", "cutter", "blade"],
+    "PouringTool": ["jug", "pitcher", "kettle", "teapot"],
+    "MixingTool": ["whisk", "mixer", "stirrer"],
+    "Container": ["box", "bottle", "jar", "can", "bin", "basket", "tray", "pot", "crate"],
+    "Surface": ["table", "counter", "countertop", "shelf", "desk", "worktop"],
+    "DesignedFurniture": ["chair", "sofa", "couch", "bed", "furniture"],
+    "Human": ["person", "user", "operator", "man", "woman", "people"],
+    "Robot": ["pr2", "tiago", "hsr", "robot arm"],
+    "Room": ["bedroom", "bathroom", "living room", "dining room"],
+    "Kitchen": ["kitchen area"],
+    "Floor": ["ground"],
+    "Location": ["place", "position", "spot"],
+}
@@ -230,6 +230,12 @@ failure_reasoner_prompt_template_gemini = """
     
     ---
     
+    Similar past corrections (parameters that had to change for comparable failures; follow them only where
+    they fit the inputs below, None if there are none):
+    {examples}
+
+    ---
+
     Provided Inputs:
     action_designator : {action_designator}
     reason_for_failure : {reason_for_failure}
@@ -300,6 +306,12 @@ context_prompt_template_gemini = """
 
     ---
 
+    Similar past corrections (values chosen for comparable parameters and comments; follow them only where
+    they fit the inputs below, None if there are none):
+    {examples}
+
+    ---
+
     Provided Inputs:
     parameters_to_update: {parameters_to_update}
     update_reasons: {update_reasons}
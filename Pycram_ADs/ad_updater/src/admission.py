@@ -0,0 +1,148 @@
+import itertools
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+# Lower rank is served first. Corrections block a robot, instructions and queued jobs do not.
+PRIORITY_CLASSES = {
+    "correction": 0,
+    "instruction": 1,
+    "batch": 2,
+}
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request is shed instead of queued."""
+
+    def __init__(self, status_code: int, retry_after: float, reason: str):
+        super().__init__(reason)
+        self.status_code = status_code
+        self.retry_after = retry_after
+        self.reason = reason
+
+
+class _Waiter:
+    def __init__(self, priority_class: str, deadline: float, seq: int):
+        self.priority_class = priority_class
+        self.rank = PRIORITY_CLASSES[priority_class]
+        self.deadline = deadline
+        self.seq = seq
+        self.granted = False
+
+    def sort_key(self):
+        # Priority class first, then earliest deadline, then arrival order
+        return self.rank, self.deadline, self.seq
+
+
+class AdmissionController:
+    """
+    Bounds how many pipeline runs execute at once and decides who runs next.
+
+    Each priority class has its own bounded wait queue. Free slots go to the most urgent waiter
+    (class rank, then earliest deadline). A request is shed with 429 when its class queue is full,
+    and with 503 when its predicted completion time already misses its deadline or the latency
+    budget. Service times are tracked per class as an exponentially weighted moving average.
+    """
+
+    def __init__(self, max_concurrency: int = 1, queue_limits: Optional[Dict[str, int]] = None,
+                 default_timeouts: Optional[Dict[str, float]] = None, max_predicted_latency: float = 120.0,
+                 initial_service_time: float = 10.0, ewma_alpha: float = 0.2):
+        self.max_concurrency = max_concurrency
+        self.queue_limits = queue_limits or {"correction": 32, "instruction": 8, "batch": 1024}
+        self.default_timeouts = default_timeouts or {"correction": 60.0, "instruction": 180.0, "batch": math.inf}
+        self.max_predicted_latency = max_predicted_latency
+        self.ewma_alpha = ewma_alpha
+
+        self._cond = threading.Condition()
+        self._running = 0
+        self._waiters = []
+        self._seq = itertools.count()
+        self._service_time = {cls: initial_service_time for cls in PRIORITY_CLASSES}
+        self._counters = {cls: {"admitted": 0, "shed_429": 0, "shed_503": 0, "expired": 0}
+                          for cls in PRIORITY_CLASSES}
+
+    def _queued(self, priority_class: str) -> int:
+        return sum(1 for w in self._waiters if w.priority_class == priority_class)
+
+    def _predicted_latency(self, waiter: _Waiter) -> float:
+        """Expected seconds until the waiter finishes, given the work queued ahead of it."""
+        ahead = [w for w in self._waiters if w.sort_key() < waiter.sort_key()]
+        backlog = sum(self._service_time[w.priority_class] for w in ahead)
+        if self._running >= self.max_concurrency:
+            # Assume running work is on average half done
+            backlog += self._running * min(self._service_time.values()) / 2
+        return backlog / self.max_concurrency + self._service_time[waiter.priority_class]
+
+    def _grant_next(self):
+        while self._running < self.max_concurrency and self._waiters:
+            self._waiters.sort(key=_Waiter.sort_key)
+            waiter = self._waiters.pop(0)
+            waiter.granted = True
+            self._running += 1
+        self._cond.notify_all()
+
+    @contextmanager
+    def admit(self, priority_class: str, deadline: Optional[float] = None, shed: bool = True):
+        """
+        Context manager that holds an execution slot for the duration of the block.
+
+        :param priority_class: one of PRIORITY_CLASSES
+        :param deadline: absolute time.time() after which the result is useless, defaults per class
+        :param shed: if False the caller always waits for a slot (used for queued jobs)
+        """
+        if priority_class not in PRIORITY_CLASSES:
+            raise ValueError(f"Unknown priority class: {priority_class}")
+        if deadline is None:
+            deadline = time.time() + self.default_timeouts[priority_class]
+        counters = self._counters[priority_class]
+
+        with self._cond:
+            waiter = _Waiter(priority_class, deadline, next(self._seq))
+            if shed:
+                if self._queued(priority_class) >= self.queue_limits[priority_class]:
+                    counters["shed_429"] += 1
+                    raise AdmissionRejected(429, self._service_time[priority_class],
+                                            f"{priority_class} queue is full")
+                # Only requests that would have to wait are judged on predicted latency
+                must_wait = self._running >= self.max_concurrency or bool(self._waiters)
+                predicted = self._predicted_latency(waiter)
+                if must_wait and predicted > min(self.max_predicted_latency, deadline - time.time()):
+                    counters["shed_503"] += 1
+                    raise AdmissionRejected(503, predicted, f"predicted latency {predicted:.1f}s exceeds budget")
+
+            self._waiters.append(waiter)
+            self._grant_next()
+            while not waiter.granted:
+                remaining = deadline - time.time()
+                if shed and remaining <= 0:
+                    self._waiters.remove(waiter)
+                    counters["expired"] += 1
+                    raise AdmissionRejected(503, self._service_time[priority_class],
+                                            "deadline expired while queued")
+                self._cond.wait(timeout=remaining if shed and remaining != math.inf else None)
+            counters["admitted"] += 1
+
+        started = time.time()
+        try:
+            yield
+        finally:
+            elapsed = time.time() - started
+            with self._cond:
+                self._running -= 1
+                self._service_time[priority_class] = ((1 - self.ewma_alpha) * self._service_time[priority_class]
+                                                      + self.ewma_alpha * elapsed)
+                self._grant_next()
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "running": self._running,
+                "max_concurrency": self.max_concurrency,
+                "classes": {
+                    cls: {"queued": self._queued(cls), "service_time_ewma": round(self._service_time[cls], 3),
+                          **self._counters[cls]}
+                    for cls in PRIORITY_CLASSES
+                }
+            }
@@ -0,0 +1,181 @@
+import threading
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from ..resources.action_designators import *
+
+# Discrete PickUpAction search space, indexed by position
+ARM_VALUES = [Arms.LEFT, Arms.RIGHT]
+APPROACH_VALUES = [Grasp.FRONT, Grasp.BACK, Grasp.LEFT, Grasp.RIGHT, Grasp.TOP]
+VERTICAL_VALUES = [Grasp.TOP, Grasp.BOTTOM, None]
+ROTATE_VALUES = [False, True]
+GRASP_SPACE_SHAPE = (len(ARM_VALUES), len(APPROACH_VALUES), len(VERTICAL_VALUES), len(ROTATE_VALUES))
+
+# Every (arm, approach, vertical_alignment, rotate_gripper) combination as rows of indices
+GRASP_GRID = np.stack(np.meshgrid(*[np.arange(n) for n in GRASP_SPACE_SHAPE], indexing="ij"), axis=-1).reshape(-1, 4)
+
+# PlaceAction.target_location offsets in metres: 11 x 11 in the plane, 5 heights
+PLACE_OFFSET_GRID = np.stack(np.meshgrid(np.linspace(-0.1, 0.1, 11), np.linspace(-0.1, 0.1, 11),
+                                         np.linspace(0.0, 0.04, 5), indexing="ij"), axis=-1).reshape(-1, 3)
+
+
+def in_grasp_space(designator: PickUpAction) -> bool:
+    """Whether the configuration is a point of the search space (Arms.BOTH, for one, is not)."""
+    grasp = designator.grasp_description
+    return (designator.arm in ARM_VALUES and grasp.approach_direction in APPROACH_VALUES
+            and grasp.vertical_alignment in VERTICAL_VALUES)
+
+
+def grasp_config_index(designator: PickUpAction) -> np.ndarray:
+    """Index row of a PickUpAction's configuration in the grasp search space."""
+    if not in_grasp_space(designator):
+        raise ValueError(f"{designator.arm} / {designator.grasp_description} is not in the grasp search space")
+    grasp = designator.grasp_description
+    return np.array([ARM_VALUES.index(designator.arm), APPROACH_VALUES.index(grasp.approach_direction),
+                     VERTICAL_VALUES.index(grasp.vertical_alignment), int(bool(grasp.rotate_gripper))])
+
+
+class OutcomeHistory:
+    """
+    Per-concept success and failure counts over the grasp search space, plus failed placing positions.
+    """
+
+    def __init__(self, max_place_failures: int = 256):
+        self._lock = threading.Lock()
+        self._grasp_counts: Dict[str, np.ndarray] = {}
+        self._place_failures: Dict[str, np.ndarray] = {}
+        self.max_place_failures = max_place_failures
+
+    def _counts(self, concept: str) -> np.ndarray:
+        # [..., 0] failures, [..., 1] successes
+        if concept not in self._grasp_counts:
+            self._grasp_counts[concept] = np.zeros(GRASP_SPACE_SHAPE + (2,), dtype=np.float64)
+        return self._grasp_counts[concept]
+
+    def record_grasp(self, designator: PickUpAction, success: bool):
+        with self._lock:
+            counts = self._counts(designator.object_designator.concept)
+            counts[tuple(grasp_config_index(designator)) + (int(success),)] += 1
+
+    def record_place_failure(self, designator: PlaceAction):
+        with self._lock:
+            concept = designator.object_designator.concept
+            position = np.array([designator.target_location.position.to_list()])
+            previous = self._place_failures.get(concept, np.empty((0, 3)))
+            self._place_failures[concept] = np.concatenate([previous, position])[-self.max_place_failures:]
+
+    def stats(self) -> dict:
+        with self._lock:
+            arrays = list(self._grasp_counts.values()) + list(self._place_failures.values())
+            return {"grasp_concepts": len(self._grasp_counts), "place_concepts": len(self._place_failures),
+                    "nbytes": sum(a.nbytes for a in arrays)}
+
+    def grasp_failure_rate(self, concept: str) -> np.ndarray:
+        """Laplace-smoothed failure rate for every row of GRASP_GRID."""
+        with self._lock:
+            counts = self._counts(concept).reshape(-1, 2)
+        return (counts[:, 0] + 1) / (counts.sum(axis=1) + 2)
+
+    def place_failures(self, concept: str) -> np.ndarray:
+        with self._lock:
+            return self._place_failures.get(concept, np.empty((0, 3)))
+
+
+class CostModel:
+    """
+    Default cost model: prefer small changes to the failed configuration and configurations that
+    worked for the same concept before. Subclass and override the two methods to plug in another model.
+    """
+
+    def __init__(self, history: OutcomeHistory, change_weights=(1.0, 0.6, 0.4, 0.3), history_weight: float = 2.0,
+                 offset_weight: float = 10.0, failure_radius: float = 0.03, failure_weight: float = 1.0):
+        self.history = history
+        self.change_weights = np.asarray(change_weights)
+        self.history_weight = history_weight
+        self.offset_weight = offset_weight
+        self.failure_radius = failure_radius
+        self.failure_weight = failure_weight
+
+    def grasp_costs(self, grid: np.ndarray, failed: np.ndarray, concept: str) -> np.ndarray:
+        changes = (grid != failed) @ self.change_weights
+        costs = changes + self.history_weight * self.history.grasp_failure_rate(concept)
+        costs[changes == 0] = np.inf
+        return costs
+
+    def place_costs(self, positions: np.ndarray, offsets: np.ndarray, concept: str) -> np.ndarray:
+        distance = np.linalg.norm(offsets, axis=1)
+        costs = self.offset_weight * distance
+        # The failed target itself counts as a failure, it is only added to the history once the request is accepted
+        costs += self.failure_weight * np.exp(-distance ** 2 / (2 * self.failure_radius ** 2))
+        failures = self.history.place_failures(concept)
+        if len(failures):
+            # Gaussian penalty around every position that failed before
+            sq = ((positions ** 2).sum(axis=1)[:, None] + (failures ** 2).sum(axis=1)[None, :]
+                  - 2 * positions @ failures.T)
+            costs += self.failure_weight * np.exp(-sq / (2 * self.failure_radius ** 2)).sum(axis=1)
+        costs[distance == 0] = np.inf
+        return costs
+
+
+outcome_history = OutcomeHistory()
+default_cost_model = CostModel(outcome_history)
+
+
+def _top_k(costs: np.ndarray, k: int) -> np.ndarray:
+    k = min(k, int(np.isfinite(costs).sum()))
+    if k <= 0:
+        return np.empty(0, dtype=int)
+    best = np.argpartition(costs, k - 1)[:k]
+    return best[np.argsort(costs[best], kind="stable")]
+
+
+def pickup_candidate_cost(failed: PickUpAction, candidate: PickUpAction,
+                          cost_model: Optional[CostModel] = None) -> float:
+    """Cost of one alternative grasp configuration, as scored by the search."""
+    cost_model = cost_model or default_cost_model
+    costs = cost_model.grasp_costs(GRASP_GRID, grasp_config_index(failed), failed.object_designator.concept)
+    return float(costs[np.ravel_multi_index(tuple(grasp_config_index(candidate)), GRASP_SPACE_SHAPE)])
+
+
+def place_candidate_cost(failed: PlaceAction, candidate: PlaceAction, cost_model: Optional[CostModel] = None) -> float:
+    """Cost of one alternative placing pose, as scored by the search."""
+    cost_model = cost_model or default_cost_model
+    position = np.asarray([candidate.target_location.position.to_list()], dtype=np.float64)
+    offset = position - np.asarray(failed.target_location.position.to_list())
+    return float(cost_model.place_costs(position, offset, failed.object_designator.concept)[0])
+
+
+def top_k_pickup_candidates(designator: PickUpAction, k: int = 5,
+                            cost_model: Optional[CostModel] = None) -> List[Tuple[PickUpAction, float]]:
+    """
+    Scores every alternative grasp configuration and returns the k cheapest as (PickUpAction, cost).
+    """
+    cost_model = cost_model or default_cost_model
+    costs = cost_model.grasp_costs(GRASP_GRID, grasp_config_index(designator), designator.object_designator.concept)
+    candidates = []
+    for row in _top_k(costs, k):
+        arm, approach, vertical, rotate = GRASP_GRID[row]
+        grasp_description = GraspDescription(approach_direction=APPROACH_VALUES[approach],
+                                             vertical_alignment=VERTICAL_VALUES[vertical],
+                                             rotate_gripper=ROTATE_VALUES[rotate])
+        candidates.append((designator.model_copy(update={"arm": ARM_VALUES[arm],
+                                                         "grasp_description": grasp_description}),
+                           float(costs[row])))
+    return candidates
+
+
+def top_k_place_candidates(designator: PlaceAction, k: int = 5,
+                           cost_model: Optional[CostModel] = None) -> List[Tuple[PlaceAction, float]]:
+    """
+    Scores target_location offsets around the failed placing pose and returns the k cheapest as (PlaceAction, cost).
+    """
+    cost_model = cost_model or default_cost_model
+    target = designator.target_location
+    positions = np.asarray(target.position.to_list()) + PLACE_OFFSET_GRID
+    costs = cost_model.place_costs(positions, PLACE_OFFSET_GRID, designator.object_designator.concept)
+    candidates = []
+    for row in _top_k(costs, k):
+        x, y, z = (round(float(v), 4) for v in positions[row])
+        target_location = PoseStamped(pose=Pose(position=Vector3(x=x, y=y, z=z), orientation=target.orientation),
+                                      header=target.header)
+        candidates.append((designator.model_copy(update={"target_location": target_location}), float(costs[row])))
+    return candidates
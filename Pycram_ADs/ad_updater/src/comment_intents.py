@@ -0,0 +1,212 @@
+import os
+import re
+import threading
+from collections import deque
+from typing import Any, Dict, List, NamedTuple, Optional
+from pydantic import BaseModel
+from ..resources.action_designators import *
+from .concept_index import concept_index
+from .failure_rules import OTHER_ARM, RuleCandidate
+from .input_parser import parse_designator
+from .instruction_cache import normalize_instruction
+from .instruction_parser import APPROACH_WORDS, ARM_NOUNS, ARM_WORDS, COLORS, VERTICAL_WORDS
+
+# Comments fully understood locally are applied without the LLM pipeline
+COMMENT_INTENTS = os.getenv("COMMENT_INTENTS", "1") == "1"
+
+# Words that carry no parameter change: verbs of the action, references to the object, confirmations
+FILLER_WORDS = {"no", "nope", "wrong", "use", "pick", "grab", "take", "grasp", "get", "lift", "place", "put", "it",
+                "its", "s", "one", "object", "should", "be", "is", "i", "meant", "mean", "want", "wanted", "need",
+                "try", "again", "with", "instead", "to", "have", "been", "better", "rather", "do", "of", "same",
+                "up", "time", "this"}
+
+# The negated part of a clause names the old value ("... not the blue cup")
+NEGATIONS = {"not", "instead", "rather", "than"}
+
+# Where an object is ("the cup next to the bowl", "out of the fridge") cannot be expressed as a patch, so
+# clauses with these words always go to the LLM, even though "to" and "of" are fillers elsewhere
+RELATION_WORDS = {"next", "near", "nearby", "behind", "beside", "besides", "between", "under", "underneath",
+                  "beneath", "over", "out", "outside", "inside", "in", "into", "on", "onto", "at", "from", "by",
+                  "around", "against", "opposite", "front", "close", "closer", "far", "farther", "further"}
+
+CLAUSE_SEPARATOR = re.compile(r"\bbut\b|\band\b|[,;.!]")
+
+class CommentIntent(NamedTuple):
+    patches: Dict[str, Any]
+    reasons: List[str]
+    unhandled: List[str]
+
+    @property
+    def handled(self) -> bool:
+        return bool(self.patches) and not self.unhandled
+
+
+class UnhandledClause(ValueError):
+    pass
+
+
+def _has_field(model, path: str) -> bool:
+    for part in path.split("."):
+        if not isinstance(model, BaseModel) or part not in type(model).model_fields:
+            return False
+        model = getattr(model, part)
+    return True
+
+
+def _get(model, path: str):
+    for part in path.split("."):
+        model = getattr(model, part)
+    return model
+
+
+def apply_patches(model: BaseModel, patches: Dict[str, Any]) -> BaseModel:
+    """Copy of model with dotted-path patches ({"object_designator.color": "yellow"}) applied."""
+    update, nested = {}, {}
+    for path, value in patches.items():
+        head, _, rest = path.partition(".")
+        if rest:
+            nested.setdefault(head, {})[rest] = value
+        else:
+            update[head] = value
+    for head, sub_patches in nested.items():
+        update[head] = apply_patches(getattr(model, head), sub_patches)
+    return model.model_copy(update=update)
+
+
+def _object_patches(words: List[str], designator) -> Dict[str, Any]:
+    obj = getattr(designator, "object_designator", None)
+    if not isinstance(obj, Object):
+        raise UnhandledClause("the designator has no object")
+    colors = [w for w in words if w in COLORS]
+    nouns = [w for w in words if w not in COLORS]
+    # "the orange" is the fruit, as in the instruction parser; "the yellow one" is a color
+    if not nouns and concept_index.resolve(colors[-1], fuzzy=False) is not None:
+        nouns, colors = colors[-1:], colors[:-1]
+    if len(colors) > 1:
+        raise UnhandledClause("more than one color")
+    unknown = [w for w in nouns[:-1] if not concept_index.is_modifier(w)]
+    if unknown:
+        raise UnhandledClause(f"'{' '.join(unknown)}' does not describe an object")
+    patches = {}
+    if nouns:
+        name = " ".join(nouns)
+        match = concept_index.resolve(name, fuzzy=False)
+        if match is None:
+            raise UnhandledClause(f"unknown object '{name}'")
+        if match.concept != obj.concept:
+            # Another object: its color and pose are not known
+            patches.update({"object_designator.name": name, "object_designator.concept": match.concept,
+                            "object_designator.color": None, "object_designator.pose": None,
+                            "object_designator.path": None})
+    if colors:
+        patches["object_designator.color"] = colors[0]
+    return patches
+
+
+def _clause_patches(words: List[str], designator) -> Dict[str, Any]:
+    patches, object_words, i = {}, [], 0
+    while i < len(words):
+        word, following = words[i], words[i + 1] if i + 1 < len(words) else None
+        if word in ARM_WORDS and following in ARM_NOUNS:
+            patches["arm"] = ARM_WORDS[word]
+            i += 2
+        elif word == "other" and following in ARM_NOUNS:
+            if getattr(designator, "arm", None) not in OTHER_ARM:
+                raise UnhandledClause("no single arm to switch from")
+            patches["arm"] = OTHER_ARM[designator.arm]
+            i += 2
+        elif word == "from" and following in VERTICAL_WORDS:
+            patches["grasp_description.vertical_alignment"] = VERTICAL_WORDS[following]
+            i += 2
+        elif word == "from" and following in APPROACH_WORDS:
+            patches["grasp_description.approach_direction"] = APPROACH_WORDS[following]
+            i += 2
+        elif word == "rotate" and following in ARM_NOUNS:
+            patches["grasp_description.rotate_gripper"] = True
+            i += 2
+        elif word in RELATION_WORDS:
+            raise UnhandledClause(f"relation '{word}'")
+        elif word in FILLER_WORDS:
+            i += 1
+        else:
+            object_words.append(word)
+            i += 1
+    if object_words:
+        patches.update(_object_patches(object_words, designator))
+    return patches
+
+
+def extract_intent(comment: str, designator) -> CommentIntent:
+    """
+    Parameter patches a human comment asks for, e.g. "pick up the yellow cup not the blue cup" ->
+    {"object_designator.color": "yellow"}. Clauses that cannot be mapped to parameters of the designator,
+    or only repeat its current values, are returned as unhandled.
+    """
+    patches, reasons, unhandled = {}, [], []
+    for clause in CLAUSE_SEPARATOR.split(comment or ""):
+        words = normalize_instruction(clause).split()
+        for i, word in enumerate(words):
+            if word in NEGATIONS:
+                words = words[:i]
+                break
+        # "no", "wrong", "try again" only say that the designator was wrong
+        if all(word in FILLER_WORDS for word in words):
+            continue
+        try:
+            clause_patches = _clause_patches(words, designator)
+        except UnhandledClause:
+            unhandled.append(clause.strip())
+            continue
+        clause_patches = {path: value for path, value in clause_patches.items()
+                          if _has_field(designator, path) and _get(designator, path) != value}
+        if not clause_patches:
+            unhandled.append(clause.strip())
+            continue
+        patches.update(clause_patches)
+        reasons.append(f"The comment '{clause.strip()}' asks for "
+                       + ", ".join(f"{path} = {value}" for path, value in clause_patches.items()) + ".")
+    return CommentIntent(patches, reasons, unhandled)
+
+
+class CommentIntentStats:
+    def __init__(self, max_recent: int = 50):
+        self._lock = threading.Lock()
+        self._counters = {"handled": 0, "unhandled": 0}
+        self._recent_unhandled = deque(maxlen=max_recent)
+
+    def record(self, comment: str, intent: CommentIntent):
+        with self._lock:
+            if intent.handled:
+                self._counters["handled"] += 1
+            else:
+                self._counters["unhandled"] += 1
+                self._recent_unhandled.append({"comment": comment, "unhandled": intent.unhandled})
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = sum(self._counters.values())
+            return {**self._counters, "local_fraction": round(self._counters["handled"] / total, 3) if total else None,
+                    "recent_unhandled": list(self._recent_unhandled)}
+
+
+comment_intent_stats = CommentIntentStats()
+
+
+def comment_candidate(action_designator, human_comment: str) -> Optional[RuleCandidate]:
+    """
+    The designator corrected as the comment asks, None when any part of the comment is not understood
+    locally, so the whole comment goes to the LLM pipeline.
+    """
+    try:
+        designator, _ = parse_designator(action_designator)
+    except ValueError:
+        return None
+    intent = extract_intent(human_comment, designator)
+    comment_intent_stats.record(human_comment, intent)
+    if not intent.handled:
+        print(f"Comment not handled locally: {intent.unhandled}")
+        return None
+    return RuleCandidate(
+        designator=apply_patches(designator, intent.patches), score=1.0, rule="comment_intent",
+        reasons=[f"The human comment: {human_comment.strip()}"], solution=" ".join(intent.reasons),
+        updated_parameters=[{path: str(value)} for path, value in intent.patches.items()])
@@ -0,0 +1,168 @@
+import re
+from functools import lru_cache
+from typing import Dict, Iterable, List, NamedTuple, Optional
+from pydantic import BaseModel
+from ..resources.action_designators import Object
+from ..resources.concepts import Concepts, CONCEPT_SYNONYMS
+
+# Used to fill the prompt candidate list when the request mentions fewer concepts than asked for
+DEFAULT_PROMPT_CONCEPTS = ["PhysicalObject", "Container", "Surface", "Location", "Robot"]
+
+# Concept used when neither the concept nor the object name can be matched
+FALLBACK_CONCEPT = "PhysicalObject"
+
+COLORS = {"red", "green", "blue", "yellow", "white", "black", "orange", "purple", "pink", "brown", "grey", "gray",
+          "silver", "golden", "transparent"}
+
+# Words that only describe the last noun of a phrase ("big red cup", "plastic bowl"). Any other word in front
+# of it ("apple out of bowl") means the phrase is not one object and the last noun must not be used
+MODIFIER_WORDS = COLORS | {"big", "small", "large", "little", "tiny", "huge", "tall", "short", "long", "wide",
+                           "narrow", "round", "square", "empty", "full", "clean", "dirty", "new", "old",
+                           "plastic", "metal", "metallic", "wooden", "wood", "glass", "ceramic", "paper", "steel",
+                           "porcelain", "cardboard"}
+
+
+class ConceptMatch(NamedTuple):
+    concept: str
+    score: float
+    method: str
+
+
+def _split_camel(name: str) -> str:
+    return re.sub(r"(?<=[a-z])(?=[A-Z])", " ", name).lower()
+
+def _normalize(term: str) -> str:
+    return " ".join(re.findall(r"[a-z0-9]+", _split_camel(term.strip())))
+
+def _trigrams(text: str) -> frozenset:
+    padded = f"  {text} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+class ConceptIndex:
+    """
+    Maps free-form object words to the ontology concepts the action designators accept.
+
+    Lookups try, in order: exact concept, case/CamelCase-insensitive concept, synonym, plural
+    stripping, the last word of a phrase whose other words are modifiers ("blue cup" -> "cup") and
+    finally trigram similarity.
+    """
+
+    def __init__(self, concepts: Iterable[str], synonyms: Dict[str, List[str]], fuzzy_threshold: float = 0.45):
+        self.concepts = list(concepts)
+        self.fuzzy_threshold = fuzzy_threshold
+        self._exact = set(self.concepts)
+        self._normalized: Dict[str, str] = {_normalize(c): c for c in self.concepts}
+        self._synonyms: Dict[str, str] = {_normalize(s): concept
+                                          for concept, words in synonyms.items() for s in words}
+        keys = {**self._synonyms, **self._normalized}
+        # "kitchen sink", "cereal bowl": other concept words may qualify a noun as well
+        self._modifiers = MODIFIER_WORDS | {word for key in keys for word in key.split()}
+        self._fuzzy_keys = [(key, concept, _trigrams(key)) for key, concept in keys.items()]
+        self.resolve = lru_cache(maxsize=4096)(self._resolve)
+
+    def _lookup(self, key: str) -> Optional[ConceptMatch]:
+        if key in self._normalized:
+            return ConceptMatch(self._normalized[key], 0.95, "case_insensitive")
+        if key in self._synonyms:
+            return ConceptMatch(self._synonyms[key], 0.9, "synonym")
+        return None
+
+    def _fuzzy(self, key: str) -> Optional[ConceptMatch]:
+        grams = _trigrams(key)
+        best, best_score = None, 0.0
+        for _, concept, key_grams in self._fuzzy_keys:
+            score = len(grams & key_grams) / len(grams | key_grams)
+            if score > best_score:
+                best, best_score = concept, score
+        if best is not None and best_score >= self.fuzzy_threshold:
+            return ConceptMatch(best, round(best_score * 0.8, 3), "fuzzy")
+        return None
+
+    def _resolve(self, term: str, fuzzy: bool = True) -> Optional[ConceptMatch]:
+        if not term:
+            return None
+        if term in self._exact:
+            return ConceptMatch(term, 1.0, "exact")
+        key = _normalize(term)
+        if not key:
+            return None
+        match = self._lookup(key)
+        if match is None and key.endswith("s"):
+            match = self._lookup(key[:-2] if key.endswith("es") else key[:-1]) or self._lookup(key[:-1])
+        if match is None and " " in key:
+            modifiers, head_word = key.rsplit(" ", 1)
+            head = self._resolve(head_word, fuzzy) if set(modifiers.split()) <= self._modifiers else None
+            match = ConceptMatch(head.concept, round(head.score * 0.9, 3), "head_noun") if head else None
+        if match is None and fuzzy:
+            match = self._fuzzy(key)
+        return match
+
+    def is_valid(self, concept: str) -> bool:
+        return concept in self._exact
+
+    def is_modifier(self, word: str) -> bool:
+        """Whether word may stand in front of an object noun: a color, size, material or concept word."""
+        return word in self._modifiers
+
+    def top_k(self, text: str, k: int = 5) -> List[str]:
+        """
+        Concepts most relevant to a request text, padded with generic ones up to k.
+        """
+        words = re.findall(r"[a-z0-9]+", _split_camel(str(text)))
+        found: Dict[str, float] = {}
+        for i, word in enumerate(words):
+            phrases = [word] + ([f"{word} {words[i + 1]}"] if i + 1 < len(words) else [])
+            for phrase in phrases:
+                # Fuzzy matching on every word of a sentence is too noisy, only use it on longer words
+                match = self.resolve(phrase, fuzzy=len(phrase) >= 5)
+                if match is not None and match.score >= 0.6:
+                    found[match.concept] = max(found.get(match.concept, 0.0), match.score)
+        ranked = sorted(found, key=found.get, reverse=True)[:k]
+        for concept in DEFAULT_PROMPT_CONCEPTS:
+            if len(ranked) >= k:
+                break
+            if concept not in ranked:
+                ranked.append(concept)
+        return ranked
+
+    def repair(self, model) -> List[str]:
+        """
+        Replaces every Object.concept inside a (nested) pydantic model that is not a known concept.
+
+        :return: human-readable descriptions of the repairs made
+        """
+        repairs = []
+        for obj in _iter_objects(model):
+            if self.is_valid(obj.concept):
+                continue
+            match = self.resolve(obj.concept) or self.resolve(obj.name)
+            concept = match.concept if match is not None else FALLBACK_CONCEPT
+            repairs.append(f"{obj.name}: concept '{obj.concept}' -> '{concept}'")
+            obj.concept = concept
+        return repairs
+
+
+def _iter_objects(value):
+    if isinstance(value, Object):
+        yield value
+    if isinstance(value, BaseModel):
+        for field_name in type(value).model_fields:
+            yield from _iter_objects(getattr(value, field_name))
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            yield from _iter_objects(item)
+    elif isinstance(value, dict):
+        for item in value.values():
+            yield from _iter_objects(item)
+
+
+def object_terms(model) -> List[str]:
+    """
+    Names and concepts of the objects inside a (nested) model, the designator values a concept query should
+    see. Class and field names ("PickUpAction", "target_location") would match concepts of their own.
+    """
+    return [term for obj in _iter_objects(model) for term in (obj.name, obj.concept) if term]
+
+
+concept_index = ConceptIndex(Concepts, CONCEPT_SYNONYMS)
@@ -0,0 +1,265 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import List, NamedTuple, Optional
+import numpy as np
+from .input_parser import parse_designator, parse_failure
+from .designator_normalizer import render_designator
+
+# Past corrections injected into the reasoner and contexter prompts, 0 disables the injection. Recorded
+# or replayed LLM calls are keyed by their prompts, which must not depend on the history of the run
+CORRECTION_EXAMPLES = 0 if os.getenv("LLM_CASSETTE_MODE") else int(os.getenv("CORRECTION_EXAMPLES", "3"))
+
+# Characters kept per example field, so a few examples stay cheaper than the static instructions they refine
+EXAMPLE_FIELD_CHARS = 400
+
+NO_EXAMPLES = "None"
+
+# False while canned requests run (the startup warm-up), so they do not become examples for real ones
+_recording: ContextVar[bool] = ContextVar("correction_recording", default=True)
+
+
+def recording_enabled() -> bool:
+    return _recording.get()
+
+
+@contextmanager
+def recording_paused():
+    """Corrections made in this context are not recorded in the correction history."""
+    token = _recording.set(False)
+    try:
+        yield
+    finally:
+        _recording.reset(token)
+
+
+class CorrectionCase(NamedTuple):
+    case_id: int
+    action_type: str
+    failure_type: str
+    concept: str
+    designator: str
+    failure: str
+    human_comment: str
+    parameters_to_update: str
+    reasons: str
+    parameter_updates: str
+    final_designator: str
+    score: float
+
+
+def correction_keys(designator, failure) -> tuple:
+    """(action_type, failure_type, object concept) a correction is indexed by, "" where unknown."""
+    try:
+        ad_instance, action_cls = parse_designator(designator)
+    except Exception:
+        ad_instance, action_cls = None, None
+    try:
+        failure_instance, _ = parse_failure(failure) if failure else (None, "")
+    except Exception:
+        failure_instance = None
+    obj = getattr(ad_instance, "object_designator", None)
+    return (action_cls.__name__ if action_cls is not None else "",
+            getattr(failure_instance, "failure_type", "") or "",
+            getattr(obj, "concept", "") or "")
+
+
+def embed_text(text: str, dim: int) -> np.ndarray:
+    """
+    Hashed bag of words and word bigrams, L2-normalized. Stable across processes (crc32, not hash()),
+    so vectors stored in the memory map stay comparable after a restart.
+    """
+    words = re.findall(r"[a-z0-9]+", re.sub(r"(?<=[a-z])(?=[A-Z])", " ", str(text)).lower())
+    vector = np.zeros(dim, dtype=np.float32)
+    for feature in words + [f"{a} {b}" for a, b in zip(words, words[1:])]:
+        h = zlib.crc32(feature.encode())
+        vector[h % dim] += 1.0 if (h >> 31) & 1 else -1.0
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def _truncate(text: str) -> str:
+    text = " ".join(str(text).split())
+    return text if len(text) <= EXAMPLE_FIELD_CHARS else text[:EXAMPLE_FIELD_CHARS] + "..."
+
+
+class CorrectionHistory:
+    """
+    Local store of finished corrections: (designator, failure, comment) -> (reasons, parameter updates,
+    final designator).
+
+    Cases are kept in SQLite, indexed by action_type, failure_type and object concept. When
+    embeddings_path is given, an embedding of each case input is kept in a memory-mapped float32 array
+    (row = case_id - 1), so nearest cases are found without loading the history into memory.
+    """
+
+    def __init__(self, db_path: str, embeddings_path: Optional[str] = None, dim: int = 256,
+                 max_candidates: int = 500, initial_capacity: int = 1024):
+        self.db_path = db_path
+        self.embeddings_path = embeddings_path
+        self.dim = dim
+        self.max_candidates = max_candidates
+        self._lock = threading.Lock()
+        self._counters = {"recorded": 0, "lookups": 0, "examples_returned": 0}
+        self._init_db()
+        self._embeddings = self._open_embeddings(initial_capacity) if embeddings_path else None
+
+    @contextmanager
+    def _connect(self):
+        # Autocommit connection, closed on exit (a sqlite3 connection's own context manager only commits)
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def _init_db(self):
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS corrections (
+                    case_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    action_type TEXT NOT NULL,
+                    failure_type TEXT NOT NULL,
+                    concept TEXT NOT NULL,
+                    designator TEXT NOT NULL,
+                    failure TEXT NOT NULL,
+                    human_comment TEXT NOT NULL,
+                    parameters_to_update TEXT NOT NULL,
+                    reasons TEXT NOT NULL,
+                    parameter_updates TEXT NOT NULL,
+                    final_designator TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                )""")
+            conn.execute("CREATE INDEX IF NOT EXISTS corrections_keys "
+                         "ON corrections (action_type, failure_type, concept)")
+
+    def _open_embeddings(self, capacity: int) -> np.memmap:
+        if os.path.exists(self.embeddings_path):
+            rows = os.path.getsize(self.embeddings_path) // (4 * self.dim)
+            if rows:
+                return np.memmap(self.embeddings_path, dtype=np.float32, mode="r+", shape=(rows, self.dim))
+        return np.memmap(self.embeddings_path, dtype=np.float32, mode="w+", shape=(capacity, self.dim))
+
+    def _store_embedding(self, case_id: int, vector: np.ndarray):
+        with self._lock:
+            row = case_id - 1
+            if row >= self._embeddings.shape[0]:
+                capacity = self._embeddings.shape[0]
+                while row >= capacity:
+                    capacity *= 2
+                self._embeddings.flush()
+                # r+ extends the file to the new shape
+                self._embeddings = np.memmap(self.embeddings_path, dtype=np.float32, mode="r+",
+                                             shape=(capacity, self.dim))
+            self._embeddings[row] = vector
+
+    def _query_text(self, designator, failure, human_comment) -> str:
+        return f"{render_designator(designator)} {render_designator(failure)} {human_comment}"
+
+    def record(self, designator, failure, human_comment: str, parameters_to_update: str, reasons: str,
+               parameter_updates: str, final_designator) -> int:
+        action_type, failure_type, concept = correction_keys(designator, failure)
+        with self._connect() as conn:
+            case_id = conn.execute(
+                "INSERT INTO corrections (action_type, failure_type, concept, designator, failure, human_comment, "
+                "parameters_to_update, reasons, parameter_updates, final_designator, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (action_type, failure_type, concept, render_designator(designator), render_designator(failure),
+                 human_comment or "", str(parameters_to_update), str(reasons), str(parameter_updates),
+                 render_designator(final_designator), time.time())).lastrowid
+        if self._embeddings is not None:
+            self._store_embedding(case_id, embed_text(self._query_text(designator, failure, human_comment),
+                                                      self.dim))
+        with self._lock:
+            self._counters["recorded"] += 1
+        return case_id
+
+    def similar(self, designator, failure, human_comment: str, k: int = 3) -> List[CorrectionCase]:
+        """
+        The k past cases of the same action type closest to this request: matching failure type and
+        concept count first, embedding similarity (or recency without embeddings) decides the rest.
+        """
+        action_type, failure_type, concept = correction_keys(designator, failure)
+        with self._connect() as conn:
+            rows = conn.execute("SELECT * FROM corrections WHERE action_type = ? ORDER BY case_id DESC LIMIT ?",
+                                (action_type, self.max_candidates)).fetchall()
+        with self._lock:
+            self._counters["lookups"] += 1
+        if not rows or k <= 0:
+            return []
+
+        ids = np.array([row["case_id"] for row in rows])
+        scores = np.array([(row["failure_type"] == failure_type) * 1.0 + (row["concept"] == concept) * 0.5
+                           for row in rows])
+        if self._embeddings is not None:
+            query = embed_text(self._query_text(designator, failure, human_comment), self.dim)
+            with self._lock:
+                in_map = ids - 1 < self._embeddings.shape[0]
+                similarity = np.zeros(len(ids), dtype=np.float32)
+                similarity[in_map] = self._embeddings[ids[in_map] - 1] @ query
+            scores = scores + similarity
+
+        cases, seen = [], set()
+        # Stable sort keeps the newest first among equal scores
+        for i in np.argsort(-scores, kind="stable"):
+            row = rows[i]
+            key = (row["designator"], row["failure"], row["human_comment"])
+            if key in seen:
+                continue
+            seen.add(key)
+            cases.append(CorrectionCase(score=round(float(scores[i]), 3),
+                                        **{field: row[field] for field in CorrectionCase._fields[:-1]}))
+            if len(cases) == k:
+                break
+        with self._lock:
+            self._counters["examples_returned"] += len(cases)
+        return cases
+
+    def stats(self) -> dict:
+        with self._connect() as conn:
+            cases = conn.execute("SELECT COUNT(*) FROM corrections").fetchone()[0]
+        with self._lock:
+            return {**self._counters, "cases": cases,
+                    "embedding_rows": self._embeddings.shape[0] if self._embeddings is not None else None}
+
+
+def format_reasoner_examples(cases: List[CorrectionCase]) -> str:
+    """Compact few-shot block for the failure reasoner: input -> parameters that had to change."""
+    if not cases:
+        return NO_EXAMPLES
+    return "\n".join(f"- action_designator: {_truncate(c.designator)}\n  reason_for_failure: {_truncate(c.failure)}\n"
+                     f"  human_comment: {_truncate(c.human_comment) or 'None'}\n"
+                     f"  parameters: {_truncate(c.parameters_to_update)}" for c in cases)
+
+
+def format_context_examples(cases: List[CorrectionCase]) -> str:
+    """Compact few-shot block for the contexter: parameters and comment -> chosen values."""
+    if not cases:
+        return NO_EXAMPLES
+    return "\n".join(f"- parameters_to_update: {_truncate(c.parameters_to_update)}\n"
+                     f"  human_comment: {_truncate(c.human_comment) or 'None'}\n"
+                     f"  updated_parameters: {_truncate(c.parameter_updates)}" for c in cases)
+
+
+def similar_corrections(designator, failure, human_comment: str) -> List[CorrectionCase]:
+    """Past cases for a request, [] when injection is disabled or the lookup fails."""
+    if not CORRECTION_EXAMPLES:
+        return []
+    try:
+        return correction_history.similar(designator, failure, human_comment, k=CORRECTION_EXAMPLES)
+    except Exception as e:
+        print(f"Correction history lookup failed: {e}")
+        return []
+
+
+correction_history = CorrectionHistory(
+    os.getenv("CORRECTION_HISTORY_PATH", "correction_history.sqlite3"),
+    embeddings_path=os.getenv("CORRECTION_HISTORY_EMBEDDINGS", "correction_history.f32") or None,
+    dim=int(os.getenv("CORRECTION_HISTORY_DIM", "256")))
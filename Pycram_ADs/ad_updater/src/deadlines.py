@@ -0,0 +1,85 @@
+import math
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+# Absolute time.time() after which the current request's result is no longer needed
+_current_deadline: ContextVar[Optional[float]] = ContextVar("current_deadline", default=None)
+
+
+class DeadlineExceeded(Exception):
+    """
+    Raised inside the pipeline once the request deadline is missed or can no longer be met.
+
+    partial collects the graph state that was already computed, so the caller can still return it.
+    """
+
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+        self.partial = {}
+
+
+def current_deadline() -> Optional[float]:
+    return _current_deadline.get()
+
+
+def deadline_after_ms(deadline_ms, name: str = "deadline_ms") -> Optional[float]:
+    """
+    Absolute deadline deadline_ms milliseconds from now, None when it is not given.
+
+    :raises ValueError: deadline_ms is not a positive number
+    """
+    if deadline_ms is None or deadline_ms == "":
+        return None
+    try:
+        milliseconds = float(deadline_ms)
+    except (TypeError, ValueError):
+        milliseconds = math.nan
+    if isinstance(deadline_ms, bool) or not math.isfinite(milliseconds) or milliseconds <= 0:
+        raise ValueError(f"{name} must be a positive number of milliseconds, got {deadline_ms!r}")
+    return time.time() + milliseconds / 1000
+
+
+@contextmanager
+def deadline_scope(deadline: Optional[float]):
+    """Makes deadline visible to every LLM call made in this context (graph nodes run in it too)."""
+    token = _current_deadline.set(deadline)
+    try:
+        yield
+    finally:
+        _current_deadline.reset(token)
+
+
+class DeadlineStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {"skipped_llm_calls": 0, "cancelled_llm_streams": 0, "cancelled_llm_seconds": 0.0,
+                          "exceeded_requests": 0}
+
+    def add(self, counter: str, value: float = 1):
+        with self._lock:
+            self._counters[counter] += value
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {k: round(v, 3) for k, v in self._counters.items()}
+
+
+deadline_stats = DeadlineStats()
+
+
+def check_deadline(expected_seconds: float = 0.0, what: str = "LLM call"):
+    """
+    Raises DeadlineExceeded when the current deadline has passed, or leaves less time than
+    expected_seconds, so work whose result would arrive too late is not started.
+    """
+    deadline = _current_deadline.get()
+    if deadline is None:
+        return
+    remaining = deadline - time.time()
+    if remaining <= 0 or expected_seconds > remaining:
+        deadline_stats.add("skipped_llm_calls")
+        raise DeadlineExceeded(f"skipped {what}: {max(remaining, 0):.1f}s left, expected {expected_seconds:.1f}s")
@@ -0,0 +1,64 @@
+from enum import Enum
+from typing import Any
+from pydantic import BaseModel
+
+# Bookkeeping fields that are implied by the class name and never rendered
+HIDDEN_FIELDS = {"action_type", "failure_type"}
+
+
+def _filter_to_reference(reference: Any, candidate: Any) -> Any:
+    """Restricts candidate (a model or plain value) to the fields that are set on reference."""
+    if not isinstance(candidate, BaseModel) or not isinstance(reference, BaseModel):
+        return candidate
+    values = {}
+    for name in type(candidate).model_fields:
+        if name in HIDDEN_FIELDS or name not in reference.model_fields_set:
+            continue
+        values[name] = _filter_to_reference(getattr(reference, name), getattr(candidate, name))
+    return type(candidate).model_validate(values)
+
+
+def normalize_designator(reference: BaseModel, candidate: BaseModel) -> BaseModel:
+    """
+    Drops every parameter of candidate that the reference designator does not have, recursively.
+
+    Replaces the clean_prompt LLM pass: the reference's explicitly set fields define the structure,
+    the candidate provides the values.
+    """
+    if type(reference) is not type(candidate):
+        return candidate
+    return _filter_to_reference(reference, candidate)
+
+
+def _render_value(value: Any) -> str:
+    if isinstance(value, Enum):
+        return f"{type(value).__name__}.{value.name}"
+    if isinstance(value, BaseModel):
+        return render_designator(value)
+    if isinstance(value, list):
+        return "[" + ", ".join(_render_value(v) for v in value) + "]"
+    if isinstance(value, tuple):
+        return "(" + ", ".join(_render_value(v) for v in value) + ("," if len(value) == 1 else "") + ")"
+    if isinstance(value, dict):
+        return "{" + ", ".join(f"{_render_value(k)}: {_render_value(v)}" for k, v in value.items()) + "}"
+    return repr(value)
+
+
+def render_designator(designator: Any) -> str:
+    """
+    Byte-stable Python-source rendering of a designator, with enums written symbolically (Grasp.TOP).
+
+    Fields are rendered in declaration order, fields left at their default are omitted. Plain
+    strings are returned unchanged.
+    """
+    if not isinstance(designator, BaseModel):
+        return str(designator)
+    parts = []
+    for name, field in type(designator).model_fields.items():
+        if name in HIDDEN_FIELDS:
+            continue
+        value = getattr(designator, name)
+        if not field.is_required() and value == field.get_default(call_default_factory=True):
+            continue
+        parts.append(f"{name}={_render_value(value)}")
+    return f"{type(designator).__name__}({', '.join(parts)})"
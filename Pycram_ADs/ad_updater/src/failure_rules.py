@@ -0,0 +1,235 @@
+import math
+from typing import Any, Callable, Dict, List
+from pydantic import BaseModel, Field
+from ..resources.action_designators import *
+from ..resources.failures import *
+from .input_parser import parse_designator, parse_failure
+from .candidate_generator import (in_grasp_space, outcome_history, pickup_candidate_cost, place_candidate_cost,
+                                  top_k_pickup_candidates, top_k_place_candidates)
+
+
+class RuleCandidate(BaseModel):
+    """
+    A corrected designator proposed by a deterministic rule
+    """
+    designator: Any = Field(description="The corrected action designator")
+    score: float = Field(description="Confidence of the rule, rescaled by the cost model when ranked; higher is tried first")
+    rule: str = Field(description="Name of the rule that produced the candidate")
+    reasons: List[str] = Field(description="Why the original designator likely failed")
+    solution: str = Field(description="What the candidate changes, in plain words")
+    updated_parameters: List[Dict[str, str]] = Field(description="Changed parameter-value pairs")
+    plan_insertion: bool = Field(default=False, description="The designator is a new step to run after the failed "
+                                                            "one, not a replacement for it")
+
+
+# failure_type -> rules, each rule maps (designator, failure) to a list of candidates
+FAILURE_RULES: Dict[str, List[Callable[[Any, Any], List[RuleCandidate]]]] = {}
+
+def failure_rule(failure_type: str):
+    """Registers a correction rule for a failure type."""
+    def register(rule):
+        FAILURE_RULES.setdefault(failure_type, []).append(rule)
+        return rule
+    return register
+
+OTHER_ARM = {Arms.LEFT: Arms.RIGHT, Arms.RIGHT: Arms.LEFT}
+SIDE_APPROACHES = [Grasp.FRONT, Grasp.LEFT, Grasp.RIGHT, Grasp.BACK]
+
+# Number of alternatives taken from the vectorized search space per request
+SEARCH_CANDIDATES = 5
+
+# Confidence of a search candidate before its cost is applied; direct rules use their own confidence
+SEARCH_CONFIDENCE = 0.5
+
+# Small pose corrections tried when an object did not end up at its target, in metres
+PLACING_OFFSETS = [(0.0, 0.0, 0.02), (0.05, 0.0, 0.02), (-0.05, 0.0, 0.02), (0.0, 0.05, 0.02), (0.0, -0.05, 0.02)]
+
+
+# --- ObjectNotGraspedError ---
+
+@failure_rule("ObjectNotGraspedError")
+def switch_arm(designator, failure: ObjectNotGraspedError) -> List[RuleCandidate]:
+    if not isinstance(designator, PickUpAction) or designator.arm not in OTHER_ARM:
+        return []
+    other = OTHER_ARM[designator.arm]
+    return [RuleCandidate(
+        designator=designator.model_copy(update={"arm": other}),
+        score=0.9, rule="switch_arm",
+        reasons=[f"The {designator.arm.name.lower()} arm could not grasp {failure.obj.name}, it may be out of reach "
+                 f"or blocked on that side."],
+        solution=f"Retry the pick up with the {other.name.lower()} arm.",
+        updated_parameters=[{"arm": str(other)}])]
+
+@failure_rule("ObjectNotGraspedError")
+def rotate_approach(designator, failure: ObjectNotGraspedError) -> List[RuleCandidate]:
+    if not isinstance(designator, PickUpAction):
+        return []
+    failed = designator.grasp_description.approach_direction
+    candidates = []
+    for rank, approach in enumerate(a for a in SIDE_APPROACHES if a != failed):
+        grasp_description = designator.grasp_description.model_copy(update={"approach_direction": approach})
+        candidates.append(RuleCandidate(
+            designator=designator.model_copy(update={"grasp_description": grasp_description}),
+            score=round(0.8 - 0.1 * rank, 2), rule="rotate_approach",
+            reasons=[f"Approaching {failure.obj.name} from {failed.value} did not produce a stable grasp."],
+            solution=f"Approach {failure.obj.name} from {approach.value} instead.",
+            updated_parameters=[{"grasp_description.approach_direction": str(approach)}]))
+    return candidates
+
+@failure_rule("ObjectNotGraspedError")
+def toggle_gripper_rotation(designator, failure: ObjectNotGraspedError) -> List[RuleCandidate]:
+    if not isinstance(designator, PickUpAction):
+        return []
+    rotate = not designator.grasp_description.rotate_gripper
+    grasp_description = designator.grasp_description.model_copy(update={"rotate_gripper": rotate})
+    return [RuleCandidate(
+        designator=designator.model_copy(update={"grasp_description": grasp_description}),
+        score=0.4, rule="toggle_gripper_rotation",
+        reasons=[f"The gripper orientation may not match the shape of {failure.obj.name}."],
+        solution=f"Retry the grasp with rotate_gripper={rotate}.",
+        updated_parameters=[{"grasp_description.rotate_gripper": str(rotate)}])]
+
+
+@failure_rule("ObjectNotGraspedError")
+def ranked_grasp_search(designator, failure: ObjectNotGraspedError) -> List[RuleCandidate]:
+    """Searches the whole arm x approach x alignment x rotation space, ranked below the direct rules."""
+    if not isinstance(designator, PickUpAction) or not in_grasp_space(designator):
+        return []
+    candidates = []
+    for candidate, _ in top_k_pickup_candidates(designator, k=SEARCH_CANDIDATES):
+        grasp = candidate.grasp_description
+        candidates.append(RuleCandidate(
+            designator=candidate, score=SEARCH_CONFIDENCE, rule="ranked_grasp_search",
+            reasons=[f"The grasp configuration used for {failure.obj.name} failed."],
+            solution=f"Retry with the {candidate.arm.name.lower()} arm approaching from {grasp.approach_direction.value}.",
+            updated_parameters=[{"arm": str(candidate.arm)}, {"grasp_description": str(grasp)}]))
+    return candidates
+
+
+# --- ObjectStillInContact ---
+
+@failure_rule("ObjectStillInContact")
+def release_contact(designator, failure: ObjectStillInContact) -> List[RuleCandidate]:
+    """
+    The object was placed but is still touched by the arm, so the place itself stays as it is. The gripper
+    or arm step is inserted after it, which only a plan can express.
+    """
+    link_names = [link.name for link in failure.contact_links]
+    in_gripper = any(("gripper" in name or "finger" in name) for name in link_names)
+    open_gripper = RuleCandidate(
+        designator=SetGripperAction(gripper=failure.arm, motion=GripperState.OPEN),
+        score=0.9 if in_gripper else 0.6, rule="open_gripper",
+        reasons=[f"{failure.obj.name} is still held by the gripper links {link_names}."],
+        solution=f"Open the {failure.arm.name.lower()} gripper to release {failure.obj.name}.",
+        updated_parameters=[{"gripper": str(failure.arm)}, {"motion": "GripperState.OPEN"}], plan_insertion=True)
+    retract = RuleCandidate(
+        designator=ParkArmsAction(arm=failure.arm),
+        score=0.6 if in_gripper else 0.9, rule="retract_arm",
+        reasons=[f"The {failure.arm.name.lower()} arm links {link_names} still touch {failure.obj.name} after placing."],
+        solution=f"Retract the {failure.arm.name.lower()} arm away from {failure.obj.name}.",
+        updated_parameters=[{"arm": str(failure.arm)}], plan_insertion=True)
+    return [open_gripper, retract]
+
+
+# --- ObjectNotPlacedAtTargetLocation ---
+
+@failure_rule("ObjectNotPlacedAtTargetLocation")
+def offset_placing_pose(designator, failure: ObjectNotPlacedAtTargetLocation) -> List[RuleCandidate]:
+    if not isinstance(designator, PlaceAction):
+        return []
+    target = designator.target_location
+    candidates = []
+    for rank, (dx, dy, dz) in enumerate(PLACING_OFFSETS):
+        position = Vector3(x=target.position.x + dx, y=target.position.y + dy, z=target.position.z + dz)
+        target_location = PoseStamped(pose=Pose(position=position, orientation=target.orientation),
+                                      header=target.header)
+        candidates.append(RuleCandidate(
+            designator=designator.model_copy(update={"target_location": target_location}),
+            score=round(0.8 - 0.1 * rank, 2), rule="offset_placing_pose",
+            reasons=[f"{failure.obj.name} did not settle at {target.position.to_list()}, the surface there may be "
+                     f"occupied or uneven."],
+            solution=f"Place {failure.obj.name} at {position.to_list()} instead.",
+            updated_parameters=[{"target_location.pose.position": str(position.to_list())}]))
+    return candidates
+
+@failure_rule("ObjectNotPlacedAtTargetLocation")
+def ranked_placing_search(designator, failure: ObjectNotPlacedAtTargetLocation) -> List[RuleCandidate]:
+    """Searches a grid of placing offsets, avoiding positions that failed before for the same concept."""
+    if not isinstance(designator, PlaceAction):
+        return []
+    candidates = []
+    for candidate, _ in top_k_place_candidates(designator, k=SEARCH_CANDIDATES):
+        position = candidate.target_location.position.to_list()
+        candidates.append(RuleCandidate(
+            designator=candidate, score=SEARCH_CONFIDENCE, rule="ranked_placing_search",
+            reasons=[f"{failure.obj.name} did not settle at {designator.target_location.position.to_list()}."],
+            solution=f"Place {failure.obj.name} at {position} instead.",
+            updated_parameters=[{"target_location.pose.position": str(position)}]))
+    return candidates
+
+
+def record_failure_outcome(designator, failure):
+    """Counts the failed configuration in the outcome history, so the cost model avoids it next time."""
+    if isinstance(failure, ObjectNotGraspedError) and isinstance(designator, PickUpAction) \
+            and in_grasp_space(designator):
+        outcome_history.record_grasp(designator, success=False)
+    elif isinstance(failure, ObjectNotPlacedAtTargetLocation) and isinstance(designator, PlaceAction):
+        outcome_history.record_place_failure(designator)
+
+
+def record_failed_request(action_designator, reason_for_failure):
+    """
+    Parses the designator and failure of an accepted correction request and counts the failure once. Requests
+    whose designator or failure is not structured are not counted.
+    """
+    try:
+        designator, _ = parse_designator(action_designator)
+        failure, _ = parse_failure(reason_for_failure)
+    except ValueError:
+        return
+    if failure is not None:
+        record_failure_outcome(designator, failure)
+
+
+def candidate_cost(designator, candidate: RuleCandidate) -> float:
+    """Cost model cost of a candidate of the same action type as the failed designator, 0 for other actions."""
+    try:
+        if isinstance(designator, PickUpAction) and isinstance(candidate.designator, PickUpAction):
+            return pickup_candidate_cost(designator, candidate.designator)
+        if isinstance(designator, PlaceAction) and isinstance(candidate.designator, PlaceAction):
+            return place_candidate_cost(designator, candidate.designator)
+    except ValueError:
+        pass
+    return 0.0
+
+
+def rule_based_candidates(action_designator, reason_for_failure, plan_insertions: bool = False) -> List[RuleCandidate]:
+    """
+    Runs every rule registered for the failure type and returns the candidates ranked by score. Direct
+    and search candidates are ranked together: each rule's confidence is scaled by exp(-cost) of the
+    same cost model, so the outcome history reorders them.
+
+    Returns an empty list when the failure is unstructured or no rule applies.
+
+    :param plan_insertions: whether to keep candidates that add a step after the failed one instead of
+        replacing it, only a plan correction can use them
+    """
+    try:
+        designator, _ = parse_designator(action_designator)
+        failure, _ = parse_failure(reason_for_failure)
+    except ValueError:
+        return []
+    if failure is None:
+        return []
+
+    # Rules may propose the same designator, keep the best scored one
+    best: Dict[str, RuleCandidate] = {}
+    for rule in FAILURE_RULES.get(failure.failure_type, []):
+        for candidate in rule(designator, failure):
+            if candidate.plan_insertion and not plan_insertions:
+                continue
+            candidate.score = round(candidate.score * math.exp(-candidate_cost(designator, candidate)), 4)
+            key = repr(candidate.designator)
+            if key not in best or candidate.score > best[key].score:
+                best[key] = candidate
+    return sorted(best.values(), key=lambda c: c.score, reverse=True)
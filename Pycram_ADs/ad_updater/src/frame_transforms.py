@@ -0,0 +1,157 @@
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from ..resources.action_designators import *
+from .pose_geometry import (DEFAULT_FRAME, IDENTITY, PoseLike, compose_poses, frame_ids, invert_poses,
+                            normalize_quaternions, poses_to_arrays, with_pose)
+
+
+class UnknownTransform(LookupError):
+    """No chain of static transforms connects the two frames."""
+
+
+class TransformTree:
+    """
+    Static transforms between named frames, each frame given as a pose in its parent frame.
+
+    Transforms between two frames are composed along the chains up to their common root and cached,
+    least recently used first, so repeated conversions (every surface frame to "map") cost one lookup.
+    """
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        # child frame -> (parent frame, position (3,), orientation (4,))
+        self._parents: Dict[str, Tuple[str, np.ndarray, np.ndarray]] = {}
+        self._chains: "OrderedDict[Tuple[str, str], Tuple[np.ndarray, np.ndarray]]" = OrderedDict()
+        self._counters = {"hits": 0, "misses": 0, "evicted": 0}
+
+    def add_transform(self, frame: str, parent: str, position: Sequence[float],
+                      orientation: Optional[Sequence[float]] = None):
+        with self._lock:
+            self._parents[frame] = (parent, np.asarray(position, dtype=np.float64).reshape(3),
+                                    normalize_quaternions(orientation if orientation is not None else IDENTITY))
+            # Any cached chain may pass through the changed frame
+            self._chains.clear()
+
+    def frames(self) -> List[str]:
+        with self._lock:
+            return sorted(set(self._parents) | {parent for parent, _, _ in self._parents.values()})
+
+    def _to_root(self, frame: str) -> Tuple[str, np.ndarray, np.ndarray]:
+        """Root of frame's chain and the pose of frame in it."""
+        position, orientation, seen = np.zeros(3), IDENTITY, set()
+        while frame in self._parents:
+            if frame in seen:
+                raise UnknownTransform(f"transform cycle through '{frame}'")
+            seen.add(frame)
+            parent, parent_position, parent_orientation = self._parents[frame]
+            position, orientation = compose_poses(parent_position, parent_orientation, position, orientation)
+            frame = parent
+        return frame, position, orientation
+
+    def lookup(self, source: str, target: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Transform (position, orientation) mapping poses in the source frame to the target frame."""
+        if source == target:
+            return np.zeros(3), IDENTITY
+        key = (source, target)
+        with self._lock:
+            chain = self._chains.get(key)
+            if chain is not None:
+                self._chains.move_to_end(key)
+                self._counters["hits"] += 1
+                return chain
+            self._counters["misses"] += 1
+            source_root, source_position, source_orientation = self._to_root(source)
+            target_root, target_position, target_orientation = self._to_root(target)
+            if source_root != target_root:
+                raise UnknownTransform(f"no transform from '{source}' to '{target}'")
+            chain = compose_poses(*invert_poses(target_position, target_orientation), source_position,
+                                  source_orientation)
+            if self.max_entries > 0:
+                self._chains[key] = chain
+                while len(self._chains) > self.max_entries:
+                    self._chains.popitem(last=False)
+                    self._counters["evicted"] += 1
+        return chain
+
+    def transform_arrays(self, positions: np.ndarray, orientations: np.ndarray, sources: Sequence[str],
+                         targets: Sequence[str]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Rows moved from their source to their target frame, one vectorized step per (source, target) pair.
+
+        :return: positions, orientations, mask of the rows that could be transformed (the others are unchanged)
+        """
+        positions = np.array(positions, dtype=np.float64).reshape(-1, 3)
+        orientations = np.array(orientations, dtype=np.float64).reshape(-1, 4)
+        known = np.ones(len(positions), dtype=bool)
+        pairs = np.array([f"{s}\0{t}" for s, t in zip(sources, targets)], dtype=object)
+        for pair in set(pairs.tolist()):
+            source, target = pair.split("\0")
+            if source == target:
+                continue
+            rows = pairs == pair
+            try:
+                chain_position, chain_orientation = self.lookup(source, target)
+            except UnknownTransform:
+                known[rows] = False
+                continue
+            positions[rows], orientations[rows] = compose_poses(chain_position, chain_orientation, positions[rows],
+                                                                orientations[rows])
+        return positions, orientations, known
+
+    def transform_poses(self, poses: Sequence[PoseLike], target_frame: str = DEFAULT_FRAME) -> List[PoseLike]:
+        """
+        The poses expressed in target_frame. Poses already there are returned as they are; header-less poses
+        (Pose, PoseStampedModel) keep their type when the target is the default frame, everything else
+        becomes a PoseStamped in target_frame.
+        """
+        sources = frame_ids(poses)
+        positions, orientations = poses_to_arrays(poses)
+        positions, orientations, known = self.transform_arrays(positions, orientations, sources,
+                                                               [target_frame] * len(poses))
+        if not known.all():
+            missing = sorted({source for source, ok in zip(sources, known) if not ok})
+            raise UnknownTransform(f"no transform from {missing} to '{target_frame}'")
+
+        transformed = []
+        for pose, source, position, orientation in zip(poses, sources, positions, orientations):
+            if source == target_frame:
+                transformed.append(pose)
+            elif isinstance(pose, PoseStamped):
+                transformed.append(with_pose(pose, position, orientation).model_copy(
+                    update={"header": pose.header.model_copy(update={"frame_id": target_frame})}))
+            else:
+                transformed.append(with_pose(PoseStamped(header=Header(frame_id=target_frame)), position, orientation))
+        return transformed
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._counters["hits"] + self._counters["misses"]
+            return {**self._counters, "frames": len(self._parents), "cached_chains": len(self._chains),
+                    "max_entries": self.max_entries,
+                    "hit_rate": round(self._counters["hits"] / lookups, 3) if lookups else None}
+
+
+def load_transforms(path: Optional[str], max_entries: int = 1024) -> TransformTree:
+    """
+    Static transforms from a JSON file, each frame as a pose in its parent frame:
+    {"table": {"parent": "map", "position": [x, y, z], "orientation": [x, y, z, w]}}.
+    Without it, only poses in the same frame can be compared.
+    """
+    tree = TransformTree(max_entries)
+    if not path or not os.path.exists(path):
+        return tree
+    with open(path) as f:
+        raw = json.load(f)
+    for frame, transform in raw.items():
+        tree.add_transform(frame, transform.get("parent", DEFAULT_FRAME), transform.get("position", [0.0, 0.0, 0.0]),
+                           transform.get("orientation"))
+    return tree
+
+
+transform_tree = load_transforms(os.getenv("FRAME_TRANSFORMS_PATH"),
+                                 max_entries=int(os.getenv("FRAME_TRANSFORM_CACHE_SIZE", "1024")))
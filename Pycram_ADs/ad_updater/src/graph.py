@@ -13,6 +13,16 @@ from .global_custom_state import *
 from ..resources.prompts.template_prompts import *
 from .input_parser import *
 from .instruct_agent import *
+from ..resources.concepts import *
+from .concept_index import concept_index, object_terms
+from .designator_normalizer import normalize_designator, render_designator
+from .deadlines import DeadlineExceeded
+from .structured_repair import invoke_structured
+from .correction_history import (correction_history, format_context_examples, format_reasoner_examples,
+                                 recording_enabled, similar_corrections)
+from .incremental import node_cache
+from .pose_geometry import check_updated_poses
+from .frame_transforms import transform_tree
 
 import re
 
@@ -25,17 +35,6 @@ action_classes = [PickUpAction, NavigateAction, PlaceAction, SetGripperAction, L
 
 failure_reasons = [ObjectNotGraspedError,ObjectStillInContact,ObjectNotPlacedAtTargetLocation]
 
-Concepts = [
-    "World", "Floor", "Milk", "Robot", "Cereal", "Kitchen", "Food", "Fruit", "Apple",
-    "Environment", "Apartment", "Cup", "Spoon", "Bowl", "PreferredGraspAlignment",
-    "XAxis", "YAxis", "NoAlignment", "Truthy", "Falsy", "Cabinet", "Washer",
-    "Drawer", "Refrigerator", "Sink", "Door", "Cutting", "Pouring", "Handle", "Link",
-    "PhysicalObject", "PouringTool", "CuttingTool", "MixingTool", "Agent", "Human",
-    "Room", "Location", "Container", "Joint", "ContinuousJoint", "HingeJoint",
-    "FixedJoint", "MovableJoint", "FloatingJoint", "PlanarJoint", "PrismaticJoint",
-    "RevoluteJoint", "DesignedFurniture", "Surface", "PhysicalTask", "Action", "Event",
-    "Entity", "Task", "RootLink", "Supporter", "SupportedObject"
-]
 
 class FailureSolution(BaseModel):
     """
@@ -73,7 +72,18 @@ class CustomStateInternal(AgentState):
     ad_instruction : str
     ad_human_instruction : str
 
+def paraphrase_node(state: CustomStateInternal):
+    """The designator as a human instruction, independent of the failure and the comment."""
+    ad_human_instruction = ""
+    if str(state['action_designator']) != "":
+        ad_human_instruction = human_instruction(state['action_designator'])
+    return {"ad_human_instruction": ad_human_instruction}
+
 def failure_reasoner_node(state: CustomStateInternal):
+    """
+    Diagnoses the failure from the designator and the failure alone. The human comment is applied by the
+    contexter, so follow-up comments on the same failure reuse this diagnosis.
+    """
     print("INSIDE ANALYZER NODE")
 
     # Initialize variables
@@ -85,11 +95,7 @@ def failure_reasoner_node(state: CustomStateInternal):
     # Extract inputs from state
     action_designator1 = state['action_designator']
     reason_for_failure1 = state['reason_for_failure']
-    human_comment1 = state['human_comment']
-
-    ad_human_instruction = ""
-    if str(action_designator1) != "":
-        ad_human_instruction = instructor_node(str(action_designator1))
+    ad_human_instruction = paraphrase_node(state)["ad_human_instruction"]
 
 
     # # --- Parse failure reason ---
@@ -144,16 +150,20 @@ def failure_reasoner_node(state: CustomStateInternal):
     # ad_instance, action_cls = parse_designator(action_designator1)
 
     # original_action_designator = str(ad_instance)
-    original_action_designator = state['action_designator']
+    original_action_designator = render_designator(state['action_designator'])
 
     # structured_ollama = ollama_llm.with_structured_output(action_cls, method="json_schema")
 
     # --- Invoke analyzer chain ---
+    # Nearest past corrections as few-shot examples
+    examples = format_reasoner_examples(similar_corrections(action_designator1, reason_for_failure1, ""))
+
     chain = failure_reasoner_prompt | ollama_llm
     response = chain.invoke({
         "action_designator": original_action_designator,
-        "reason_for_failure": reason_for_failure1 + f"Error Message: {error_message}",
-        "human_comment": human_comment1
+        "reason_for_failure": render_designator(reason_for_failure1) + f"Error Message: {error_message}",
+        "human_comment": "",
+        "examples": examples
     })
 
     # --- Extract reasoning from <think> tags ---
@@ -200,10 +210,21 @@ def context_facilitator_node(state: CustomStateInternal):
 
     chain = context_prompt | ollama_llm
 
+    # Only the concepts relevant to this request go into the prompt, not the whole ontology list
+    try:
+        designator, _ = parse_designator(state['action_designator'])
+    except ValueError:
+        designator = None
+    relevant_concepts = concept_index.top_k(" ".join(object_terms(designator) + [human_comment1]))
+
+    examples = format_context_examples(similar_corrections(state['action_designator'], state['reason_for_failure'],
+                                                           human_comment1))
+
     response = chain.invoke({"parameters_to_update" : parameters_to_update1,
                              "update_reasons" : update_reasons1,
                              "human_comment" : human_comment1,
-                             "concepts" : Concepts})
+                             "concepts" : relevant_concepts,
+                             "examples" : examples})
 
     # --- Extract reasoning from <think> tags ---
     match = re.search(r"<think>(.*?)</think>", response.content, flags=re.DOTALL)
@@ -237,7 +258,6 @@ def updater_node(state: CustomStateInternal):
     # Initialize variables
     structured_ollama = None
     updater_prompt = ChatPromptTemplate.from_template(updater_prompt_template_gemini)
-    clean_prompt = ChatPromptTemplate.from_template(clean_prompt_template)
     original_action_designator = ""
 
     # Extract inputs from state
@@ -259,28 +279,30 @@ def updater_node(state: CustomStateInternal):
     ad_instance, action_cls = parse_designator(action_designator1)
 
     original_action_designator = str(ad_instance)
-    structured_ollama = ollama_llm.with_structured_output(action_cls, method="json_schema")
-
-    chain = updater_prompt | structured_ollama
-
-    # Final Output Shaper
 
-    response = chain.invoke({
-        "action_designator": action_designator1,
+    # Final Output Shaper, answers that fail validation are repaired instead of failing the request
+    response = invoke_structured(updater_prompt, {
+        "action_designator": render_designator(action_designator1),
         "updated_parameters": updated_parameters1,
         "update_parameters_reasons": update_parameters_reasons1
-    })
+    }, action_cls)
 
     print("Model Response:", response)
 
-    # chain2 = clean_prompt | ollama_llm
-    # cleaner_response = chain2.invoke({"class_ref" : str(state['action_designator']),
-    #                "class_response" : response})
+    concept_repairs = concept_index.repair(response)
+    if concept_repairs:
+        print("Repaired concepts:", concept_repairs)
+
+    # Keep only the parameters of the original designator, locally instead of the clean_prompt LLM pass
+    response = normalize_designator(ad_instance, response)
+
+    response, pose_problems = check_updated_poses(ad_instance, response, transform_tree)
+    if pose_problems:
+        print("Pose check:", pose_problems)
 
     # --- Return updated action designator ---
     return {
         "updated_action_designator": response
-        # "updated_action_designator": cleaner_response.content
     }
 
 
@@ -288,9 +310,17 @@ def updater_node(state: CustomStateInternal):
 
 graph_builder = StateGraph(CustomStateInternal)
 
-graph_builder.add_node("failure_reasoner", failure_reasoner_node)
-graph_builder.add_node("contexter", context_facilitator_node)
-graph_builder.add_node("updater", updater_node)
+# Within a session, nodes whose inputs did not change reuse their last output. The diagnosis does not
+# depend on the comment, so a follow-up comment only reruns the contexter (where the comment takes
+# precedence) and the updater.
+REASONER_INPUTS = ("action_designator", "reason_for_failure")
+graph_builder.add_node("failure_reasoner", node_cache.incremental(
+    "failure_reasoner", failure_reasoner_node, REASONER_INPUTS))
+graph_builder.add_node("contexter", node_cache.incremental(
+    "contexter", context_facilitator_node,
+    ("action_designator", "reason_for_failure", "parameters_to_update", "failure_reasons_solutions", "human_comment")))
+graph_builder.add_node("updater", node_cache.incremental(
+    "updater", updater_node, ("action_designator", "updated_parameters", "update_parameters_reasons")))
 
 graph_builder.set_entry_point("failure_reasoner")
 graph_builder.add_edge("failure_reasoner", "contexter")
@@ -300,33 +330,56 @@ graph_builder.add_edge("updater", END)
 sole = graph_builder.compile(checkpointer=ad_memory)
 
 
+def correct_designator(failed_action_designator, error="", human_comment="") -> dict:
+    """
+    Runs one failed designator through sole and records the outcome in the correction history, unless
+    recording is paused.
+
+    :return: the final sole state values (parameters_to_update, failure_reasons_solutions, updated_parameters,
+        update_parameters_reasons, updated_action_designator, ad_human_instruction)
+    """
+    config = {"configurable": {"thread_id": 1}}
+
+    # Streamed so the node outputs finished before a missed deadline can be returned as a partial result
+    completed = {}
+    try:
+        for update in sole.stream({"action_designator": failed_action_designator, "reason_for_failure": error,
+                                   "human_comment" : human_comment}, config = config, stream_mode="updates"):
+            for node_output in update.values():
+                completed.update(node_output)
+    except DeadlineExceeded as e:
+        e.partial.update(completed)
+        raise
+
+    values = sole.get_state(config).values
+
+    if recording_enabled():
+        try:
+            correction_history.record(failed_action_designator, error, human_comment, values["parameters_to_update"],
+                                      values["failure_reasons_solutions"], values["updated_parameters"],
+                                      values["updated_action_designator"])
+        except Exception as e:
+            print(f"Could not record correction: {e}")
+
+    return values
+
+
 def designator_corrector_node(state : CustomState):
 
     failed_action_designator = state['action_designator']
     error = state.get("reason_for_failure","")
     human_comment = state.get("human_comment","")
 
-
-    config = {"configurable": {"thread_id": 1}}
-
-    result = sole.invoke({"action_designator": failed_action_designator, "reason_for_failure": error,
-             "human_comment" : human_comment}, config = config, stream_mode="updates")
-
-    update_parameters_reasons = sole.get_state(config).values["update_parameters_reasons"]
-    updated_parameters = sole.get_state(config).values["updated_parameters"]
-    updated_action_designator = sole.get_state(config).values["updated_action_designator"]
-    failure_reasons_solutions = sole.get_state(config).values["failure_reasons_solutions"]
-    parameters_to_update = sole.get_state(config).values["parameters_to_update"]
-    ad_human_instruction = sole.get_state(config).values["ad_human_instruction"]
+    values = correct_designator(failed_action_designator, error, human_comment)
 
     return Command(
         update= {
-            "parameters_to_update" : parameters_to_update,
-            "failure_reasons_solutions" : failure_reasons_solutions,
-            "update_parameters_reasons" : update_parameters_reasons,
-            "updated_parameters" : updated_parameters,
-            "updated_action_designator" : updated_action_designator,
-            "human_instruction" : ad_human_instruction
+            "parameters_to_update" : values["parameters_to_update"],
+            "failure_reasons_solutions" : values["failure_reasons_solutions"],
+            "update_parameters_reasons" : values["update_parameters_reasons"],
+            "updated_parameters" : values["updated_parameters"],
+            "updated_action_designator" : values["updated_action_designator"],
+            "human_instruction" : values["ad_human_instruction"]
         },
         goto=END
     )
@@ -0,0 +1,112 @@
+import copy
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Callable, Optional, Tuple
+from .designator_normalizer import render_designator
+from .single_flight import canonical_request_hash
+
+# Session of the request running in this context, None for one-off requests (nothing is reused)
+_current_session: ContextVar[Optional[str]] = ContextVar("current_session", default=None)
+
+
+def current_session() -> Optional[str]:
+    return _current_session.get()
+
+
+@contextmanager
+def session_scope(session_id: Optional[str]):
+    """Makes session_id visible to the graph nodes run in this context."""
+    token = _current_session.set(session_id)
+    try:
+        yield
+    finally:
+        _current_session.reset(token)
+
+
+def input_hash(state: dict, keys: Tuple[str, ...]) -> str:
+    """Hash of the state values a node reads, with designators in their byte-stable rendering."""
+    return canonical_request_hash({key: render_designator(state.get(key, "")) for key in keys})
+
+
+class NodeCache:
+    """
+    Per-session memo of graph node outputs, keyed by a hash of the inputs each node reads.
+
+    Operators often send several comments for the same failed designator. Within a session, a node
+    whose inputs hash the same as on its last run returns its previous output instead of calling the
+    LLM again, so only the stages downstream of what actually changed are rerun. Sessions are evicted
+    least recently used first, and after ttl seconds without a request.
+    """
+
+    def __init__(self, max_sessions: int = 256, ttl: float = 3600.0):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        # session_id -> (last used, {node: (input hash, output)})
+        self._sessions: "OrderedDict[str, Tuple[float, dict]]" = OrderedDict()
+        self._counters = {"hits": 0, "misses": 0, "evicted_sessions": 0}
+        self._node_counters = {}
+
+    def _evict(self, now: float):
+        while self._sessions:
+            session_id, (last_used, _) = next(iter(self._sessions.items()))
+            if len(self._sessions) <= self.max_sessions and now - last_used <= self.ttl:
+                break
+            del self._sessions[session_id]
+            self._counters["evicted_sessions"] += 1
+
+    def get(self, session_id: str, node: str, digest: str) -> Optional[dict]:
+        with self._lock:
+            now = time.time()
+            self._evict(now)
+            entry = self._sessions.get(session_id)
+            cached = entry[1].get(node) if entry is not None else None
+            hit = cached is not None and cached[0] == digest
+            counter = "hits" if hit else "misses"
+            self._counters[counter] += 1
+            self._node_counters.setdefault(node, {"hits": 0, "misses": 0})[counter] += 1
+            if entry is not None:
+                self._sessions[session_id] = (now, entry[1])
+                self._sessions.move_to_end(session_id)
+        return copy.deepcopy(cached[1]) if hit else None
+
+    def put(self, session_id: str, node: str, digest: str, output: dict):
+        with self._lock:
+            now = time.time()
+            nodes = self._sessions.pop(session_id, (now, {}))[1]
+            nodes[node] = (digest, copy.deepcopy(output))
+            self._sessions[session_id] = (now, nodes)
+            self._evict(now)
+
+    def incremental(self, name: str, node_fn: Callable[[dict], dict], inputs: Tuple[str, ...]) -> Callable[[dict], dict]:
+        """Wraps a graph node so it is skipped when its inputs are unchanged within the current session."""
+
+        @wraps(node_fn)
+        def node(state):
+            session_id = current_session()
+            if session_id is None:
+                return node_fn(state)
+            digest = input_hash(state, inputs)
+            output = self.get(session_id, name, digest)
+            if output is not None:
+                print(f"Reusing {name} output for session {session_id}")
+                return output
+            output = node_fn(state)
+            self.put(session_id, name, digest, output)
+            return output
+
+        return node
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self._counters, "sessions": len(self._sessions),
+                    "nodes": {node: dict(counts) for node, counts in self._node_counters.items()}}
+
+
+node_cache = NodeCache(max_sessions=int(os.getenv("SESSION_CACHE_SIZE", "256")),
+                       ttl=float(os.getenv("SESSION_TTL_S", "3600")))
@@ -15,8 +15,12 @@ action_classes = [PickUpAction, NavigateAction, PlaceAction, SetGripperAction, L
                   OpenAction, CloseAction, GraspingAction, ReachToPickUpAction, TransportAction,
                     SearchAction, FaceAtAction]
 
-def parse_designator(designator: str) -> Tuple[parsed_ad_type, type]:
+def parse_designator(designator: Union[str, parsed_ad_type]) -> Tuple[parsed_ad_type, type]:
     try:
+        # Designators decoded from the JSON wire format are already instances
+        if isinstance(designator, tuple(action_classes)):
+            return designator, type(designator)
+
         if isinstance(designator, str):
             ad = eval(designator)
             # print("eval designator arm: ", ad.arm)
@@ -42,8 +46,11 @@ def parse_designator(designator: str) -> Tuple[parsed_ad_type, type]:
         raise ValueError("Unknown Action Designator")
 
 
-def parse_failure(failure: str) -> Tuple[failure_class_type, str]:
+def parse_failure(failure: Union[str, failure_class_type]) -> Tuple[failure_class_type, str]:
     try:
+        if isinstance(failure, tuple(failure_reasons)):
+            return failure, failure.args[0] if failure.args else ""
+
         if not isinstance(failure, str):
             raise TypeError("Input failure must be a string")
 
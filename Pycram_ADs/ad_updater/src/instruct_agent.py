@@ -1,8 +1,15 @@
 from langchain_core.prompts import ChatPromptTemplate
 from ..llm_configuration import *
+import os
 import re
 from pydantic import BaseModel, Field
 from ..llm_configuration import *
+from ..resources.action_designators import render_instruction
+from .input_parser import parse_designator
+from .designator_normalizer import render_designator
+
+# "template" renders the instruction locally from INSTRUCTION_TEMPLATES, "fluent" asks the LLM for it
+INSTRUCTION_RENDERER = os.getenv("INSTRUCTION_RENDERER", "template")
 
 
 class InstructionModel(BaseModel):
@@ -91,6 +98,20 @@ def instructor_node(action_designator: str):
     print(cleaner_instruction)
     return {'ad_instruction' : cleaner_instruction}
 
+def human_instruction(action_designator) -> dict:
+    """
+    {'ad_instruction': ...} for a designator (instance or source string), from its template unless
+    INSTRUCTION_RENDERER is "fluent". Designators that cannot be rendered locally go to the LLM.
+    """
+    if INSTRUCTION_RENDERER != "fluent":
+        try:
+            instruction = render_instruction(parse_designator(action_designator)[0])
+        except ValueError:
+            instruction = ""
+        if instruction:
+            return {'ad_instruction' : instruction}
+    return instructor_node(render_designator(action_designator))
+
 if __name__ == '__main__':
     place_designator = """PlaceAction(object_designator=Object(name='apple',concept='Apple', color='red'), target_location= PoseStamped(pose=Pose(position=Vector3(x=1.0, y=2.0, z=3.0),
     orientation=Quaternion(x=0.0, y=0.0, z=0.0, w=1.0))), arm=Arms.LEFT)"""
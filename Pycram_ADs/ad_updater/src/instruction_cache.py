@@ -0,0 +1,139 @@
+import copy
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+# Articles and politeness words, which never change what the robot has to do. Anything that could name
+# an object ("can") or the referent ("this", "that") stays in the key.
+STOPWORDS = {"a", "an", "the", "please", "pls", "kindly", "thanks", "thank"}
+
+# Polite openings ("could you ...", "robot, ...") dropped from the start of an instruction only
+POLITE_PREFIXES = [("can", "you"), ("could", "you"), ("would", "you"), ("will", "you"), ("robot",)]
+
+# Irregular and common verb forms of instructions, mapped to the base verb
+VERB_LEMMAS = {"took": "take", "taken": "take", "taking": "take", "takes": "take",
+               "put": "put", "puts": "put", "putting": "put",
+               "picked": "pick", "picking": "pick", "picks": "pick",
+               "placed": "place", "placing": "place", "places": "place",
+               "grabbed": "grab", "grabbing": "grab", "grabs": "grab",
+               "got": "get", "getting": "get", "gets": "get",
+               "brought": "bring", "bringing": "bring", "brings": "bring",
+               "moved": "move", "moving": "move", "moves": "move",
+               "opened": "open", "opening": "open", "opens": "open",
+               "closed": "close", "closing": "close", "closes": "close",
+               "carried": "carry", "carrying": "carry", "carries": "carry",
+               "went": "go", "going": "go", "goes": "go",
+               "navigated": "navigate", "navigating": "navigate", "navigates": "navigate",
+               "lifted": "lift", "lifting": "lift", "lifts": "lift",
+               "set": "set", "sets": "set", "setting": "set"}
+
+# Verb particles that do not change the action ("pick up the cup" == "pick the cup")
+PHRASAL_VERBS = {("pick", "up"): "pick", ("put", "down"): "put", ("lift", "up"): "lift"}
+
+
+def normalize_instruction(instruction: str) -> str:
+    """
+    Cache key of an instruction: lower case, no punctuation, articles and politeness words dropped and
+    verbs lemmatized, so "Could you pick up the cup from the table?" and "pick the cup from the table"
+    share an entry.
+    """
+    words = re.findall(r"[a-z0-9]+", str(instruction).lower())
+    stripped = True
+    while stripped:
+        stripped = False
+        for prefix in POLITE_PREFIXES:
+            if len(words) > len(prefix) and tuple(words[:len(prefix)]) == prefix:
+                words, stripped = words[len(prefix):], True
+    words = [VERB_LEMMAS.get(word, word) for word in words]
+    normalized = []
+    for word in words:
+        if normalized and (normalized[-1], word) in PHRASAL_VERBS:
+            normalized[-1] = PHRASAL_VERBS[(normalized[-1], word)]
+            continue
+        if word not in STOPWORDS:
+            normalized.append(word)
+    return " ".join(normalized)
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries also expire ttl seconds after they were stored."""
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._counters = {"hits": 0, "misses": 0, "expired": 0, "evicted": 0}
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[0] > self.ttl:
+                del self._entries[key]
+                self._counters["expired"] += 1
+                entry = None
+            if entry is None:
+                self._counters["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._counters["hits"] += 1
+        # Callers may modify the returned models (concept repair, formatting)
+        return copy.deepcopy(entry[1])
+
+    def put(self, key: str, value: Any):
+        if self.max_entries <= 0:
+            return
+        value = copy.deepcopy(value)
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._counters["evicted"] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._counters["hits"] + self._counters["misses"]
+            return {**self._counters, "size": len(self._entries), "max_entries": self.max_entries, "ttl": self.ttl,
+                    "hit_rate": round(self._counters["hits"] / lookups, 3) if lookups else None}
+
+
+class InstructionCache:
+    """
+    Results of pysole for normalized instructions, in two tiers: the model names chosen by the selector
+    node, and the fully populated Actions. A populated hit answers the instruction without any LLM call,
+    a selector hit still saves the selector call when the populated entry has expired or was evicted.
+    """
+
+    def __init__(self, selector: TTLCache, actions: TTLCache, enabled: bool = True):
+        self.selector = selector
+        self.actions = actions
+        self.enabled = enabled
+
+    def get_model_names(self, instruction: str) -> Optional[str]:
+        return self.selector.get(normalize_instruction(instruction)) if self.enabled else None
+
+    def put_model_names(self, instruction: str, model_names: str):
+        if self.enabled:
+            self.selector.put(normalize_instruction(instruction), model_names)
+
+    def get_actions(self, instruction: str):
+        return self.actions.get(normalize_instruction(instruction)) if self.enabled else None
+
+    def put_actions(self, instruction: str, actions):
+        # Empty answers are usually a failed generation, not worth repeating
+        if self.enabled and getattr(actions, "models", None):
+            self.actions.put(normalize_instruction(instruction), actions)
+
+    def stats(self) -> dict:
+        return {"enabled": self.enabled, "selector": self.selector.stats(), "actions": self.actions.stats()}
+
+
+instruction_cache = InstructionCache(
+    selector=TTLCache(int(os.getenv("SELECTOR_CACHE_SIZE", "4096")), float(os.getenv("SELECTOR_CACHE_TTL_S", "86400"))),
+    actions=TTLCache(int(os.getenv("INSTRUCTION_CACHE_SIZE", "1024")),
+                     float(os.getenv("INSTRUCTION_CACHE_TTL_S", "3600"))),
+    enabled=os.getenv("INSTRUCTION_CACHE", "1") == "1")
@@ -0,0 +1,257 @@
+import json
+import os
+import re
+import threading
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from ..resources.action_designators import *
+from .concept_index import COLORS, concept_index
+from .instruction_cache import normalize_instruction
+from .pycram_agent import Actions
+
+# Instructions parsed with a lower confidence go to the LLM graph
+MIN_CONFIDENCE = float(os.getenv("INSTRUCTION_PARSER_MIN_CONFIDENCE", "0.7"))
+
+# Values used for required parameters the instruction does not mention, as PyCRAM does
+DEFAULT_ARM = Arms.LEFT
+DEFAULT_APPROACH = Grasp.FRONT
+DEFAULT_PREPOSE_DISTANCE = 0.03
+
+# Confidence factor per parameter filled with a default, and for placing at the origin of the surface frame
+DEFAULT_FACTOR = 0.95
+SURFACE_FRAME_FACTOR = 0.9
+
+VERBS = {"pick": "pick", "grab": "pick", "take": "pick", "get": "pick", "lift": "pick", "fetch": "pick",
+         "open": "open",
+         "place": "place", "put": "place", "set": "place", "drop": "place",
+         "go": "navigate", "navigate": "navigate", "drive": "navigate", "move": "navigate"}
+
+PREPOSITIONS = {"from", "on", "onto", "in", "into", "at", "to", "with", "using", "inside"}
+PLACE_PREPOSITIONS = {"on", "onto", "in", "into", "at", "inside"}
+
+ARM_WORDS = {"left": Arms.LEFT, "right": Arms.RIGHT, "both": Arms.BOTH}
+ARM_NOUNS = {"arm", "arms", "hand", "hands", "gripper", "grippers"}
+APPROACH_WORDS = {"front": Grasp.FRONT, "back": Grasp.BACK, "left": Grasp.LEFT, "right": Grasp.RIGHT,
+                  "side": Grasp.FRONT}
+VERTICAL_WORDS = {"top": Grasp.TOP, "above": Grasp.TOP, "bottom": Grasp.BOTTOM, "below": Grasp.BOTTOM}
+
+PRONOUNS = {"it", "them"}
+
+CLAUSE_SEPARATOR = re.compile(r"\band then\b|\band\b|\bthen\b|[,;]|\.(?!\d)")
+NUMBER = re.compile(r"-?\d+(?:\.\d+)?")
+
+
+class ParseResult(NamedTuple):
+    actions: Optional[Actions]
+    confidence: float
+    reason: str
+
+
+class ParseError(ValueError):
+    """The instruction does not have one of the supported shapes."""
+
+
+def load_locations(path: Optional[str]) -> Dict[str, PoseStampedModel]:
+    """
+    Named navigation goals from a JSON file: {"kitchen": {"position": [x, y, z], "orientation": [x, y, z, w]}}
+    or {"kitchen": [x, y, z]}. Without it, "go to" only accepts coordinates.
+    """
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        raw = json.load(f)
+    return {normalize_instruction(name): PoseStampedModel(position=value) if isinstance(value, list)
+            else PoseStampedModel(**value) for name, value in raw.items()}
+
+
+class InstructionParser:
+    """
+    Builds Actions for the common instruction shapes without the LLM:
+
+        pick up the [color] <object> [from the <surface>] [with the <left|right> arm] [from the <top|front|...>]
+        open the <container> [with the <left|right> arm]
+        place|put (it | the [color] <object>) on|in the <surface> [with the <left|right> arm]
+        go|navigate to (<named location> | <x> <y> [<z>])
+
+    Clauses can be chained with "and" / "then", "it" refers to the object of the previous clause, and a
+    clause without an arm uses the arm of the one before.
+    Objects and surfaces must resolve to a concept without fuzzy matching. Anything else raises
+    ParseError, so it goes to the LLM graph.
+    """
+
+    def __init__(self, locations: Dict[str, PoseStampedModel] = None, min_confidence: float = MIN_CONFIDENCE):
+        self.locations = locations or {}
+        self.min_confidence = min_confidence
+        self._lock = threading.Lock()
+        self._counters = {"parsed_locally": 0, "no_match": 0, "low_confidence": 0}
+
+    def _object(self, words: List[str]) -> Tuple[Object, float]:
+        colors = [w for w in words if w in COLORS]
+        nouns = [w for w in words if w not in COLORS]
+        # "orange" alone is the fruit
+        if not nouns and colors:
+            nouns, colors = colors[-1:], colors[:-1]
+        if not nouns or len(colors) > 1:
+            raise ParseError(f"no object in '{' '.join(words)}'")
+        # Relations, negations and pronouns ("apple out of bowl", "me milk") are not part of an object name
+        unknown = [w for w in nouns[:-1] if not concept_index.is_modifier(w)]
+        if unknown:
+            raise ParseError(f"'{' '.join(unknown)}' in '{' '.join(words)}' does not describe an object")
+        name = " ".join(nouns)
+        match = concept_index.resolve(name, fuzzy=False)
+        if match is None:
+            raise ParseError(f"unknown object '{name}'")
+        return Object(name=name, concept=match.concept, color=colors[0] if colors else None), match.score
+
+    def _modifiers(self, words: List[str]) -> Tuple[Optional[Arms], Optional[Grasp], Optional[Grasp]]:
+        """Arm and grasp of "with the left arm" / "from the top" phrases, which must cover all words."""
+        arm = approach = vertical = None
+        i = 0
+        while i < len(words):
+            word = words[i]
+            if word in ("with", "using") and i + 2 < len(words) and words[i + 1] in ARM_WORDS \
+                    and words[i + 2] in ARM_NOUNS:
+                arm, i = ARM_WORDS[words[i + 1]], i + 3
+            elif word == "from" and i + 1 < len(words) and words[i + 1] in VERTICAL_WORDS:
+                vertical, i = VERTICAL_WORDS[words[i + 1]], i + 2
+            elif word == "from" and i + 1 < len(words) and words[i + 1] in APPROACH_WORDS:
+                approach, i = APPROACH_WORDS[words[i + 1]], i + 2
+            else:
+                raise ParseError(f"unexpected '{' '.join(words[i:])}'")
+        return arm, approach, vertical
+
+    @staticmethod
+    def _split(words: List[str], stop: set) -> Tuple[List[str], List[str]]:
+        for i, word in enumerate(words):
+            if word in stop:
+                return words[:i], words[i:]
+        return words, []
+
+    @staticmethod
+    def _arm(arm: Optional[Arms], previous_arm: Optional[Arms]) -> Tuple[Arms, float]:
+        """The given arm, else the one of an earlier clause (it still holds the object), else the default."""
+        if arm is not None:
+            return arm, 1.0
+        if previous_arm is not None:
+            return previous_arm, 1.0
+        return DEFAULT_ARM, DEFAULT_FACTOR
+
+    def _pick(self, words: List[str], previous_arm: Optional[Arms]) -> Tuple[PickUpAction, float]:
+        object_words, rest = self._split(words, PREPOSITIONS)
+        obj, confidence = self._object(object_words)
+        # "from the table" names where the object is, PickUpAction has no field for it
+        if len(rest) >= 2 and rest[0] == "from" and rest[1] not in VERTICAL_WORDS and rest[1] not in APPROACH_WORDS:
+            surface_words, rest = self._split(rest[1:], PREPOSITIONS)
+            self._object(surface_words)
+        arm, approach, vertical = self._modifiers(rest)
+        arm, arm_factor = self._arm(arm, previous_arm)
+        confidence *= arm_factor * (DEFAULT_FACTOR if approach is None else 1.0)
+        return PickUpAction(object_designator=obj, arm=arm,
+                            grasp_description=GraspDescription(approach_direction=approach or DEFAULT_APPROACH,
+                                                               vertical_alignment=vertical)), confidence
+
+    def _open(self, words: List[str], previous_arm: Optional[Arms]) -> Tuple[OpenAction, float]:
+        object_words, rest = self._split(words, PREPOSITIONS)
+        obj, confidence = self._object(object_words)
+        arm, approach, vertical = self._modifiers(rest)
+        if approach is not None or vertical is not None:
+            raise ParseError("grasp given for open")
+        arm, arm_factor = self._arm(arm, previous_arm)
+        # The prepose distance is never given in an instruction, so it is always a default
+        confidence *= DEFAULT_FACTOR * arm_factor
+        return OpenAction(object_designator=obj, arm=arm,
+                          grasping_prepose_distance=DEFAULT_PREPOSE_DISTANCE), confidence
+
+    def _place(self, words: List[str], previous: Optional[Object],
+               previous_arm: Optional[Arms]) -> Tuple[PlaceAction, float]:
+        object_words, rest = self._split(words, PLACE_PREPOSITIONS)
+        if object_words and all(w in PRONOUNS for w in object_words):
+            if previous is None:
+                raise ParseError("'it' without an object before")
+            obj, confidence = previous, 1.0
+        else:
+            obj, confidence = self._object(object_words)
+        if not rest:
+            raise ParseError("no place target")
+        surface_words, rest = self._split(rest[1:], {"with", "using"})
+        surface, surface_confidence = self._object(surface_words)
+        arm, approach, vertical = self._modifiers(rest)
+        if approach is not None or vertical is not None:
+            raise ParseError("grasp given for place")
+        arm, arm_factor = self._arm(arm, previous_arm)
+        confidence *= surface_confidence * SURFACE_FRAME_FACTOR * arm_factor
+        # The object goes to the origin of the surface frame, see the frame transforms for where that is
+        target = PoseStamped(header=Header(frame_id=surface.name.replace(" ", "_")))
+        return PlaceAction(object_designator=obj, target_location=target, arm=arm), confidence
+
+    def _navigate(self, words: List[str], raw: str) -> Tuple[NavigateAction, float]:
+        if not words or words[0] != "to":
+            raise ParseError("no navigation target")
+        numbers = [float(n) for n in NUMBER.findall(raw)]
+        if numbers:
+            if len(numbers) not in (2, 3) or any(not re.fullmatch(r"\d+|x|y|z", w) for w in words[1:]):
+                raise ParseError("navigation target is not x y [z]")
+            return NavigateAction(target_location=PoseStampedModel(position=(numbers + [0.0])[:3],
+                                                                   orientation=[0.0, 0.0, 0.0, 1.0])), 1.0
+        location = self.locations.get(" ".join(words[1:]))
+        if location is None:
+            raise ParseError(f"unknown location '{' '.join(words[1:])}'")
+        return NavigateAction(target_location=location.model_copy()), 1.0
+
+    def _clause(self, raw: str, previous: Optional[Object], previous_arm: Optional[Arms]):
+        words = normalize_instruction(raw).split()
+        if not words or words[0] not in VERBS:
+            raise ParseError(f"no known verb in '{raw.strip()}'")
+        verb, words = VERBS[words[0]], words[1:]
+        if verb == "pick":
+            return self._pick(words, previous_arm)
+        if verb == "open":
+            return self._open(words, previous_arm)
+        if verb == "place":
+            return self._place(words, previous, previous_arm)
+        return self._navigate(words, raw)
+
+    def parse(self, instruction: str) -> ParseResult:
+        """Actions for the instruction and the parse confidence, actions is None if it has no supported shape."""
+        models, confidence, previous, previous_arm = [], 1.0, None, None
+        try:
+            for clause in CLAUSE_SEPARATOR.split(str(instruction)):
+                if not clause.strip():
+                    continue
+                model, clause_confidence = self._clause(clause, previous, previous_arm)
+                models.append(model)
+                # The least certain clause decides, so plans are not penalized for their length
+                confidence = min(confidence, clause_confidence)
+                previous = getattr(model, "object_designator", previous)
+                previous_arm = getattr(model, "arm", previous_arm)
+        except ParseError as e:
+            return ParseResult(None, 0.0, str(e))
+        if not models:
+            return ParseResult(None, 0.0, "empty instruction")
+        return ParseResult(Actions(models=models), round(confidence, 3), "parsed")
+
+    def parse_confident(self, instruction: str) -> Optional[Actions]:
+        """Actions if the instruction parses with at least min_confidence, None to fall back to the LLM."""
+        result = self.parse(instruction)
+        if result.actions is None:
+            counter = "no_match"
+        elif result.confidence < self.min_confidence:
+            counter = "low_confidence"
+        else:
+            counter = "parsed_locally"
+        with self._lock:
+            self._counters[counter] += 1
+        if counter != "parsed_locally":
+            print(f"Instruction parser fallback ({counter}): {result.reason}")
+            return None
+        return result.actions
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = sum(self._counters.values())
+            return {**self._counters, "min_confidence": self.min_confidence,
+                    "local_fraction": round(self._counters["parsed_locally"] / total, 3) if total else None}
+
+
+INSTRUCTION_PARSER = os.getenv("INSTRUCTION_PARSER", "1") == "1"
+
+instruction_parser = InstructionParser(load_locations(os.getenv("INSTRUCTION_LOCATIONS_PATH")))
@@ -0,0 +1,217 @@
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import urllib.parse
+import urllib.request
+import uuid
+from contextlib import contextmanager
+from fnmatch import fnmatch
+from typing import Callable, List, Optional
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    # A redirect could point the callback at a host that is not allowed
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
+
+
+_callback_opener = urllib.request.build_opener(_NoRedirect)
+
+
+class JobQueue:
+    """
+    Durable local job queue backed by a single SQLite file.
+
+    Jobs are stored with their payload and move through queued -> running -> done/failed. A pool of
+    worker threads claims jobs in submission order and runs them through `handler`. A claimed job is
+    leased to its queue instance for lease seconds and the lease is renewed while the job runs. Jobs
+    whose lease ran out (the process died) are claimed again, so submitted work survives restarts
+    without another live process taking over jobs that are still running.
+
+    Finished jobs are POSTed to their callback_url, which must be http(s) on a host matching one of the
+    callback_hosts patterns (fnmatch, e.g. "*.lab.local"). Without patterns no callbacks are accepted.
+    """
+
+    def __init__(self, db_path: str, handler: Callable[[dict], dict], num_workers: int = 1,
+                 poll_interval: float = 0.5, lease: float = 60.0, callback_hosts: Optional[List[str]] = None):
+        self.db_path = db_path
+        self.handler = handler
+        self.num_workers = num_workers
+        self.poll_interval = poll_interval
+        self.lease = lease
+        self.callback_hosts = [host.lower() for host in callback_hosts or []]
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._workers = []
+        self._stop = threading.Event()
+        self._wakeup = threading.Event()
+        self._start_lock = threading.Lock()
+        self._init_db()
+
+    @contextmanager
+    def _connect(self):
+        # Autocommit connection, closed on exit (a sqlite3 connection's own context manager only commits)
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def _init_db(self):
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    job_id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    callback_url TEXT,
+                    result TEXT,
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL,
+                    owner TEXT,
+                    lease_until REAL
+                )""")
+            # Queue files created before leases were added
+            columns = {row['name'] for row in conn.execute("PRAGMA table_info(jobs)")}
+            for column, column_type in (("owner", "TEXT"), ("lease_until", "REAL")):
+                if column not in columns:
+                    conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {column_type}")
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created_at)")
+
+    def start(self):
+        """Start the worker pool and the lease renewal (idempotent)."""
+        with self._start_lock:
+            if self._workers:
+                return
+            for i in range(self.num_workers):
+                worker = threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True)
+                worker.start()
+                self._workers.append(worker)
+            renewer = threading.Thread(target=self._renew_leases, name="job-lease-renewer", daemon=True)
+            renewer.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wakeup.set()
+
+    def check_callback_url(self, callback_url: str):
+        """Raises ValueError unless callback_url is http(s) on an allowed host."""
+        url = urllib.parse.urlsplit(callback_url)
+        if url.scheme not in ("http", "https") or not url.hostname:
+            raise ValueError(f"callback_url must be an http or https URL, got {callback_url!r}")
+        if not any(fnmatch(url.hostname, pattern) for pattern in self.callback_hosts):
+            raise ValueError(f"callback_url host {url.hostname!r} is not allowed")
+
+    def submit(self, payload: dict, callback_url: Optional[str] = None) -> str:
+        """Queues a job, raises ValueError for a callback_url that is not allowed."""
+        if callback_url:
+            self.check_callback_url(callback_url)
+        job_id = uuid.uuid4().hex
+        with self._connect() as conn:
+            conn.execute("INSERT INTO jobs (job_id, status, payload, callback_url, created_at) "
+                         "VALUES (?, 'queued', ?, ?, ?)",
+                         (job_id, json.dumps(payload), callback_url, time.time()))
+        self._wakeup.set()
+        return job_id
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        return {
+            'job_id': row['job_id'],
+            'status': row['status'],
+            'result': json.loads(row['result']) if row['result'] else None,
+            'error': row['error'],
+            'created_at': row['created_at'],
+            'started_at': row['started_at'],
+            'finished_at': row['finished_at']
+        }
+
+    def stats(self) -> dict:
+        with self._connect() as conn:
+            rows = conn.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status").fetchall()
+        counts = {row['status']: row['n'] for row in rows}
+        counts['workers'] = len(self._workers)
+        return counts
+
+    def _claim(self) -> Optional[sqlite3.Row]:
+        with self._connect() as conn:
+            try:
+                # BEGIN IMMEDIATE takes the write lock up front, so two workers never claim the same job
+                conn.execute("BEGIN IMMEDIATE")
+                now = time.time()
+                row = conn.execute("SELECT job_id, payload, callback_url, status FROM jobs "
+                                   "WHERE status = 'queued' OR (status = 'running' AND "
+                                   "(lease_until IS NULL OR lease_until < ?)) "
+                                   "ORDER BY created_at LIMIT 1", (now,)).fetchone()
+                if row is not None:
+                    if row['status'] == 'running':
+                        print(f"Reclaiming job {row['job_id']} whose lease expired")
+                    conn.execute("UPDATE jobs SET status = 'running', started_at = ?, owner = ?, lease_until = ? "
+                                 "WHERE job_id = ?", (now, self.owner, now + self.lease, row['job_id']))
+                conn.execute("COMMIT")
+                return row
+            except Exception:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                raise
+
+    def _finish(self, job_id: str, result: Optional[dict], error: Optional[str]) -> bool:
+        """Stores the outcome, False if the job was reclaimed by another worker after our lease ran out."""
+        with self._connect() as conn:
+            return conn.execute("UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ?, lease_until = NULL "
+                                "WHERE job_id = ? AND owner = ? AND status = 'running'",
+                                ('failed' if error else 'done', json.dumps(result) if result is not None else None,
+                                 error, time.time(), job_id, self.owner)).rowcount == 1
+
+    def _renew_leases(self):
+        while not self._stop.wait(self.lease / 3):
+            try:
+                with self._connect() as conn:
+                    conn.execute("UPDATE jobs SET lease_until = ? WHERE owner = ? AND status = 'running'",
+                                 (time.time() + self.lease, self.owner))
+            except sqlite3.Error as e:
+                print(f"Job lease renewal failed: {e}")
+
+    def _work(self):
+        while not self._stop.is_set():
+            try:
+                row = self._claim()
+            except sqlite3.Error as e:
+                print(f"Job queue claim failed: {e}")
+                row = None
+            if row is None:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+                continue
+
+            job_id = row['job_id']
+            result, error = None, None
+            try:
+                result = self.handler(json.loads(row['payload']))
+            except Exception as e:
+                error = str(e)
+            if not self._finish(job_id, result, error):
+                print(f"Job {job_id} was reclaimed by another worker, dropping this result")
+                continue
+
+            if row['callback_url']:
+                self._notify(row['callback_url'], self.get(job_id))
+
+    def _notify(self, callback_url: str, job: dict):
+        try:
+            # Checked again, the job may have been queued under another allowlist
+            self.check_callback_url(callback_url)
+            req = urllib.request.Request(callback_url, data=json.dumps(job).encode("utf-8"),
+                                         headers={"Content-Type": "application/json"}, method="POST")
+            _callback_opener.open(req, timeout=10).close()
+        except Exception as e:
+            print(f"Webhook callback to {callback_url} failed: {e}")
@@ -0,0 +1,97 @@
+import gzip
+import hashlib
+import json
+import os
+import threading
+from typing import Any, Dict, List, Optional
+
+RECORD = "record"
+REPLAY = "replay"
+
+
+class CassetteMiss(LookupError):
+    """Raised in replay mode when a call was never recorded."""
+
+
+def _open(path: str, mode: str):
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+def serialize_messages(messages) -> List[Dict[str, str]]:
+    return [{"type": message.type, "content": message.content if isinstance(message.content, str)
+             else json.dumps(message.content, sort_keys=True)} for message in messages]
+
+
+def interaction_key(model: str, messages: List[Dict[str, str]], call_format: Any, stop: Optional[List[str]],
+                    tools: Any = None) -> str:
+    canonical = json.dumps({"model": model, "messages": messages, "format": call_format, "stop": stop, "tools": tools},
+                           sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class Cassette:
+    """
+    Recorded LLM interactions, one JSON line per call (gzip-compressed when the path ends in .gz).
+
+    Each line holds the request key, the prompt messages, the structured-output schema, the response
+    message (including tool calls, used by the supervisor's router) and the observed latency. In replay mode, repeated identical calls are served in recorded order.
+    """
+
+    def __init__(self, path: str, mode: str, replay_latency: bool = False):
+        if mode not in (RECORD, REPLAY):
+            raise ValueError(f"Unknown cassette mode: {mode}")
+        self.path = path
+        self.mode = mode
+        self.replay_latency = replay_latency
+        self._lock = threading.Lock()
+        self._entries: Dict[str, List[dict]] = {}
+        self._cursor: Dict[str, int] = {}
+        if mode == REPLAY:
+            self._load()
+
+    def _load(self):
+        with _open(self.path, "r") as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    self._entries.setdefault(entry["key"], []).append(entry)
+        print(f"Loaded {sum(len(v) for v in self._entries.values())} LLM interactions from {self.path}")
+
+    def record(self, key: str, model: str, messages: List[Dict[str, str]], call_format: Any, response: dict,
+               latency: float):
+        entry = {"key": key, "model": model, "messages": messages, "format": call_format,
+                 "response": response, "latency": round(latency, 4)}
+        line = json.dumps(entry, separators=(",", ":"), default=str) + "\n"
+        with self._lock:
+            # Appending per call keeps everything recorded up to a crash
+            with _open(self.path, "a") as f:
+                f.write(line)
+
+    def replay(self, key: str) -> dict:
+        with self._lock:
+            entries = self._entries.get(key)
+            if not entries:
+                raise CassetteMiss(f"No recorded LLM interaction for key {key[:12]} in {self.path}")
+            cursor = self._cursor.get(key, 0)
+            # Past the end, keep serving the last recorded answer
+            self._cursor[key] = cursor + 1
+            return entries[min(cursor, len(entries) - 1)]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"mode": self.mode, "path": self.path, "keys": len(self._entries),
+                    "served": sum(self._cursor.values())}
+
+
+def cassette_from_env() -> Optional[Cassette]:
+    """
+    LLM_CASSETTE_MODE=record|replay and LLM_CASSETTE_PATH select the cassette,
+    LLM_CASSETTE_LATENCY=original replays recorded latencies instead of answering immediately.
+    """
+    mode = os.getenv("LLM_CASSETTE_MODE", "").lower()
+    if not mode:
+        return None
+    return Cassette(os.getenv("LLM_CASSETTE_PATH", "llm_cassette.jsonl.gz"), mode,
+                    replay_latency=os.getenv("LLM_CASSETTE_LATENCY", "zero").lower() == "original")
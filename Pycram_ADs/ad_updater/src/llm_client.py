@@ -0,0 +1,137 @@
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, Iterator, List, Optional
+from langchain_core.messages import BaseMessage, message_to_dict, messages_from_dict
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_ollama import ChatOllama
+from .llm_cassette import RECORD, REPLAY, interaction_key, serialize_messages
+from .request_profiler import current_profile
+from .deadlines import DeadlineExceeded, check_deadline, current_deadline, deadline_stats
+from .llm_hedging import LLMCallCancelled, current_cancel_event
+
+
+def call_label(kwargs: dict) -> str:
+    """Name of the structured output (schema title or bound tool) requested by an LLM call, "text" otherwise."""
+    if kwargs.get("tools"):
+        return kwargs["tools"][0].get("function", {}).get("name", "tool")
+    call_format = kwargs.get("format")
+    if isinstance(call_format, dict):
+        return call_format.get("title", "json_schema")
+    return call_format or "text"
+
+
+class LatencyTracker:
+    """Recent LLM call latencies per call label, used to predict how long the next call will take."""
+
+    def __init__(self, window: int = 200):
+        self.window = window
+        self._lock = threading.Lock()
+        self._samples: Dict[str, deque] = {}
+
+    def record(self, label: str, seconds: float):
+        with self._lock:
+            self._samples.setdefault(label, deque(maxlen=self.window)).append(seconds)
+
+    def samples(self, label: str) -> int:
+        with self._lock:
+            return len(self._samples.get(label, ()))
+
+    def percentile(self, label: str, q: float) -> float:
+        """q-th percentile of the recent latencies of label, 0.0 while there are none."""
+        with self._lock:
+            samples = sorted(self._samples.get(label, ()))
+        if not samples:
+            return 0.0
+        return samples[min(len(samples) - 1, int(q / 100 * len(samples)))]
+
+    def stats(self) -> dict:
+        with self._lock:
+            labels = list(self._samples)
+        return {label: {"samples": len(self._samples[label]), "p50": round(self.percentile(label, 50), 3),
+                        "p95": round(self.percentile(label, 95), 3)} for label in labels}
+
+
+llm_latency = LatencyTracker()
+
+
+class ServiceChatOllama(ChatOllama):
+    """
+    ChatOllama used by every node of the service.
+
+    All prompts, including the structured-output ones (with_structured_output binds the schema as
+    `format`), end up in _generate, so this is where service-wide behaviour around LLM calls lives.
+    With a cassette attached, calls are recorded to it or answered from it. Inside a profiled
+    request, the time blocked on each call is added to the request profile. Under a request
+    deadline, calls that would finish too late are skipped and streaming calls are cut off (closing
+    the connection makes Ollama stop generating) once the deadline passes. With a hedge policy,
+    slow calls are duplicated to a secondary backend (see llm_hedging).
+    """
+
+    cassette: Optional[Any] = None
+    hedge: Optional[Any] = None
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None,
+                  **kwargs: Any) -> ChatResult:
+        label = call_label(kwargs)
+        check_deadline(llm_latency.percentile(label, 50), f"{label} LLM call")
+        profile = current_profile()
+        started = time.perf_counter()
+        try:
+            result = self._generate_with_cassette(messages, stop, run_manager, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - started
+            if profile is not None:
+                profile.add_llm_call(label, elapsed)
+        llm_latency.record(label, elapsed)
+        return result
+
+    def _call_backend(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None,
+                      **kwargs: Any) -> ChatResult:
+        if self.hedge is None:
+            return super()._generate(messages, stop, run_manager, **kwargs)
+        return self.hedge.generate(self, call_label(kwargs), messages, stop, run_manager, kwargs)
+
+    def _create_chat_stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                            **kwargs: Any) -> Iterator[Any]:
+        deadline = current_deadline()
+        cancel = current_cancel_event()
+        stream = super()._create_chat_stream(messages, stop, **kwargs)
+        if deadline is None and cancel is None:
+            yield from stream
+            return
+        started = time.perf_counter()
+        try:
+            for chunk in stream:
+                if cancel is not None and cancel.is_set():
+                    raise LLMCallCancelled("the hedged duplicate of this call answered first")
+                if deadline is not None and time.time() > deadline:
+                    deadline_stats.add("cancelled_llm_streams")
+                    deadline_stats.add("cancelled_llm_seconds", time.perf_counter() - started)
+                    raise DeadlineExceeded("deadline passed while the LLM was generating")
+                yield chunk
+        finally:
+            stream.close()
+
+    def _generate_with_cassette(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                                run_manager=None, **kwargs: Any) -> ChatResult:
+        if self.cassette is None:
+            return self._call_backend(messages, stop, run_manager, **kwargs)
+
+        serialized = serialize_messages(messages)
+        call_format = kwargs.get("format", self.format)
+        key = interaction_key(self.model, serialized, call_format, stop, kwargs.get("tools"))
+
+        if self.cassette.mode == REPLAY:
+            entry = self.cassette.replay(key)
+            if self.cassette.replay_latency:
+                time.sleep(entry["latency"])
+            message = messages_from_dict([entry["response"]])[0]
+            return ChatResult(generations=[ChatGeneration(message=message)])
+
+        started = time.perf_counter()
+        result = self._call_backend(messages, stop, run_manager, **kwargs)
+        if self.cassette.mode == RECORD:
+            self.cassette.record(key, self.model, serialized, call_format,
+                                 message_to_dict(result.generations[0].message), time.perf_counter() - started)
+        return result
@@ -0,0 +1,145 @@
+import contextvars
+import json
+import os
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextvars import ContextVar
+from typing import Optional
+from langchain_ollama import ChatOllama
+
+# Set for a hedged call once the other call has won, checked between streamed chunks
+_cancel_event: ContextVar[Optional[threading.Event]] = ContextVar("llm_cancel_event", default=None)
+
+
+class LLMCallCancelled(Exception):
+    """Raised inside the losing call of a hedged pair."""
+
+
+def current_cancel_event() -> Optional[threading.Event]:
+    """Cancel event of the hedged call running in this context, None outside of hedging."""
+    return _cancel_event.get()
+
+
+def valid_result(result, kwargs: dict) -> bool:
+    """Whether a ChatResult answers the call: a tool call for the router, parseable JSON for json_schema output."""
+    message = result.generations[0].message
+    if kwargs.get("tools"):
+        return bool(getattr(message, "tool_calls", None))
+    if isinstance(kwargs.get("format"), (dict, str)) and kwargs.get("format"):
+        try:
+            json.loads(message.content)
+        except (TypeError, ValueError):
+            return False
+    return True
+
+
+class HedgePolicy:
+    """
+    Sends a duplicate of a slow LLM call to a secondary backend and keeps the first valid answer.
+
+    A call is hedged once it has run longer than the given latency percentile of its call type
+    (and at least min_delay). Hedges are paid from a token bucket refilled by budget tokens per call,
+    so at most about budget * 100 percent extra calls are sent. The losing call is cancelled at its
+    next streamed chunk, which closes its connection.
+    """
+
+    def __init__(self, backend: ChatOllama, latency, percentile: float = 95.0, budget: float = 0.1,
+                 min_samples: int = 20, min_delay: float = 1.0, max_tokens: float = 10.0, max_workers: int = 16):
+        self.backend = backend
+        self.latency = latency
+        self.percentile = percentile
+        self.budget = budget
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self.max_tokens = max_tokens
+        self._tokens = max_tokens
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="llm-hedge")
+        self._counters = {"calls": 0, "hedged": 0, "hedge_won": 0, "budget_exhausted": 0}
+
+    def _threshold(self, label: str) -> Optional[float]:
+        if self.latency.samples(label) < self.min_samples:
+            return None
+        return max(self.min_delay, self.latency.percentile(label, self.percentile))
+
+    def _take_token(self) -> bool:
+        with self._lock:
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            self._counters["budget_exhausted"] += 1
+            return False
+
+    def _submit(self, llm: ChatOllama, cancel: threading.Event, messages, stop, run_manager, kwargs):
+        context = contextvars.copy_context()
+
+        def call():
+            _cancel_event.set(cancel)
+            return ChatOllama._generate(llm, messages, stop, run_manager, **kwargs)
+
+        return self._pool.submit(context.run, call)
+
+    def generate(self, primary: ChatOllama, label: str, messages, stop, run_manager, kwargs: dict):
+        with self._lock:
+            self._counters["calls"] += 1
+            self._tokens = min(self.max_tokens, self._tokens + self.budget)
+
+        threshold = self._threshold(label)
+        if threshold is None:
+            return ChatOllama._generate(primary, messages, stop, run_manager, **kwargs)
+
+        primary_cancel = threading.Event()
+        primary_future = self._submit(primary, primary_cancel, messages, stop, run_manager, kwargs)
+        done, _ = wait([primary_future], timeout=threshold)
+        if done or not self._take_token():
+            return primary_future.result()
+
+        with self._lock:
+            self._counters["hedged"] += 1
+        print(f"Hedging {label} LLM call after {threshold:.1f}s")
+        # Token callbacks only follow the primary call
+        hedge_cancel = threading.Event()
+        hedge_future = self._submit(self.backend, hedge_cancel, messages, stop, None, kwargs)
+        cancels = {primary_future: primary_cancel, hedge_future: hedge_cancel}
+
+        pending, error = set(cancels), None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    result = future.result()
+                except Exception as e:
+                    error = error or e
+                    continue
+                if valid_result(result, kwargs) or not pending:
+                    for other in pending:
+                        cancels[other].set()
+                    if future is hedge_future:
+                        with self._lock:
+                            self._counters["hedge_won"] += 1
+                    return result
+        raise error
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self._counters, "tokens": round(self._tokens, 2), "percentile": self.percentile,
+                    "budget": self.budget,
+                    "backend": {"model": self.backend.model, "base_url": self.backend.base_url}}
+
+
+def hedge_from_env(primary_model: str, latency) -> Optional[HedgePolicy]:
+    """
+    LLM_HEDGE_BASE_URL and/or LLM_HEDGE_MODEL enable hedging against that Ollama server / model.
+    LLM_HEDGE_PERCENTILE (95), LLM_HEDGE_BUDGET (0.1 extra calls per call) and LLM_HEDGE_MIN_DELAY_S (1.0) tune it.
+    """
+    base_url = os.getenv("LLM_HEDGE_BASE_URL")
+    model = os.getenv("LLM_HEDGE_MODEL")
+    if not base_url and not model:
+        return None
+    # Imported here, llm_client imports this module for current_cancel_event
+    from .llm_client import ServiceChatOllama
+    backend = ServiceChatOllama(model=model or primary_model, base_url=base_url,
+                                keep_alive=os.getenv("OLLAMA_KEEP_ALIVE", "30m"))
+    return HedgePolicy(backend, latency, percentile=float(os.getenv("LLM_HEDGE_PERCENTILE", "95")),
+                       budget=float(os.getenv("LLM_HEDGE_BUDGET", "0.1")),
+                       min_delay=float(os.getenv("LLM_HEDGE_MIN_DELAY_S", "1.0")))
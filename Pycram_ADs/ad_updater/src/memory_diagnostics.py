@@ -0,0 +1,112 @@
+import gc
+import os
+import resource
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from typing import Optional
+
+
+def rss_bytes() -> int:
+    """Current resident set size, falling back to the peak RSS where /proc is not available."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        # ru_maxrss is in kilobytes on Linux
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _typed_size(value) -> int:
+    # MemorySaver stores everything serialized as (type, bytes) pairs
+    if isinstance(value, tuple) and len(value) == 2 and isinstance(value[1], (bytes, bytearray)):
+        return len(value[1])
+    return 0
+
+
+def checkpointer_stats(saver) -> dict:
+    """Thread, checkpoint and pending-write counts of a MemorySaver, with their serialized size in bytes."""
+    threads = checkpoints = checkpoint_bytes = 0
+    for namespaces in list(saver.storage.values()):
+        threads += 1
+        for saved in list(namespaces.values()):
+            for checkpoint, metadata, _ in list(saved.values()):
+                checkpoints += 1
+                checkpoint_bytes += _typed_size(checkpoint) + _typed_size(metadata)
+    writes = write_bytes = 0
+    for task_writes in list(saver.writes.values()):
+        for _, _, value, _ in list(task_writes.values()):
+            writes += 1
+            write_bytes += _typed_size(value)
+    return {"threads": threads, "checkpoints": checkpoints, "checkpoint_bytes": checkpoint_bytes,
+            "writes": writes, "write_bytes": write_bytes}
+
+
+def gc_object_counts(limit: int = 20) -> dict:
+    """Most common live object types. Walks the whole heap, so only computed on request."""
+    counts = Counter(type(obj).__name__ for obj in gc.get_objects())
+    return dict(counts.most_common(limit))
+
+
+class MemoryTracker:
+    """
+    tracemalloc snapshots diffed against the first snapshot (baseline) and the previous one.
+
+    Tracing slows down every allocation, so it is off until start() is called (MEMORY_TRACEMALLOC=1
+    or POST /debug/memory/tracemalloc).
+    """
+
+    def __init__(self, frames: int = 10):
+        self.frames = frames
+        self._lock = threading.Lock()
+        self._baseline: Optional[tracemalloc.Snapshot] = None
+        self._previous: Optional[tracemalloc.Snapshot] = None
+        self._previous_time = None
+
+    @property
+    def tracing(self) -> bool:
+        return tracemalloc.is_tracing()
+
+    def start(self):
+        with self._lock:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(self.frames)
+            self._baseline = self._previous = self._take()
+            self._previous_time = time.time()
+
+    def stop(self):
+        with self._lock:
+            tracemalloc.stop()
+            self._baseline = self._previous = self._previous_time = None
+
+    @staticmethod
+    def _take() -> tracemalloc.Snapshot:
+        return tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ])
+
+    @staticmethod
+    def _top(snapshot, reference, limit: int, key_type: str):
+        return [{"location": str(stat.traceback[0]), "size_bytes": stat.size, "size_diff_bytes": stat.size_diff,
+                 "count": stat.count, "count_diff": stat.count_diff}
+                for stat in snapshot.compare_to(reference, key_type)[:limit]]
+
+    def report(self, limit: int = 15, key_type: str = "lineno") -> dict:
+        """Top allocation growth since the baseline and since the previous report."""
+        with self._lock:
+            if not tracemalloc.is_tracing() or self._baseline is None:
+                return {"tracing": False}
+            current, peak = tracemalloc.get_traced_memory()
+            snapshot = self._take()
+            report = {
+                "tracing": True,
+                "traced_bytes": current,
+                "traced_peak_bytes": peak,
+                "since_baseline": self._top(snapshot, self._baseline, limit, key_type),
+                "since_previous": self._top(snapshot, self._previous, limit, key_type),
+                "previous_snapshot_age_s": round(time.time() - self._previous_time, 1),
+            }
+            self._previous, self._previous_time = snapshot, time.time()
+            return report
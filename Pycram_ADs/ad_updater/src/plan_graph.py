@@ -0,0 +1,162 @@
+from typing import Any, Dict, List, Optional, Tuple
+from langgraph.graph import StateGraph, START, END
+from langgraph.prebuilt.chat_agent_executor import AgentState
+from ..resources.action_designators import *
+from .global_custom_state import action_designator_type, failure_reason_type
+from .graph import correct_designator
+from .input_parser import parse_designator
+from .designator_normalizer import render_designator
+from .pose_geometry import frame_ids, poses_differ, same_position
+from .frame_transforms import UnknownTransform, transform_tree
+
+# Fields holding a pose that later steps may reuse (the place target is often the next navigation goal)
+POSE_FIELDS = ("target_location", "standing_position", "target", "pose")
+
+# Fields naming the arm or gripper that handles the step's object
+ARM_FIELDS = ("arm", "gripper")
+
+
+class PlanState(AgentState):
+    plan: List[action_designator_type]
+    failed_index: int
+    reason_for_failure: failure_reason_type
+    human_comment: str
+    parameters_to_update: str
+    failure_reasons_solutions: str
+    updated_parameters: str
+    update_parameters_reasons: str
+    updated_action_designator: action_designator_type
+    ad_human_instruction: str
+    insert_after_failed: bool
+    updated_plan: List[action_designator_type]
+    propagated_changes: List[Dict[str, Any]]
+
+
+def _position(pose) -> Optional[Tuple[float, ...]]:
+    if isinstance(pose, PoseStamped):
+        return tuple(pose.pose.position.to_list())
+    if isinstance(pose, PoseStampedModel):
+        return tuple(pose.position)
+    return None
+
+
+def _convert_pose(pose, like):
+    """pose as the pose type of like: the designators mix PoseStamped and PoseStampedModel."""
+    if isinstance(like, PoseStampedModel) and isinstance(pose, PoseStamped):
+        return PoseStampedModel(position=pose.pose.position.to_list(), orientation=pose.pose.orientation.to_list())
+    if isinstance(like, PoseStamped) and isinstance(pose, PoseStampedModel):
+        orientation = Quaternion(**dict(zip("xyzw", pose.orientation))) if pose.orientation else Quaternion()
+        return PoseStamped(pose=Pose(position=Vector3(**dict(zip("xyz", pose.position))), orientation=orientation),
+                           header=like.header)
+    return pose
+
+
+def _same_object(a, b) -> bool:
+    return isinstance(a, Object) and isinstance(b, Object) and (a.name, a.concept) == (b.name, b.concept)
+
+
+def plan_changes(original, corrected) -> Dict[str, Tuple[Any, Any]]:
+    """
+    Changes of the corrected step that later steps depend on: {"object" | "arm" | "pose": (old, new)}.
+    """
+    changes = {}
+    old_object = getattr(original, "object_designator", None)
+    new_object = getattr(corrected, "object_designator", None)
+    if isinstance(old_object, Object) and isinstance(new_object, Object) and old_object != new_object:
+        changes["object"] = (old_object, new_object)
+    for name in ARM_FIELDS:
+        old, new = getattr(original, name, None), getattr(corrected, name, None)
+        if old is not None and new is not None and old != new:
+            changes["arm"] = (old, new)
+    for name in POSE_FIELDS:
+        old, new = getattr(original, name, None), getattr(corrected, name, None)
+        if _position(old) is not None and _position(new) is not None and poses_differ(old, new, transform_tree):
+            changes["pose"] = (old, new)
+    return changes
+
+
+def propagate_step(step, changes: Dict[str, Tuple[Any, Any]], old_object: Optional[Object]) -> Tuple[Any, List[str]]:
+    """
+    Applies the changes to one later step: the corrected object and arm to steps handling the same
+    object, the corrected pose to pose fields that had the old value.
+    """
+    update, described = {}, []
+    fields = type(step).model_fields
+    handles_object = _same_object(getattr(step, "object_designator", None), old_object)
+
+    if handles_object and "object" in changes:
+        update["object_designator"] = changes["object"][1]
+        described.append(f"object_designator = {render_designator(changes['object'][1])}")
+    if "object" in changes and getattr(step, "object_type", None) == changes["object"][0].concept:
+        update["object_type"] = changes["object"][1].concept
+        described.append(f"object_type = {changes['object'][1].concept}")
+    if handles_object and "arm" in changes:
+        old_arm, new_arm = changes["arm"]
+        for name in ARM_FIELDS:
+            if name in fields and getattr(step, name) == old_arm:
+                update[name] = new_arm
+                described.append(f"{name} = {render_designator(new_arm)}")
+    if "pose" in changes:
+        old_pose, new_pose = changes["pose"]
+        for name in POSE_FIELDS:
+            value = getattr(step, name, None) if name in fields else None
+            if _position(value) is not None and same_position(value, old_pose, transforms=transform_tree):
+                try:
+                    # The step may give the same place in another frame, keep its frame
+                    moved = transform_tree.transform_poses([new_pose], frame_ids([value])[0])[0]
+                except UnknownTransform:
+                    continue
+                update[name] = _convert_pose(moved, value)
+                described.append(f"{name} = {render_designator(update[name])}")
+
+    return (step.model_copy(update=update) if update else step), described
+
+
+def step_corrector_node(state: PlanState):
+    """Runs the diagnosis once, for the failing step only."""
+    print("INSIDE PLAN STEP CORRECTOR NODE")
+    failed = state["plan"][state["failed_index"]]
+    values = correct_designator(failed, state.get("reason_for_failure", ""), state.get("human_comment", ""))
+    return {key: values[key] for key in ("parameters_to_update", "failure_reasons_solutions", "updated_parameters",
+                                         "update_parameters_reasons", "updated_action_designator",
+                                         "ad_human_instruction")}
+
+
+def propagator_node(state: PlanState):
+    """Carries the object, arm and pose changes of the corrected step over to the steps after it, without the LLM."""
+    print("INSIDE PLAN PROPAGATOR NODE")
+    index = state["failed_index"]
+    plan = [parse_designator(step)[0] for step in state["plan"]]
+    corrected = state["updated_action_designator"]
+    if isinstance(corrected, str):
+        corrected = parse_designator(corrected)[0]
+    if state.get("insert_after_failed"):
+        # A new step after the failed one (e.g. opening the gripper after placing) changes nothing later
+        return {"updated_plan": plan[:index + 1] + [corrected] + plan[index + 1:], "propagated_changes": []}
+
+    changes = plan_changes(plan[index], corrected)
+    old_object = getattr(plan[index], "object_designator", None)
+    updated_plan, propagated = plan[:index] + [corrected], []
+    for i, step in enumerate(plan[index + 1:], start=index + 1):
+        step, described = propagate_step(step, changes, old_object)
+        updated_plan.append(step)
+        if described:
+            propagated.append({"index": i, "changes": described})
+    return {"updated_plan": updated_plan, "propagated_changes": propagated}
+
+
+def route_plan(state: PlanState) -> str:
+    # Plans whose failing step was already corrected (e.g. by the failure rules) skip the diagnosis
+    return "propagator" if state.get("updated_action_designator") else "step_corrector"
+
+
+plan_builder = StateGraph(PlanState)
+plan_builder.add_node("step_corrector", step_corrector_node)
+plan_builder.add_node("propagator", propagator_node)
+plan_builder.add_conditional_edges(START, route_plan, ["step_corrector", "propagator"])
+plan_builder.add_edge("step_corrector", "propagator")
+plan_builder.add_edge("propagator", END)
+
+# No checkpointer: every plan request starts from its own state, the step correction itself runs
+# through sole and its checkpointer
+plan_grapher = plan_builder.compile()
@@ -0,0 +1,232 @@
+import math
+import os
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple, Union
+import numpy as np
+from ..resources.action_designators import *
+
+PoseLike = Union[Pose, PoseStamped, PoseStampedModel]
+POSE_TYPES = (Pose, PoseStamped, PoseStampedModel)
+
+# Poses without a header (Pose, PoseStampedModel) are in the default frame of Header
+DEFAULT_FRAME = Header().frame_id
+
+# Updated poses closer than this to the original are reported as unchanged
+MIN_DISTANCE = float(os.getenv("POSE_MIN_DISTANCE", "0.005"))
+MIN_ANGLE = math.radians(float(os.getenv("POSE_MIN_ANGLE_DEG", "1.0")))
+
+# Quaternions with a smaller norm have no defined rotation
+QUATERNION_EPS = 1e-6
+
+IDENTITY = np.array([0.0, 0.0, 0.0, 1.0])
+
+
+# --- Conversion, one row per model ---
+
+def vectors_to_array(vectors: Sequence[Vector3]) -> np.ndarray:
+    return np.array([(v.x, v.y, v.z) for v in vectors], dtype=np.float64).reshape(-1, 3)
+
+
+def quaternions_to_array(quaternions: Sequence[Quaternion]) -> np.ndarray:
+    return np.array([(q.x, q.y, q.z, q.w) for q in quaternions], dtype=np.float64).reshape(-1, 4)
+
+
+def array_to_vectors(array: np.ndarray) -> List[Vector3]:
+    return [Vector3(x=x, y=y, z=z) for x, y, z in np.asarray(array, dtype=np.float64).reshape(-1, 3).tolist()]
+
+
+def array_to_quaternions(array: np.ndarray) -> List[Quaternion]:
+    return [Quaternion(x=x, y=y, z=z, w=w) for x, y, z, w in np.asarray(array, dtype=np.float64).reshape(-1, 4).tolist()]
+
+
+def _pose_rows(pose: PoseLike) -> Tuple[List[float], List[float]]:
+    if isinstance(pose, PoseStamped):
+        pose = pose.pose
+    if isinstance(pose, Pose):
+        return pose.position.to_list(), pose.orientation.to_list()
+    if isinstance(pose, PoseStampedModel):
+        # The lists are unconstrained, rows of the wrong length become nan so they are reported as invalid
+        position = list(pose.position) if len(pose.position) == 3 else [math.nan] * 3
+        if not pose.orientation:
+            orientation = IDENTITY.tolist()
+        else:
+            orientation = list(pose.orientation) if len(pose.orientation) == 4 else [math.nan] * 4
+        return position, orientation
+    raise TypeError(f"not a pose: {type(pose).__name__}")
+
+
+def poses_to_arrays(poses: Sequence[PoseLike]) -> Tuple[np.ndarray, np.ndarray]:
+    """Positions (N, 3) and xyzw orientations (N, 4) of mixed Pose / PoseStamped / PoseStampedModel lists."""
+    rows = [_pose_rows(pose) for pose in poses]
+    positions = np.array([row[0] for row in rows], dtype=np.float64).reshape(-1, 3)
+    orientations = np.array([row[1] for row in rows], dtype=np.float64).reshape(-1, 4)
+    return positions, orientations
+
+
+def frame_ids(poses: Sequence[PoseLike]) -> List[str]:
+    return [pose.header.frame_id if isinstance(pose, PoseStamped) else DEFAULT_FRAME for pose in poses]
+
+
+def arrays_to_poses(positions: np.ndarray, orientations: np.ndarray,
+                    frames: Union[str, Sequence[str]] = DEFAULT_FRAME) -> List[PoseStamped]:
+    if isinstance(frames, str):
+        frames = [frames] * len(positions)
+    return [PoseStamped(pose=Pose(position=position, orientation=orientation), header=Header(frame_id=frame))
+            for position, orientation, frame in zip(array_to_vectors(positions), array_to_quaternions(orientations),
+                                                    frames)]
+
+
+def with_pose(pose: PoseLike, position: np.ndarray, orientation: np.ndarray) -> PoseLike:
+    """Copy of pose, in its own type and frame, with the given position and orientation."""
+    position, orientation = [float(v) for v in position], [float(v) for v in orientation]
+    if isinstance(pose, PoseStampedModel):
+        return pose.model_copy(update={"position": position,
+                                       "orientation": orientation if pose.orientation is not None else None})
+    new_pose = Pose(position=Vector3(**dict(zip("xyz", position))), orientation=Quaternion(**dict(zip("xyzw", orientation))))
+    if isinstance(pose, PoseStamped):
+        return pose.model_copy(update={"pose": new_pose})
+    return new_pose
+
+
+# --- Batched quaternion and pose algebra, xyzw quaternions ---
+
+def quaternion_norms(q: np.ndarray) -> np.ndarray:
+    return np.linalg.norm(q, axis=-1)
+
+
+def normalize_quaternions(q: np.ndarray) -> np.ndarray:
+    """Unit quaternions; rows without a defined rotation become the identity."""
+    q = np.asarray(q, dtype=np.float64)
+    norms = quaternion_norms(q)[..., None]
+    defined = np.isfinite(norms) & (norms > QUATERNION_EPS)
+    return np.where(defined, q / np.where(defined, norms, 1.0), IDENTITY)
+
+
+def multiply_quaternions(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Hamilton product a * b (rotation b, then a), broadcast over rows."""
+    ax, ay, az, aw = np.moveaxis(np.asarray(a, dtype=np.float64), -1, 0)
+    bx, by, bz, bw = np.moveaxis(np.asarray(b, dtype=np.float64), -1, 0)
+    return np.stack([aw * bx + ax * bw + ay * bz - az * by,
+                     aw * by - ax * bz + ay * bw + az * bx,
+                     aw * bz + ax * by - ay * bx + az * bw,
+                     aw * bw - ax * bx - ay * by - az * bz], axis=-1)
+
+
+def invert_quaternions(q: np.ndarray) -> np.ndarray:
+    q = np.asarray(q, dtype=np.float64)
+    conjugate = q * np.array([-1.0, -1.0, -1.0, 1.0])
+    return conjugate / np.sum(q * q, axis=-1, keepdims=True)
+
+
+def rotate_vectors(q: np.ndarray, v: np.ndarray) -> np.ndarray:
+    """Vectors v rotated by the unit quaternions q."""
+    q, v = np.asarray(q, dtype=np.float64), np.asarray(v, dtype=np.float64)
+    t = 2.0 * np.cross(q[..., :3], v)
+    return v + q[..., 3:] * t + np.cross(q[..., :3], t)
+
+
+def compose_poses(positions_a: np.ndarray, orientations_a: np.ndarray, positions_b: np.ndarray,
+                  orientations_b: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Pose b expressed in frame a, composed into a's parent frame: T_a * T_b."""
+    orientations_a = normalize_quaternions(orientations_a)
+    positions = np.asarray(positions_a, dtype=np.float64) + rotate_vectors(orientations_a, positions_b)
+    return positions, normalize_quaternions(multiply_quaternions(orientations_a, orientations_b))
+
+
+def invert_poses(positions: np.ndarray, orientations: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    inverse = invert_quaternions(normalize_quaternions(orientations))
+    return -rotate_vectors(inverse, positions), inverse
+
+
+def position_distances(positions_a: np.ndarray, positions_b: np.ndarray) -> np.ndarray:
+    return np.linalg.norm(np.asarray(positions_a, dtype=np.float64) - np.asarray(positions_b, dtype=np.float64), axis=-1)
+
+
+def angular_errors(orientations_a: np.ndarray, orientations_b: np.ndarray) -> np.ndarray:
+    """Smallest rotation angle between the orientations, in radians (q and -q are the same rotation)."""
+    dots = np.abs(np.sum(normalize_quaternions(orientations_a) * normalize_quaternions(orientations_b), axis=-1))
+    return 2.0 * np.arccos(np.clip(dots, 0.0, 1.0))
+
+
+def valid_poses(positions: np.ndarray, orientations: np.ndarray) -> np.ndarray:
+    """Rows with finite values and an orientation that can be normalized."""
+    norms = quaternion_norms(orientations)
+    return (np.isfinite(positions).all(axis=-1) & np.isfinite(orientations).all(axis=-1)
+            & (norms > QUATERNION_EPS))
+
+
+# --- Deterministic checks ---
+
+class PoseChange(NamedTuple):
+    valid: bool
+    changed: bool
+    comparable: bool
+    distance: float
+    angle: float
+
+
+def pose_changes(original: Sequence[PoseLike], updated: Sequence[PoseLike], min_distance: float = MIN_DISTANCE,
+                 min_angle: float = MIN_ANGLE, transforms=None) -> List[PoseChange]:
+    """
+    Whether each updated pose is valid and actually differs from its original. Updated poses in another
+    frame are moved to the original's frame with transforms (a TransformTree); poses that cannot be brought
+    into one frame count as changed and not comparable, their distance and angle are nan.
+    """
+    original_positions, original_orientations = poses_to_arrays(original)
+    positions, orientations = poses_to_arrays(updated)
+    valid = valid_poses(positions, orientations)
+    original_frames, frames = frame_ids(original), frame_ids(updated)
+    comparable = np.array([a == b for a, b in zip(original_frames, frames)], dtype=bool)
+    if transforms is not None and not comparable.all():
+        positions, orientations, comparable = transforms.transform_arrays(positions, orientations, frames,
+                                                                          original_frames)
+    distances = np.where(comparable, position_distances(original_positions, positions), np.nan)
+    angles = np.where(comparable, angular_errors(original_orientations, orientations), np.nan)
+    changed = ~comparable | (distances >= min_distance) | (angles >= min_angle)
+    return [PoseChange(bool(v), bool(c), bool(s), float(d), float(a))
+            for v, c, s, d, a in zip(valid, changed, comparable, distances, angles)]
+
+
+def poses_differ(a: PoseLike, b: PoseLike, transforms=None) -> bool:
+    return pose_changes([a], [b], transforms=transforms)[0].changed
+
+
+def same_position(a: PoseLike, b: PoseLike, tolerance: float = MIN_DISTANCE, transforms=None) -> bool:
+    """In one frame and within tolerance of each other, whatever the orientations."""
+    change = pose_changes([a], [b], transforms=transforms)[0]
+    return change.comparable and change.distance < tolerance
+
+
+def pose_fields(designator) -> Dict[str, PoseLike]:
+    """Top-level pose parameters of a designator, e.g. target_location of PlaceAction."""
+    return {name: getattr(designator, name) for name in type(designator).model_fields
+            if isinstance(getattr(designator, name), POSE_TYPES)}
+
+
+def check_updated_poses(original, updated, transforms=None) -> Tuple[object, Dict[str, str]]:
+    """
+    Normalizes the orientations of the pose parameters of an updated designator. Invalid poses are reset
+    to the original value, and poses the update did not actually change are reported.
+
+    :return: the checked designator, {field: problem} for the reported poses
+    """
+    poses = pose_fields(updated)
+    if not poses:
+        return updated, {}
+    names = list(poses)
+    positions, orientations = poses_to_arrays([poses[name] for name in names])
+    valid = valid_poses(positions, orientations)
+    unit = normalize_quaternions(orientations)
+
+    update, problems = {}, {}
+    for i, name in enumerate(names):
+        previous = getattr(original, name, None)
+        if not valid[i]:
+            problems[name] = "invalid pose, kept the original" if isinstance(previous, POSE_TYPES) else "invalid pose"
+            if isinstance(previous, POSE_TYPES):
+                update[name] = previous
+            continue
+        if not np.allclose(unit[i], orientations[i]):
+            update[name] = with_pose(poses[name], positions[i], unit[i])
+        if isinstance(previous, POSE_TYPES) and not poses_differ(previous, poses[name], transforms):
+            problems[name] = "unchanged"
+    return (updated.model_copy(update=update) if update else updated), problems
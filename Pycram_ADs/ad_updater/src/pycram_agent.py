@@ -13,6 +13,9 @@ from .global_custom_state import *
 import ast
 from ..resources.action_designators import *
 from ..resources.failures import *
+from .concept_index import concept_index
+from .structured_repair import invoke_structured
+from .instruction_cache import instruction_cache
 
 pycram_memory = MemorySaver()
 
@@ -114,18 +117,8 @@ model_populator_prompt_template = """
         * *Example:* If `name` was 'mug' and `concept` was 'Plate', and the reason suggests it should be a 'cup', then update `concept = 'Cup'` and potentially `name = 'cup'` (or keep original name if context allows).
         * **Name Changes:** Only change the `name` parameter if it is explicitly suggested by the `human_comment` or if it is clearly inconsistent with a newly selected `concept` or the `update_reasons`. Otherwise, keep the original `name` or refine it minimally. Ignore case sensitivity when matching names (e.g., 'red cup' should match 'Cup' concept).
         
-    * Concept value can be only from this allowed list. It should be chosen from this exhaustive list and relevant to the name.
-    concepts = [
-        "World", "Floor", "Milk", "Robot", "Cereal", "Kitchen", "Food", "Fruit", "Apple",
-        "Environment", "Apartment", "Cup", "Spoon", "Bowl", "PreferredGraspAlignment",
-        "XAxis", "YAxis", "NoAlignment", "Truthy", "Falsy", "Cabinet", "Washer",
-        "Drawer", "Refrigerator", "Sink", "Door", "Cutting", "Pouring", "Handle", "Link",
-        "PhysicalObject", "PouringTool", "CuttingTool", "MixingTool", "Agent", "Human",
-        "Room", "Location", "Container", "Joint", "ContinuousJoint", "HingeJoint",
-        "FixedJoint", "MovableJoint", "FloatingJoint", "PlanarJoint", "PrismaticJoint",
-        "RevoluteJoint", "DesignedFurniture", "Surface", "PhysicalTask", "Action", "Event",
-        "Entity", "Task", "RootLink", "Supporter", "SupportedObject"
-    ]
+    * Concept value can be only from this allowed list of candidates selected for the instruction. It should be relevant to the name.
+    concepts = {concepts}
             
     ### Output Format ###
     - Your entire output must be similar to the provided model schemas with updated or inferred values.
@@ -465,6 +458,11 @@ def model_selector_node(state : CustomStateInternal2):
     print("The instruction is :", instruction)
     # answers["instruction"] = instruction
 
+    cached_names = instruction_cache.get_model_names(instruction)
+    if cached_names is not None:
+        print("Cached model names :", cached_names)
+        return {'model_names' : cached_names}
+
     chain = model_selector_prompt | structured_ollama_llm_pc1
     response = chain.invoke({"input_instruction": instruction})
     # json_response = response.model_dump_json(indent=2, by_alias=True)
@@ -472,6 +470,7 @@ def model_selector_node(state : CustomStateInternal2):
     mod_names = response_python_dict["model_names"]
     print("response of tool 1 : ", type(response), response)
     # framenet_answers.append(json_response)
+    instruction_cache.put_model_names(instruction, str(mod_names))
     return {'model_names' : str(mod_names)}
 
 def model_populator_node(state : CustomStateInternal2):
@@ -522,12 +521,16 @@ def model_populator_node(state : CustomStateInternal2):
 
     print("Context Schema", context_schema)
 
-    chain = model_populator_prompt | ollama_llm.with_structured_output(Actions, method="json_schema")
-    response = chain.invoke({"instruction" : instruction, "selected_models" : model_names, "model_schemas" : context_schema})
+    response = invoke_structured(model_populator_prompt, {"instruction" : instruction, "selected_models" : model_names,
+                                                          "model_schemas" : context_schema,
+                                                          "concepts" : concept_index.top_k(instruction)}, Actions)
+    concept_repairs = concept_index.repair(response)
+    if concept_repairs:
+        print("Repaired concepts:", concept_repairs)
     response_python_dict = response.model_dump()
     print("response :", str(response))
     # mods = response_python_dict["models"]
-    return {'pycram_model' : str(response)}
+    return {'pycram_model' : response}
 
 
 graph_builder = StateGraph(CustomStateInternal2)
@@ -551,6 +554,8 @@ def pycram_node(state: CustomState):
     instruction = state['instruction']
 
     result = pysole.invoke({'instruction' : instruction})
+    # Looked up by process_update_request before the request reaches the supervisor
+    instruction_cache.put_actions(instruction, result['pycram_model'])
 
     return Command(
         update={
@@ -0,0 +1,110 @@
+import cProfile
+import io
+import marshal
+import pstats
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextvars import ContextVar
+from typing import Optional
+
+# Profile of the request running in the current context, None when profiling is off
+_current_profile: ContextVar[Optional["RequestProfile"]] = ContextVar("current_profile", default=None)
+
+
+def current_profile() -> Optional["RequestProfile"]:
+    return _current_profile.get()
+
+
+class RequestProfile:
+    """
+    Deterministic (cProfile) profile of a single request, with the time spent blocked on Ollama
+    accounted separately by ServiceChatOllama.
+    """
+
+    def __init__(self):
+        self.id = uuid.uuid4().hex
+        self.llm_calls = []
+        self.wall_time = 0.0
+        self.cpu_time = 0.0
+        self.stats = None
+        self.created_at = time.time()
+
+    def add_llm_call(self, label: str, duration: float):
+        self.llm_calls.append({"format": label, "seconds": round(duration, 4)})
+
+    def run(self, fn, *args, **kwargs):
+        profiler = cProfile.Profile()
+        token = _current_profile.set(self)
+        wall, cpu = time.perf_counter(), time.thread_time()
+        try:
+            return profiler.runcall(fn, *args, **kwargs)
+        finally:
+            self.cpu_time = time.thread_time() - cpu
+            self.wall_time = time.perf_counter() - wall
+            _current_profile.reset(token)
+            profiler.create_stats()
+            self.stats = profiler.stats
+
+    def summary(self) -> dict:
+        llm_time = sum(call["seconds"] for call in self.llm_calls)
+        return {
+            "id": self.id,
+            "created_at": self.created_at,
+            "wall_seconds": round(self.wall_time, 4),
+            "python_cpu_seconds": round(self.cpu_time, 4),
+            "llm_blocked_seconds": round(llm_time, 4),
+            # Waiting that is neither Python nor Ollama: admission queue, coalesced requests, I/O
+            "other_wait_seconds": round(max(0.0, self.wall_time - self.cpu_time - llm_time), 4),
+            "llm_calls": self.llm_calls,
+        }
+
+    def pstats_text(self, sort: str = "cumulative", limit: int = 40) -> str:
+        stream = io.StringIO()
+        stats = pstats.Stats(self._as_profile(), stream=stream)
+        stats.strip_dirs().sort_stats(sort).print_stats(limit)
+        return stream.getvalue()
+
+    def pstats_dump(self) -> bytes:
+        """Same format as cProfile's dump_stats, loadable with pstats.Stats or snakeviz."""
+        return marshal.dumps(self.stats)
+
+    def _as_profile(self):
+        return _StatsHolder(self.stats)
+
+
+class _StatsHolder:
+    # pstats.Stats accepts any object with create_stats() and a stats attribute
+    def __init__(self, stats):
+        self.stats = stats
+
+    def create_stats(self):
+        pass
+
+
+class ProfileStore:
+    """Keeps the most recent request profiles in memory for the debug endpoint."""
+
+    def __init__(self, max_profiles: int = 50):
+        self.max_profiles = max_profiles
+        self._profiles = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, profile: RequestProfile):
+        with self._lock:
+            self._profiles[profile.id] = profile
+            while len(self._profiles) > self.max_profiles:
+                self._profiles.popitem(last=False)
+
+    def get(self, profile_id: str) -> Optional[RequestProfile]:
+        with self._lock:
+            return self._profiles.get(profile_id)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._profiles)
+
+    def list(self):
+        with self._lock:
+            return [profile.summary() for profile in reversed(self._profiles.values())]
@@ -0,0 +1,102 @@
+import hashlib
+import json
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+from .deadlines import DeadlineExceeded
+
+
+def canonical_request_hash(payload: dict) -> str:
+    """
+    Stable hash of a request payload, independent of key order and json formatting.
+    """
+    canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class _Call:
+    def __init__(self, deadline: Optional[float]):
+        self.deadline = deadline
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Collapses concurrent calls that share a key into one execution.
+
+    The first caller for a key (the leader) runs the function, every caller arriving while it is
+    still running waits for the leader and receives the same result (or exception). Nothing is
+    kept once the call finishes, so this is not a result cache.
+
+    Callers keep their own deadlines: a waiting caller gives up at its deadline, and a caller whose
+    deadline is later than the leader's runs the call again if the leader missed its deadline.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _Call] = {}
+        self._leaders = 0
+        self._coalesced = 0
+        self._deadline_retries = 0
+        self._wait_timeouts = 0
+
+    def do(self, key: str, fn: Callable[..., Any], *args, deadline: Optional[float] = None,
+           **kwargs) -> Tuple[Any, bool]:
+        """
+        Run fn(*args, **kwargs) once per in-flight key.
+
+        :param deadline: absolute time.time() after which this caller stops waiting for another caller's run
+        :return: (result, shared) where shared is True if the result came from another caller's run.
+        :raises DeadlineExceeded: when the deadline passes while waiting for another caller's run
+        """
+        while True:
+            with self._lock:
+                call = self._calls.get(key)
+                if call is not None:
+                    self._coalesced += 1
+                    leader = False
+                else:
+                    call = _Call(deadline)
+                    self._calls[key] = call
+                    self._leaders += 1
+                    leader = True
+
+            if leader:
+                break
+            remaining = None if deadline is None else max(0.0, deadline - time.time())
+            if not call.done.wait(remaining):
+                with self._lock:
+                    self._wait_timeouts += 1
+                raise DeadlineExceeded("deadline passed while waiting for an identical in-flight request")
+            if isinstance(call.error, DeadlineExceeded) and \
+                    call.deadline is not None and (deadline is None or deadline > call.deadline):
+                # The leader gave up at its own, earlier deadline, this caller still has time
+                with self._lock:
+                    self._deadline_retries += 1
+                continue
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn(*args, **kwargs)
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "executions": self._leaders,
+                "coalesced": self._coalesced,
+                "deadline_retries": self._deadline_retries,
+                "wait_timeouts": self._wait_timeouts,
+                "in_flight": len(self._calls),
+            }
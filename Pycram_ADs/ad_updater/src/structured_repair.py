@@ -0,0 +1,273 @@
+import inspect
+import json
+import os
+import re
+import threading
+from enum import Enum
+from typing import Any, Dict, List, Type, Union, get_args, get_origin
+from langchain_core.messages import AIMessage, HumanMessage
+from pydantic import BaseModel, Field, ValidationError, create_model
+from ..llm_configuration import ollama_llm
+
+# Re-asks allowed per structured call after the first answer fails validation
+REPAIR_RETRIES = int(os.getenv("STRUCTURED_REPAIR_RETRIES", "2"))
+
+reask_prompt_template = """
+The JSON you returned for {class_name} is not valid:
+
+{current}
+
+Problems:
+{problems}
+
+Return a JSON object with corrected values for only these fields: {fields}.
+Keep every other value as it is. /nothink
+"""
+
+
+class RepairStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {"valid": 0, "repaired_locally": 0, "repaired_by_reask": 0, "reask_calls": 0, "failed": 0}
+
+    def add(self, counter: str, value: int = 1):
+        with self._lock:
+            self._counters[counter] += value
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._counters)
+
+
+repair_stats = RepairStats()
+
+
+def extract_json(text: str) -> Any:
+    """JSON payload of an LLM answer, ignoring <think> blocks, code fences and text around the outermost object."""
+    text = re.sub(r"<think>.*?</think>", "", text or "", flags=re.DOTALL).strip()
+    text = re.sub(r"^```(?:json)?\s*|\s*```$", "", text)
+    try:
+        return json.loads(text)
+    except ValueError:
+        start, end = text.find("{"), text.rfind("}")
+        if start == -1 or end <= start:
+            raise
+        return json.loads(text[start:end + 1])
+
+
+def _is_model(annotation) -> bool:
+    return inspect.isclass(annotation) and issubclass(annotation, BaseModel)
+
+
+def _is_optional(annotation) -> bool:
+    return get_origin(annotation) is Union and type(None) in get_args(annotation)
+
+
+def _choose_model(models: List[Type[BaseModel]], data: dict) -> Type[BaseModel]:
+    """Union member a dict is meant to be: by action_type if given, otherwise the one it validates best against."""
+    for cls in models:
+        if data.get("action_type") == cls.__name__:
+            return cls
+
+    def mismatch(cls):
+        try:
+            cls.model_validate(data)
+            errors = 0
+        except ValidationError as e:
+            errors = e.error_count()
+        return errors + len(set(data) - set(cls.model_fields)), -len(set(data) & set(cls.model_fields))
+
+    return min(models, key=mismatch)
+
+
+def repair_enum(enum_cls: Type[Enum], value: Any) -> Any:
+    """Maps "LEFT", "left", "Arms.LEFT" or "0" to the value of Arms.LEFT, leaves unknown values untouched."""
+    if isinstance(value, enum_cls):
+        return value
+    for member in enum_cls:
+        if value == member.value:
+            return value
+    text = str(value).strip().rsplit(".", 1)[-1].lower()
+    for member in enum_cls:
+        if text in (member.name.lower(), str(member.value).lower()):
+            return member.value
+    return value
+
+
+def repair_value(annotation: Any, value: Any) -> Any:
+    """
+    Fixes common structured-output mistakes against a type annotation: enum spellings, an object where a
+    list is expected (and the reverse), missing optional fields, unknown field capitalization.
+    """
+    if value is None or annotation is Any:
+        return value
+    origin = get_origin(annotation)
+    if origin is Union:
+        args = [arg for arg in get_args(annotation) if arg is not type(None)]
+        models = [arg for arg in args if _is_model(arg)]
+        if isinstance(value, dict) and models:
+            return repair_value(_choose_model(models, value), value)
+        return repair_value(args[0], value) if len(args) == 1 else value
+    if origin in (list, List):
+        item = (get_args(annotation) or (Any,))[0]
+        if isinstance(value, dict):
+            value = [value]
+        return [repair_value(item, v) for v in value] if isinstance(value, list) else value
+    if inspect.isclass(annotation) and issubclass(annotation, Enum):
+        return repair_enum(annotation, value)
+    if _is_model(annotation):
+        if isinstance(value, list) and len(value) == 1 and isinstance(value[0], dict):
+            value = value[0]
+        return repair_model_dict(annotation, value) if isinstance(value, dict) else value
+    if annotation is bool and isinstance(value, str) and value.strip().lower() in ("true", "false"):
+        return value.strip().lower() == "true"
+    return value
+
+
+def repair_model_dict(cls: Type[BaseModel], data: dict) -> dict:
+    keys = {key.lower(): key for key in data}
+    repaired = {}
+    for name, field in cls.model_fields.items():
+        key = name if name in data else keys.get(name.lower())
+        if key is None:
+            # Optional fields declared without a default are still required by pydantic
+            if field.is_required() and _is_optional(field.annotation):
+                repaired[name] = None
+            continue
+        value = data[key]
+        if value is None and not field.is_required() and not _is_optional(field.annotation):
+            continue
+        repaired[name] = repair_value(field.annotation, value)
+    if "action_type" in cls.model_fields:
+        repaired["action_type"] = cls.model_fields["action_type"].default
+    return repaired
+
+
+def _get(data: Any, path: tuple) -> Any:
+    for part in path:
+        data = data[part]
+    return data
+
+
+def _resolve(annotation: Any, node: Any) -> Any:
+    """Strips Optional and Union wrappers down to the type node is meant to be."""
+    while get_origin(annotation) is Union:
+        args = [arg for arg in get_args(annotation) if arg is not type(None)]
+        models = [arg for arg in args if _is_model(arg)]
+        annotation = _choose_model(models, node) if models and isinstance(node, dict) else args[0]
+    return annotation
+
+
+def _model_at(cls: Type[BaseModel], data: dict, path: tuple) -> Type[BaseModel]:
+    """Model class of the object at path in data, following the field annotations from cls."""
+    annotation, node = cls, data
+    for part in path:
+        node = node[part]
+        annotation = get_args(annotation)[0] if isinstance(part, int) else annotation.model_fields[part].annotation
+        annotation = _resolve(annotation, node)
+    return annotation
+
+
+def _is_union_tag(node: Any, part: Any) -> bool:
+    # pydantic puts the tried union member into error locations: "PickUpAction", "list[float]", ...
+    return isinstance(node, dict) and isinstance(part, str) and part not in node and (
+        part[:1].isupper() or "[" in part)
+
+
+def _failing_fields(data: dict, error: ValidationError) -> Dict[tuple, Dict[str, str]]:
+    """
+    Groups validation errors by the object they occur in: {path of the object: {field: message}}.
+
+    Of the errors reported for every member of a union, only those of the member named by the
+    object's action_type are kept.
+    """
+    groups: Dict[tuple, Dict[str, str]] = {}
+    for err in error.errors():
+        path, node, other_member = [], data, False
+        for part in err["loc"]:
+            if _is_union_tag(node, part):
+                if part[:1].isupper() and node.get("action_type") not in (None, part):
+                    other_member = True
+                    break
+                continue
+            path.append(part)
+            node = _get_or_none(node, (part,))
+        if other_member or not path or not isinstance(path[-1], str):
+            continue
+        parent = tuple(path[:-1])
+        if isinstance(_get_or_none(data, parent), dict):
+            groups.setdefault(parent, {})[path[-1]] = err["msg"]
+    return groups
+
+
+def _get_or_none(data: Any, path: tuple) -> Any:
+    try:
+        return _get(data, path)
+    except (KeyError, IndexError, TypeError):
+        return None
+
+
+def _reask(messages: list, raw: str, cls: Type[BaseModel], current: dict, problems: Dict[str, str], llm) -> dict:
+    fields = {name: (cls.model_fields[name].annotation,
+                     Field(description=cls.model_fields[name].description or name))
+              for name in problems if name in cls.model_fields}
+    repair_model = create_model(f"{cls.__name__}FieldRepair", **fields)
+    prompt = reask_prompt_template.format(
+        class_name=cls.__name__, current=json.dumps(current, default=str),
+        problems="\n".join(f"- {name}: {message}" for name, message in problems.items()),
+        fields=", ".join(fields))
+    repair_stats.add("reask_calls")
+    answer = llm.with_structured_output(repair_model, method="json_schema", include_raw=True).invoke(
+        messages + [AIMessage(content=raw), HumanMessage(content=prompt)])
+    if answer["parsed"] is not None:
+        return answer["parsed"].model_dump(mode="json", exclude_unset=True)
+    return extract_json(answer["raw"].content)
+
+
+def invoke_structured(prompt, inputs: dict, schema: Type[BaseModel], llm=None, max_retries: int = None) -> BaseModel:
+    """
+    prompt | llm.with_structured_output(schema, method="json_schema"), with repair instead of failing when
+    the answer does not validate.
+
+    The valid part of the answer is kept. Common mistakes are fixed locally, and only the fields that are
+    still invalid are asked for again, up to max_retries times. Raises the last ValidationError if that
+    is not enough.
+    """
+    llm = llm or ollama_llm
+    max_retries = REPAIR_RETRIES if max_retries is None else max_retries
+    messages = prompt.invoke(inputs).to_messages()
+    answer = llm.with_structured_output(schema, method="json_schema", include_raw=True).invoke(messages)
+    if answer["parsed"] is not None:
+        repair_stats.add("valid")
+        return answer["parsed"]
+
+    raw = answer["raw"].content
+    try:
+        data = repair_value(schema, extract_json(raw))
+    except ValueError:
+        data = None
+    if not isinstance(data, dict):
+        data = {}
+
+    for attempt in range(max_retries + 1):
+        try:
+            result = schema.model_validate(data)
+        except ValidationError as e:
+            error = e
+        else:
+            repair_stats.add("repaired_by_reask" if attempt else "repaired_locally")
+            return result
+        if attempt == max_retries:
+            break
+        groups = _failing_fields(data, error)
+        if not groups:
+            break
+        print(f"Structured output for {schema.__name__} failed validation, re-asking for {groups}")
+        for path, problems in groups.items():
+            cls = _model_at(schema, data, path)
+            current = _get(data, path) if path else data
+            fixed = _reask(messages, raw, cls, current, problems, llm)
+            current.update(repair_value(cls, {**current, **fixed}))
+
+    repair_stats.add("failed")
+    raise error
@@ -5,6 +5,7 @@ from langgraph.types import Command
 from ..llm_configuration import *
 from langchain_core.prompts import ChatPromptTemplate
 from .global_custom_state import *
+from .designator_normalizer import render_designator
 from ..llm_configuration import *
 
 system_prompt_template = """
@@ -95,6 +96,9 @@ def supervisor_node(state: CustomState) -> Command[Literal["designator_corrector
     response : Router = None
 
     if action_designator != "":
+        # Designators and failures may arrive as instances from the JSON wire format
+        action_designator = render_designator(action_designator)
+        reason_for_failure = render_designator(reason_for_failure)
         chain = system_prompt | ollama_llm.with_structured_output(Router)
         response = chain.invoke({'instruction': action_designator, 'action_designator': action_designator,
                                  'reason_for_failure': reason_for_failure, "human_comment" : human_comment})
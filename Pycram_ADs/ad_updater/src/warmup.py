@@ -0,0 +1,105 @@
+import threading
+import time
+from typing import Callable, List, Optional, Tuple
+from ollama import Client
+
+
+class Readiness:
+    """
+    Progress of the startup warm-up, served by /ready.
+
+    Required steps (waiting for Ollama, loading the models) must succeed for the service to become
+    ready. Optional steps (canned requests) only make the first real request faster, so a failing one
+    is reported but does not keep the replica out of rotation. At least one of them must succeed
+    though: when every canned request fails, real requests would fail the same way.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.state = "starting"
+        self.steps = []
+        self.started_at = time.time()
+        self.ready_at = None
+
+    def run_step(self, name: str, fn: Callable[[], None], required: bool = True) -> bool:
+        started = time.perf_counter()
+        error = None
+        try:
+            fn()
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        step = {"step": name, "seconds": round(time.perf_counter() - started, 3), "ok": error is None,
+                "required": required}
+        if error is not None:
+            step["error"] = error
+        print(f"Warm-up step {name}: {'ok' if error is None else error} ({step['seconds']}s)")
+        with self._lock:
+            self.steps.append(step)
+        return error is None or not required
+
+    def run(self, steps: List[Tuple[str, Callable[[], None], bool]]):
+        with self._lock:
+            self.state = "warming"
+        optional_ok = []
+        for name, fn, required in steps:
+            if not self.run_step(name, fn, required):
+                self.mark_failed()
+                return
+            if not required:
+                optional_ok.append(self.steps[-1]["ok"])
+        if optional_ok and not any(optional_ok):
+            self.mark_failed()
+            return
+        self.mark_ready()
+
+    def mark_failed(self):
+        with self._lock:
+            self.state = "failed"
+
+    def mark_ready(self):
+        with self._lock:
+            self.state = "ready"
+            self.ready_at = time.time()
+
+    @property
+    def ready(self) -> bool:
+        return self.state == "ready"
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {"state": self.state, "steps": list(self.steps),
+                    "warmup_seconds": round(self.ready_at - self.started_at, 3) if self.ready_at else None}
+
+
+def wait_for_backend(base_url: Optional[str], timeout: float = 300.0, interval: float = 1.0):
+    """Blocks until the Ollama server at base_url answers, raises TimeoutError after timeout seconds."""
+    client = Client(host=base_url)
+    deadline = time.time() + timeout
+    while True:
+        try:
+            client.list()
+            return
+        except Exception as e:
+            if time.time() > deadline:
+                raise TimeoutError(f"Ollama at {base_url or 'default host'} not reachable after {timeout}s: {e}")
+            time.sleep(interval)
+
+
+def preload_model(base_url: Optional[str], model: str, keep_alive: str):
+    """Loads model into memory (an empty prompt only loads it) and keeps it there for keep_alive."""
+    Client(host=base_url).generate(model=model, prompt="", keep_alive=keep_alive)
+
+
+def start_warmup(readiness: Readiness, steps: List[Tuple[str, Callable[[], None], bool]],
+                 on_finished: Optional[Callable[[], None]] = None) -> threading.Thread:
+    """Runs the steps in the background, then on_finished (e.g. starting the job workers) however they went."""
+    def run():
+        try:
+            readiness.run(steps)
+        finally:
+            if on_finished is not None:
+                on_finished()
+
+    thread = threading.Thread(target=run, name="warmup", daemon=True)
+    thread.start()
+    return thread
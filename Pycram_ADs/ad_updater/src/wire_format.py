@@ -0,0 +1,106 @@
+from functools import lru_cache
+from typing import Any, Optional, Tuple
+import orjson
+from pydantic import BaseModel, TypeAdapter
+from ..resources.action_designators import *
+from ..resources.failures import *
+
+try:
+    import msgpack
+except ImportError:  # msgpack content negotiation is optional
+    msgpack = None
+
+JSON_MIMETYPE = "application/json"
+MSGPACK_MIMETYPE = "application/msgpack"
+
+ACTION_TYPES = {cls.__name__: cls for cls in [
+    PickUpAction, NavigateAction, PlaceAction, SetGripperAction, LookAtAction, MoveTorsoAction, GripAction,
+    ParkArmsAction, MoveAndPickUpAction, MoveAndPlaceAction, OpenAction, CloseAction, GraspingAction,
+    ReachToPickUpAction, TransportAction, SearchAction, FaceAtAction, DetectAction]}
+
+FAILURE_TYPES = {cls.__name__: cls for cls in [
+    ObjectNotGraspedError, ObjectStillInContact, ObjectNotPlacedAtTargetLocation]}
+
+
+def designator_to_json(designator: BaseModel) -> dict:
+    """
+    Typed JSON form of an action designator or failure, discriminated by action_type / failure_type.
+
+    Enums are written as their values (Arms.LEFT -> 0, Grasp.TOP -> "top"), fields at their default are omitted.
+    """
+    if isinstance(designator, tuple(FAILURE_TYPES.values())):
+        return {"failure_type": type(designator).__name__,
+                **designator.model_dump(mode="json", exclude={"failure_type"}, exclude_defaults=True)}
+    return {"action_type": type(designator).__name__,
+            **designator.model_dump(mode="json", exclude={"action_type"}, exclude_defaults=True)}
+
+
+@lru_cache(maxsize=None)
+def _field_adapter(annotation) -> TypeAdapter:
+    return TypeAdapter(annotation)
+
+
+def designator_from_json(data: dict) -> BaseModel:
+    """Inverse of designator_to_json. Raises ValueError for unknown or invalid designators."""
+    data = dict(data)
+    if "failure_type" in data:
+        failure_cls = FAILURE_TYPES.get(data.pop("failure_type"))
+        if failure_cls is None:
+            raise ValueError(f"Unknown failure_type, expected one of {list(FAILURE_TYPES)}")
+        # The failures' __init__ builds the message from the raw field values (model_validate runs it too), so
+        # every field is validated on its own first and the message is always rebuilt from the typed values
+        typed = {}
+        for name, value in data.items():
+            if name == "message":
+                continue
+            field = failure_cls.model_fields.get(name)
+            typed[name] = _field_adapter(field.annotation).validate_python(value) if field is not None else value
+        try:
+            return failure_cls(**typed)
+        except ValueError:
+            raise
+        except Exception as e:
+            raise ValueError(f"Invalid {failure_cls.__name__}: {e}") from e
+
+    action_cls = ACTION_TYPES.get(data.pop("action_type", None))
+    if action_cls is None:
+        raise ValueError(f"Unknown action_type, expected one of {list(ACTION_TYPES)}")
+    return action_cls.model_validate(data)
+
+
+class UnsupportedContentType(ValueError):
+    """The request body is in a format this server cannot read."""
+
+
+def decode_request_body(content_type: Optional[str], body: bytes) -> Optional[dict]:
+    """
+    Decodes a JSON or msgpack request body. Returns None for other content types (e.g. form data).
+
+    :raises UnsupportedContentType: msgpack body without the msgpack package
+    :raises ValueError: the body is not a valid JSON or msgpack object
+    """
+    content_type = (content_type or "").split(";")[0].strip()
+    if content_type == MSGPACK_MIMETYPE:
+        if msgpack is None:
+            raise UnsupportedContentType("msgpack request bodies need the msgpack package")
+        try:
+            data = msgpack.unpackb(body, raw=False)
+        except Exception as e:
+            raise ValueError(f"invalid msgpack body: {e}") from e
+    elif content_type == JSON_MIMETYPE or content_type.endswith("+json"):
+        try:
+            data = orjson.loads(body) if body else {}
+        except orjson.JSONDecodeError as e:
+            raise ValueError(f"invalid JSON body: {e}") from e
+    else:
+        return None
+    if not isinstance(data, dict):
+        raise ValueError(f"request body must be an object, got {type(data).__name__}")
+    return data
+
+
+def encode_response_body(payload: Any, accept: Optional[str]) -> Tuple[bytes, str]:
+    """Encodes a response as msgpack when the client accepts it (and msgpack is installed), JSON otherwise."""
+    if msgpack is not None and accept and MSGPACK_MIMETYPE in accept:
+        return msgpack.packb(payload, use_bin_type=True), MSGPACK_MIMETYPE
+    return orjson.dumps(payload), JSON_MIMETYPE
@@ -0,0 +1,220 @@
+"""
+Open-loop load generator for the /update service.
+
+Requests are sent at Poisson-distributed arrival times independent of how fast the service answers, so
+queueing inside the service shows up in the measured latencies. Latencies are measured from the scheduled
+send time, which keeps a saturated client pool from hiding slow responses.
+
+Example, against a service replaying a recorded LLM cassette (LLM_CASSETTE_MODE=replay):
+
+    python -m tests.load_generator --url http://localhost:8081/update --rate 2 --duration 120 --warmup 10 \
+        --mix correction=0.8,instruction=0.2 --json report.json --csv report.csv
+"""
+import argparse
+import csv
+import json
+import math
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+import requests
+
+action_designator_str = """PickUpAction(object_designator=Object(name='Cup',concept='Cup', color='blue'), arm=Arms.LEFT, grasp_description=GraspDescription(approach_direction=Grasp.TOP,vertical_alignment=Grasp.TOP, rotate_gripper=True))"""
+grasping_error_str = """ObjectNotGraspedErrorModel(obj=Object(name='cup',concept='Cup', color='blue'),robot=Object(name='robot', concept='robot'), arm=Arms.LEFT, grasp=Grasp.TOP)"""
+
+DEFAULT_CORPUS = [
+    {'action_designator': action_designator_str, 'reason_for_failure': grasping_error_str,
+     'human_comment': "pick up the yellow cup not the blue cup"},
+    {'action_designator': action_designator_str, 'reason_for_failure': "the cup slipped out of the gripper",
+     'human_comment': "use the other arm"},
+    {'instruction': "pick the cup from the table"},
+    {'instruction': "place the bowl on the kitchen counter"},
+]
+
+# Upper bounds (seconds) of the latency histogram buckets
+HISTOGRAM_BOUNDS = [0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, math.inf]
+
+
+def request_type(payload: dict) -> str:
+    return "instruction" if payload.get("instruction") else "correction"
+
+
+def load_corpus(path: str) -> List[dict]:
+    """Reads request bodies from a JSON list or a JSON-lines file."""
+    with open(path, encoding="utf-8") as f:
+        text = f.read().strip()
+    if text.startswith("["):
+        return json.loads(text)
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+
+def parse_mix(mix: str) -> Dict[str, float]:
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        weights[name.strip()] = float(weight or 1)
+    return weights
+
+
+def percentile(sorted_values: List[float], q: float) -> Optional[float]:
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, math.ceil(q / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+class LoadGenerator:
+    def __init__(self, url: str, corpus: List[dict], rate: float, duration: float, warmup: float = 0.0,
+                 concurrency: int = 16, mix: Dict[str, float] = None, timeout: float = 600.0,
+                 interval: float = 1.0, seed: int = None):
+        self.url = url
+        self.rate = rate
+        self.duration = duration
+        self.warmup = warmup
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.interval = interval
+        self.random = random.Random(seed)
+
+        self.by_type: Dict[str, List[dict]] = {}
+        for payload in corpus:
+            self.by_type.setdefault(request_type(payload), []).append(payload)
+        mix = {t: w for t, w in (mix or {t: 1.0 for t in self.by_type}).items() if t in self.by_type and w > 0}
+        if not mix:
+            raise ValueError(f"No corpus entries for the requested mix, corpus has {list(self.by_type)}")
+        self.types, self.weights = list(mix), list(mix.values())
+
+        self.results = []
+        self._lock = threading.Lock()
+        self._session = threading.local()
+
+    def _post(self, payload: dict, kind: str, scheduled: float, start: float):
+        session = getattr(self._session, "session", None)
+        if session is None:
+            session = self._session.session = requests.Session()
+        status, error = None, None
+        try:
+            response = session.post(self.url, json=payload, timeout=self.timeout)
+            status = response.status_code
+        except requests.RequestException as e:
+            error = type(e).__name__
+        finished = time.perf_counter()
+        with self._lock:
+            self.results.append({"type": kind, "offset": scheduled - start, "latency": finished - scheduled,
+                                 "status": status, "error": error})
+
+    def run(self) -> dict:
+        total = self.warmup + self.duration
+        start = time.perf_counter()
+        scheduled = start
+        sent = 0
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            while True:
+                scheduled += self.random.expovariate(self.rate)
+                if scheduled - start >= total:
+                    break
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                kind = self.random.choices(self.types, self.weights)[0]
+                payload = self.random.choice(self.by_type[kind])
+                pool.submit(self._post, payload, kind, scheduled, start)
+                sent += 1
+            print(f"Sent {sent} requests, waiting for outstanding responses...")
+        return self.report()
+
+    def report(self) -> dict:
+        measured = [r for r in self.results if r["offset"] >= self.warmup]
+        latencies = sorted(r["latency"] for r in measured if r["status"] == 200)
+        errors: Dict[str, int] = {}
+        for r in measured:
+            if r["status"] != 200:
+                key = r["error"] or str(r["status"])
+                errors[key] = errors.get(key, 0) + 1
+
+        histogram = []
+        lower = 0.0
+        for bound in HISTOGRAM_BOUNDS:
+            histogram.append({"le": bound if bound != math.inf else "+Inf",
+                              "count": sum(1 for v in latencies if lower < v <= bound)})
+            lower = bound
+
+        by_type = {}
+        for kind in self.types:
+            kind_latencies = sorted(r["latency"] for r in measured if r["type"] == kind and r["status"] == 200)
+            by_type[kind] = {"requests": sum(1 for r in measured if r["type"] == kind),
+                             "p50": percentile(kind_latencies, 50), "p99": percentile(kind_latencies, 99)}
+
+        return {
+            "config": {"url": self.url, "rate": self.rate, "duration": self.duration, "warmup": self.warmup,
+                       "concurrency": self.concurrency, "mix": dict(zip(self.types, self.weights))},
+            "requests": len(measured),
+            "succeeded": len(latencies),
+            "error_rate": (len(measured) - len(latencies)) / len(measured) if measured else 0.0,
+            "errors": errors,
+            "throughput": len(latencies) / self.duration if self.duration else 0.0,
+            "latency": {"mean": sum(latencies) / len(latencies) if latencies else None,
+                        **{f"p{q}": percentile(latencies, q) for q in (50, 90, 95, 99)},
+                        "max": latencies[-1] if latencies else None},
+            "histogram": histogram,
+            "by_type": by_type,
+            "timeline": self.timeline(measured),
+        }
+
+    def timeline(self, measured: List[dict]) -> List[dict]:
+        """Per-interval counts and latencies, bucketed by scheduled send time."""
+        buckets: Dict[int, List[dict]] = {}
+        for r in measured:
+            buckets.setdefault(int((r["offset"] - self.warmup) // self.interval), []).append(r)
+        rows = []
+        for index in range(int(math.ceil(self.duration / self.interval))):
+            results = buckets.get(index, [])
+            ok = sorted(r["latency"] for r in results if r["status"] == 200)
+            rows.append({"t": round(index * self.interval, 3), "sent": len(results), "succeeded": len(ok),
+                         "errors": len(results) - len(ok), "throughput": len(ok) / self.interval,
+                         "p50": percentile(ok, 50), "p99": percentile(ok, 99)})
+        return rows
+
+
+def write_csv(path: str, report: dict):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=["t", "sent", "succeeded", "errors", "throughput", "p50", "p99"])
+        writer.writeheader()
+        writer.writerows(report["timeline"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8081/update")
+    parser.add_argument("--corpus", help="JSON list or JSON-lines file of /update request bodies")
+    parser.add_argument("--rate", type=float, default=1.0, help="mean arrival rate in requests per second")
+    parser.add_argument("--duration", type=float, default=60.0, help="measured seconds after warm-up")
+    parser.add_argument("--warmup", type=float, default=0.0, help="seconds of load excluded from the report")
+    parser.add_argument("--concurrency", type=int, default=16, help="maximum requests in flight")
+    parser.add_argument("--mix", help="request type weights, e.g. correction=0.8,instruction=0.2")
+    parser.add_argument("--interval", type=float, default=1.0, help="timeline bucket width in seconds")
+    parser.add_argument("--timeout", type=float, default=600.0)
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--json", help="write the full report to this JSON file")
+    parser.add_argument("--csv", help="write the per-interval timeline to this CSV file")
+    args = parser.parse_args()
+
+    generator = LoadGenerator(args.url, load_corpus(args.corpus) if args.corpus else DEFAULT_CORPUS, args.rate,
+                              args.duration, warmup=args.warmup, concurrency=args.concurrency,
+                              mix=parse_mix(args.mix) if args.mix else None, timeout=args.timeout,
+                              interval=args.interval, seed=args.seed)
+    report = generator.run()
+
+    print(json.dumps({k: report[k] for k in ("requests", "succeeded", "error_rate", "errors", "throughput",
+                                             "latency", "by_type")}, indent=2))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if args.csv:
+        write_csv(args.csv, report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Soak test for the /update service: sends N requests and fails if the service RSS grows beyond a budget.
+
+RSS is read from /debug/memory after a warm-up (imports, model loading and first-call caches settle there)
+and sampled every --sample-every requests. Exits with status 1 when the growth over the warm-up sample
+exceeds --rss-budget-mb, printing the checkpoint sizes and tracemalloc diff to help find the leak, or when
+more than --max-error-rate of the requests failed (a service that only answers errors stays small).
+
+    python -m tests.soak_test --base-url http://localhost:8081 --requests 5000 --rss-budget-mb 64 --tracemalloc
+"""
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import requests
+
+from .load_generator import DEFAULT_CORPUS, load_corpus
+
+MB = 1024 * 1024
+
+
+def memory(session: requests.Session, base_url: str) -> dict:
+    response = session.get(f"{base_url}/debug/memory", timeout=60)
+    response.raise_for_status()
+    return response.json()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8081")
+    parser.add_argument("--corpus", help="JSON list or JSON-lines file of /update request bodies")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--warmup", type=int, default=50, help="requests sent before the RSS baseline is taken")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--sample-every", type=int, default=250)
+    parser.add_argument("--rss-budget-mb", type=float, default=64.0)
+    parser.add_argument("--max-error-rate", type=float, default=0.01,
+                        help="fraction of failed requests (non-200 or no answer) above which the run fails")
+    parser.add_argument("--tracemalloc", action="store_true", help="enable tracemalloc in the service after warm-up")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="write the RSS samples to this JSON file")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus) if args.corpus else DEFAULT_CORPUS
+    rng = random.Random(args.seed)
+    session = requests.Session()
+    # One keep-alive session per sender thread, like the load generator
+    sender_sessions = threading.local()
+    errors = 0
+
+    def send(payload):
+        sender_session = getattr(sender_sessions, "session", None)
+        if sender_session is None:
+            sender_session = sender_sessions.session = requests.Session()
+        try:
+            return sender_session.post(f"{args.base_url}/update", json=payload, timeout=600).status_code
+        except requests.RequestException:
+            return None
+
+    def drive(count):
+        nonlocal errors
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            statuses = list(pool.map(send, [rng.choice(corpus) for _ in range(count)]))
+        errors += sum(1 for status in statuses if status != 200)
+
+    drive(args.warmup)
+    if args.tracemalloc:
+        session.post(f"{args.base_url}/debug/memory/tracemalloc", json={"enabled": True}, timeout=60)
+    baseline = memory(session, args.base_url)["rss_bytes"]
+    samples = [{"requests": 0, "rss_mb": round(baseline / MB, 2), "t": 0.0}]
+    print(f"Baseline RSS after {args.warmup} warm-up requests: {baseline / MB:.1f} MB")
+
+    started = time.perf_counter()
+    sent = 0
+    while sent < args.requests:
+        batch = min(args.sample_every, args.requests - sent)
+        drive(batch)
+        sent += batch
+        rss = memory(session, args.base_url)["rss_bytes"]
+        samples.append({"requests": sent, "rss_mb": round(rss / MB, 2), "t": round(time.perf_counter() - started, 1)})
+        print(f"{sent:>7} requests  RSS {rss / MB:8.1f} MB  (+{(rss - baseline) / MB:.1f} MB)  errors {errors}")
+
+    final = memory(session, args.base_url)
+    growth_mb = (final["rss_bytes"] - baseline) / MB
+    error_rate = errors / (args.warmup + args.requests) if args.warmup + args.requests else 0.0
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"samples": samples, "growth_mb": growth_mb, "errors": errors, "error_rate": error_rate,
+                       "final": final}, f, indent=2)
+
+    failed = False
+    if growth_mb > args.rss_budget_mb:
+        print(f"FAIL: RSS grew {growth_mb:.1f} MB over {args.requests} requests, budget {args.rss_budget_mb} MB")
+        print(json.dumps({"checkpointers": final["checkpointers"], "caches": final["caches"],
+                          "tracemalloc": final["tracemalloc"]}, indent=2))
+        failed = True
+    if error_rate > args.max_error_rate:
+        print(f"FAIL: {errors} of {args.warmup + args.requests} requests failed ({error_rate:.1%}), "
+              f"allowed {args.max_error_rate:.1%}")
+        failed = True
+    if failed:
+        sys.exit(1)
+    print(f"OK: RSS grew {growth_mb:.1f} MB over {args.requests} requests (budget {args.rss_budget_mb} MB), "
+          f"{errors} errors")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+import pytest
+
+from Pycram_ADs.ad_updater.resources.action_designators import *
+from Pycram_ADs.ad_updater.src.comment_intents import apply_patches, comment_candidate, extract_intent
+
+PICK_UP = PickUpAction(object_designator=Object(name='Cup', concept='Cup', color='blue'), arm=Arms.LEFT,
+                       grasp_description=GraspDescription(approach_direction=Grasp.TOP, vertical_alignment=Grasp.TOP,
+                                                          rotate_gripper=True))
+
+
+@pytest.mark.parametrize("comment, patches", [
+    ("pick up the yellow cup not the blue cup", {"object_designator.color": "yellow"}),
+    ("the yellow one", {"object_designator.color": "yellow"}),
+    ("no, use the right arm", {"arm": Arms.RIGHT}),
+    ("use the other hand", {"arm": Arms.RIGHT}),
+    ("grasp it from the front", {"grasp_description.approach_direction": Grasp.FRONT}),
+    ("grasp it from the bottom", {"grasp_description.vertical_alignment": Grasp.BOTTOM}),
+    ("use the right arm and grasp it from the back", {"arm": Arms.RIGHT,
+                                                      "grasp_description.approach_direction": Grasp.BACK}),
+])
+def test_comments_handled_locally(comment, patches):
+    intent = extract_intent(comment, PICK_UP)
+    assert intent.handled
+    assert intent.patches == patches
+
+
+def test_another_object_drops_its_color_and_pose():
+    intent = extract_intent("take the bowl instead", PICK_UP)
+    assert intent.handled
+    assert intent.patches["object_designator.concept"] == "Bowl"
+    assert intent.patches["object_designator.color"] is None
+
+
+def test_a_lone_color_that_names_an_object_is_the_object():
+    assert extract_intent("pick up the orange", PICK_UP).patches["object_designator.concept"] == "Fruit"
+
+
+@pytest.mark.parametrize("comment", [
+    "pick up the cup next to the bowl",
+    "take the cup out of the fridge",
+    "the cup near the sink",
+    "grab the cup behind the milk",
+    "the cup in front of the bowl",
+    "the cup on the table",
+])
+def test_relational_comments_go_to_the_llm(comment):
+    intent = extract_intent(comment, PICK_UP)
+    assert not intent.handled
+    assert comment_candidate(PICK_UP, comment) is None
+
+
+@pytest.mark.parametrize("comment", [
+    "use the left arm",
+    "the cup is slippery, be gentle",
+    "use the right arm and be gentle",
+    "take the thingamajig",
+])
+def test_repeated_or_unknown_parts_go_to_the_llm(comment):
+    assert not extract_intent(comment, PICK_UP).handled
+
+
+def test_comment_candidate_applies_the_patches():
+    candidate = comment_candidate(PICK_UP, "no, use the right arm")
+    assert candidate.designator == apply_patches(PICK_UP, {"arm": Arms.RIGHT})
+    assert candidate.rule == "comment_intent"
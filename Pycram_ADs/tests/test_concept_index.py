@@ -0,0 +1,56 @@
+import pytest
+
+from Pycram_ADs.ad_updater.resources.action_designators import *
+from Pycram_ADs.ad_updater.src.concept_index import FALLBACK_CONCEPT, concept_index, object_terms
+
+
+@pytest.mark.parametrize("term, concept", [
+    ("Cup", "Cup"),
+    ("cup", "Cup"),
+    ("mug", "Cup"),
+    ("cups", "Cup"),
+    ("fridge", "Refrigerator"),
+    ("milk bottle", "Milk"),
+    ("blue cup", "Cup"),
+    ("big plastic bowls", "Bowl"),
+    ("kitchen sink", "Sink"),
+    ("PhysicalObject", "PhysicalObject"),
+])
+def test_resolves_object_words(term, concept):
+    assert concept_index.resolve(term).concept == concept
+
+
+@pytest.mark.parametrize("phrase", [
+    "apple out of bowl",
+    "apple out of the bowl",
+    "cup next to bowl",
+    "cup but not bowl",
+    "cup out of fridge",
+    "milk behind cereal",
+])
+def test_relations_are_not_resolved_to_their_last_noun(phrase):
+    match = concept_index.resolve(phrase)
+    assert match is None or match.score < 0.6
+
+
+def test_top_k_ranks_mentioned_concepts_first_and_pads():
+    concepts = concept_index.top_k("put the mug into the fridge", k=4)
+    assert concepts[:2] == ["Cup", "Refrigerator"]
+    assert len(concepts) == 4
+
+
+def test_object_terms_leave_out_class_and_field_names():
+    designator = PlaceAction(object_designator=Object(name='Cup', concept='Cup', color='blue'),
+                             target_location=PoseStamped(), arm=Arms.LEFT)
+    assert object_terms(designator) == ["Cup", "Cup"]
+    assert concept_index.top_k(" ".join(object_terms(designator)), k=1) == ["Cup"]
+
+
+def test_repair_replaces_unknown_concepts():
+    model = PickUpAction(object_designator=Object(name='mug', concept='Mugs'), arm=Arms.LEFT,
+                         grasp_description=GraspDescription(approach_direction=Grasp.FRONT,
+                                                            vertical_alignment=None))
+    unknown = Object(name='thing', concept='Gizmo')
+    assert concept_index.repair(model) and model.object_designator.concept == "Cup"
+    concept_index.repair(unknown)
+    assert unknown.concept == FALLBACK_CONCEPT
@@ -0,0 +1,25 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def correction_examples(tmp_path, **env):
+    env = dict(os.environ, CORRECTION_HISTORY_PATH=str(tmp_path / "history.sqlite3"), CORRECTION_HISTORY_EMBEDDINGS="",
+               **env)
+    result = subprocess.run([sys.executable, "-c", "from Pycram_ADs.ad_updater.src import correction_history; "
+                                                   "print(correction_history.CORRECTION_EXAMPLES)"],
+                            cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+    return int(result.stdout.split()[-1])
+
+
+@pytest.mark.parametrize("mode", ["record", "replay"])
+def test_no_examples_while_a_cassette_is_used(tmp_path, mode):
+    assert correction_examples(tmp_path, LLM_CASSETTE_MODE=mode, CORRECTION_EXAMPLES="3") == 0
+
+
+def test_examples_without_a_cassette(tmp_path):
+    assert correction_examples(tmp_path, LLM_CASSETTE_MODE="", CORRECTION_EXAMPLES="3") == 3
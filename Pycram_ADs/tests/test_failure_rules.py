@@ -0,0 +1,86 @@
+import pytest
+
+from Pycram_ADs.ad_updater.resources.action_designators import *
+from Pycram_ADs.ad_updater.resources.failures import *
+from Pycram_ADs.ad_updater.src import failure_rules
+from Pycram_ADs.ad_updater.src.candidate_generator import OutcomeHistory, default_cost_model
+from Pycram_ADs.ad_updater.src.failure_rules import record_failed_request, rule_based_candidates
+
+CUP = Object(name='Cup', concept='Cup', color='blue')
+ROBOT = Object(name='robot', concept='Robot')
+POSE = PoseStamped(pose=Pose(position=Vector3(x=1.0, y=0.5, z=0.8)), header=Header(frame_id='map'))
+
+PICK_UP = PickUpAction(object_designator=CUP, arm=Arms.LEFT,
+                       grasp_description=GraspDescription(approach_direction=Grasp.FRONT, vertical_alignment=Grasp.TOP,
+                                                          rotate_gripper=False))
+NOT_GRASPED = ObjectNotGraspedError(obj=CUP, robot=ROBOT, arm=Arms.LEFT, grasp=Grasp.FRONT)
+PLACE = PlaceAction(object_designator=CUP, target_location=POSE, arm=Arms.LEFT)
+NOT_PLACED = ObjectNotPlacedAtTargetLocation(obj=CUP, placing_pose=POSE, robot=ROBOT, arm=Arms.LEFT)
+
+
+@pytest.fixture
+def history(monkeypatch):
+    history = OutcomeHistory()
+    monkeypatch.setattr(failure_rules, "outcome_history", history)
+    monkeypatch.setattr(default_cost_model, "history", history)
+    return history
+
+
+def test_grasp_failure_changes_the_grasp(history):
+    candidates = rule_based_candidates(PICK_UP, NOT_GRASPED)
+    assert candidates[0].rule == "rotate_approach"
+    assert {"switch_arm", "ranked_grasp_search"} <= {c.rule for c in candidates}
+    assert [c.score for c in candidates] == sorted((c.score for c in candidates), reverse=True)
+    assert PICK_UP not in [c.designator for c in candidates]
+    assert len({repr(c.designator) for c in candidates}) == len(candidates)
+
+
+def test_placing_failure_moves_the_target(history):
+    candidates = rule_based_candidates(PLACE, NOT_PLACED)
+    assert candidates
+    assert all(isinstance(c.designator, PlaceAction) for c in candidates)
+    assert POSE.position.to_list() not in [c.designator.target_location.position.to_list() for c in candidates]
+
+
+@pytest.mark.parametrize("designator, failure", [
+    (PICK_UP, "object was not grasped"),
+    (PICK_UP, ""),
+    (PLACE, NOT_GRASPED),
+])
+def test_unstructured_or_unmatched_failures_have_no_candidates(history, designator, failure):
+    assert rule_based_candidates(designator, failure) == []
+
+
+def test_ranking_does_not_record_the_failure(history):
+    rule_based_candidates(PICK_UP, NOT_GRASPED)
+    rule_based_candidates(PLACE, NOT_PLACED)
+    assert (history.grasp_failure_rate("Cup") == 0.5).all()
+    assert len(history.place_failures("Cup")) == 0
+
+
+def test_recorded_failure_is_counted_once(history):
+    record_failed_request(PICK_UP, NOT_GRASPED)
+    record_failed_request(PLACE, NOT_PLACED)
+    assert history.grasp_failure_rate("Cup").max() == pytest.approx(2 / 3)
+    assert history.place_failures("Cup").tolist() == [POSE.position.to_list()]
+
+
+def test_unstructured_failures_are_not_recorded(history):
+    record_failed_request(PICK_UP, "object was not grasped")
+    record_failed_request("not a designator", NOT_GRASPED)
+    assert (history.grasp_failure_rate("Cup") == 0.5).all()
+
+
+def test_failed_target_is_avoided_before_it_is_recorded(history):
+    offset_target = rule_based_candidates(PLACE, NOT_PLACED)[0].designator.target_location.position
+    assert abs(offset_target.x - POSE.position.x) + abs(offset_target.y - POSE.position.y) > 0
+
+
+def test_release_steps_are_only_plan_insertions(history):
+    still_in_contact = ObjectStillInContact(obj=CUP, placing_pose=POSE, robot=ROBOT, arm=Arms.LEFT,
+                                            contact_links=[Link(name='left_gripper_finger')])
+    assert rule_based_candidates(PLACE, still_in_contact) == []
+    candidates = rule_based_candidates(PLACE, still_in_contact, plan_insertions=True)
+    assert [c.rule for c in candidates] == ["open_gripper", "retract_arm"]
+    assert all(c.plan_insertion for c in candidates)
+    assert candidates[0].designator == SetGripperAction(gripper=Arms.LEFT, motion=GripperState.OPEN)
@@ -0,0 +1,75 @@
+import json
+import os
+import tempfile
+
+os.environ.setdefault("CORRECTION_HISTORY_PATH", os.path.join(tempfile.mkdtemp(), "correction_history.sqlite3"))
+os.environ.setdefault("CORRECTION_HISTORY_EMBEDDINGS", "")
+
+import pytest
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+from Pycram_ADs.ad_updater.src import graph
+from Pycram_ADs.ad_updater.src.correction_history import recording_paused
+from Pycram_ADs.ad_updater.src.incremental import session_scope
+from Pycram_ADs.ad_updater.src.llm_client import ServiceChatOllama
+
+DESIGNATOR = ("PickUpAction(object_designator=Object(name='Cup', concept='Cup', color='blue'), arm=Arms.LEFT, "
+              "grasp_description=GraspDescription(approach_direction=Grasp.TOP, vertical_alignment=Grasp.TOP, "
+              "rotate_gripper=True))")
+FAILURE = ("ObjectNotGraspedError(obj=Object(name='Cup', concept='Cup', color='blue'), "
+           "robot=Object(name='robot', concept='Robot'), arm=Arms.LEFT, grasp=Grasp.TOP)")
+
+ANSWERS = {
+    None: "<think>the grasp or the object is wrong</think> arm, object_designator.color",
+    "FailureSolution": {"failure_reasons": ["the cup slipped"], "solution": ["change the grasp"]},
+    "ParameterReasoner": {"updated_parameter_value": [{"arm": "Arms.RIGHT"}], "reason_parameter_value": ["comment"]},
+    "PickUpAction": {"object_designator": {"name": "Cup", "concept": "Cup", "color": "blue"}, "arm": 1,
+                     "grasp_description": {"approach_direction": "top", "vertical_alignment": "top",
+                                           "rotate_gripper": True}},
+}
+
+
+@pytest.fixture
+def llm_calls(monkeypatch):
+    calls = []
+
+    def call_backend(self, messages, stop=None, run_manager=None, **kwargs):
+        call_format = kwargs.get("format", self.format)
+        title = call_format.get("title") if isinstance(call_format, dict) else None
+        calls.append(title)
+        answer = ANSWERS[title]
+        content = answer if isinstance(answer, str) else json.dumps(answer)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=content))])
+
+    monkeypatch.setattr(ServiceChatOllama, "_call_backend", call_backend)
+    return calls
+
+
+def correct(comment, session_id):
+    with session_scope(session_id), recording_paused():
+        return graph.correct_designator(DESIGNATOR, FAILURE, comment)
+
+
+def test_follow_up_comment_reuses_the_diagnosis(llm_calls):
+    correct("use the other arm", "follow-up-session")
+    assert llm_calls.count("FailureSolution") == 1
+    assert llm_calls.count("ParameterReasoner") == 1
+
+    values = correct("the cup is slippery, grasp it from the side", "follow-up-session")
+    assert llm_calls.count("FailureSolution") == 1
+    assert llm_calls.count("ParameterReasoner") == 2
+    assert values["failure_reasons_solutions"]
+
+
+def test_without_a_session_every_request_is_diagnosed(llm_calls):
+    correct("use the other arm", None)
+    correct("grasp it from the side", None)
+    assert llm_calls.count("FailureSolution") == 2
+
+
+def test_another_failure_is_diagnosed_again(llm_calls):
+    correct("use the other arm", "other-failure-session")
+    with session_scope("other-failure-session"), recording_paused():
+        graph.correct_designator(DESIGNATOR, "object slipped out of the gripper", "use the other arm")
+    assert llm_calls.count("FailureSolution") == 2
@@ -0,0 +1,89 @@
+import json
+import math
+
+import numpy as np
+import pytest
+
+from Pycram_ADs.ad_updater.resources.action_designators import *
+from Pycram_ADs.ad_updater.src.frame_transforms import TransformTree, UnknownTransform, load_transforms
+from Pycram_ADs.ad_updater.src.pose_geometry import pose_changes, same_position
+
+YAW_90 = [0.0, 0.0, math.sqrt(0.5), math.sqrt(0.5)]
+
+
+def stamped(x, y, z, frame="map"):
+    return PoseStamped(pose=Pose(position=Vector3(x=x, y=y, z=z)), header=Header(frame_id=frame))
+
+
+@pytest.fixture
+def tree():
+    # A table in the map and a tray on the table, rotated by 90 degrees
+    tree = TransformTree(max_entries=8)
+    tree.add_transform("table", "map", [2.0, 1.0, 0.8])
+    tree.add_transform("tray", "table", [0.5, 0.0, 0.0], YAW_90)
+    tree.add_transform("shelf", "room", [0.0, 0.0, 1.0])
+    return tree
+
+
+def test_chains_are_composed_and_inverted(tree):
+    pose, = tree.transform_poses([stamped(1.0, 0.0, 0.0, frame="tray")], "map")
+    assert pose.header.frame_id == "map"
+    assert np.allclose(pose.position.to_list(), [2.5, 2.0, 0.8])
+    back, = tree.transform_poses([pose], "tray")
+    assert np.allclose(back.position.to_list(), [1.0, 0.0, 0.0])
+
+
+def test_poses_already_in_the_target_frame_are_kept(tree):
+    pose = stamped(1.0, 2.0, 3.0)
+    model = PoseStampedModel(position=[1.0, 2.0, 3.0])
+    assert tree.transform_poses([pose, model], "map") == [pose, model]
+
+
+def test_unconnected_frames(tree):
+    with pytest.raises(UnknownTransform):
+        tree.transform_poses([stamped(0.0, 0.0, 0.0, frame="shelf")], "map")
+    _, _, known = tree.transform_arrays(np.zeros((2, 3)), np.tile([0.0, 0.0, 0.0, 1.0], (2, 1)), ["shelf", "table"],
+                                        ["map", "map"])
+    assert known.tolist() == [False, True]
+
+
+def test_cycles_are_unknown_transforms():
+    tree = TransformTree()
+    tree.add_transform("a", "b", [0.0, 0.0, 0.0])
+    tree.add_transform("b", "a", [0.0, 0.0, 0.0])
+    with pytest.raises(UnknownTransform):
+        tree.lookup("a", "map")
+
+
+def test_the_same_place_in_two_frames_is_unchanged(tree):
+    change, = pose_changes([stamped(2.0, 1.0, 0.8)], [stamped(0.0, 0.0, 0.0, frame="table")], transforms=tree)
+    assert change.comparable and not change.changed
+    assert same_position(stamped(2.5, 1.0, 0.8), stamped(0.0, 0.0, 0.0, frame="tray"), transforms=tree)
+
+
+def test_lookups_are_cached_and_reset_by_new_transforms(tree):
+    tree.lookup("tray", "map")
+    tree.lookup("tray", "map")
+    assert (tree.stats()["hits"], tree.stats()["misses"]) == (1, 1)
+    tree.add_transform("table", "map", [3.0, 1.0, 0.8])
+    position, _ = tree.lookup("tray", "map")
+    assert np.allclose(position, [3.5, 1.0, 0.8])
+    assert tree.stats()["misses"] == 2
+
+
+def test_cache_is_bounded():
+    tree = TransformTree(max_entries=2)
+    for i in range(4):
+        tree.add_transform(f"f{i}", "map", [float(i), 0.0, 0.0])
+    for i in range(4):
+        tree.lookup(f"f{i}", "map")
+    assert tree.stats()["cached_chains"] == 2
+    assert tree.stats()["evicted"] == 2
+
+
+def test_load_transforms(tmp_path):
+    path = tmp_path / "frames.json"
+    path.write_text(json.dumps({"table": {"parent": "map", "position": [2.0, 1.0, 0.8]}}))
+    tree = load_transforms(str(path))
+    assert tree.frames() == ["map", "table"]
+    assert load_transforms(str(tmp_path / "missing.json")).frames() == []
@@ -0,0 +1,25 @@
+import pytest
+
+from Pycram_ADs.ad_updater.src.instruction_cache import normalize_instruction
+
+
+@pytest.mark.parametrize("a, b", [
+    ("Pick up the cup from the table.", "pick the cup from the table"),
+    ("Could you please pick up the cup?", "pick up the cup"),
+    ("Robot, could you open the drawer", "open the drawer"),
+    ("Picked the red cup", "pick the red cup"),
+])
+def test_equivalent_instructions_share_a_key(a, b):
+    assert normalize_instruction(a) == normalize_instruction(b)
+
+
+@pytest.mark.parametrize("a, b", [
+    ("put the can in the fridge", "put this in the fridge"),
+    ("put this in the fridge", "put that in the fridge"),
+    ("put the can in the fridge", "put in the fridge"),
+    ("open the can", "open that"),
+    ("pick up the cup for me", "pick up the cup"),
+    ("can you open it", "open the can"),
+])
+def test_different_instructions_do_not_collide(a, b):
+    assert normalize_instruction(a) != normalize_instruction(b)
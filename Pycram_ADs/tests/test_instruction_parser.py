@@ -0,0 +1,63 @@
+import pytest
+
+from Pycram_ADs.ad_updater.resources.action_designators import *
+from Pycram_ADs.ad_updater.src.instruction_parser import MIN_CONFIDENCE, InstructionParser
+
+
+@pytest.fixture
+def parser():
+    return InstructionParser(locations={"kitchen": PoseStampedModel(position=[1.0, 2.0, 0.0])})
+
+
+def test_pick_up_with_color_surface_and_grasp(parser):
+    result = parser.parse("Pick up the blue cup from the table with the right arm from the top")
+    pick, = result.actions.models
+    assert isinstance(pick, PickUpAction)
+    assert (pick.object_designator.name, pick.object_designator.concept, pick.object_designator.color) == \
+           ("cup", "Cup", "blue")
+    assert pick.arm == Arms.RIGHT
+    assert pick.grasp_description.vertical_alignment == Grasp.TOP
+    assert result.confidence >= MIN_CONFIDENCE
+
+
+def test_it_and_the_arm_carry_over_to_the_next_clause(parser):
+    pick, place = parser.parse("pick up the cup with the right arm and place it on the table").actions.models
+    assert place.object_designator == pick.object_designator
+    assert place.arm == pick.arm == Arms.RIGHT
+    assert place.target_location.header.frame_id == "table"
+
+
+def test_lone_color_word_that_names_an_object(parser):
+    pick, = parser.parse("pick up the orange").actions.models
+    assert pick.object_designator.concept == "Fruit"
+    assert pick.object_designator.color is None
+
+
+def test_open_and_navigate(parser):
+    open_action, navigate = parser.parse("open the fridge then go to the kitchen").actions.models
+    assert open_action.object_designator.concept == "Refrigerator"
+    assert navigate.target_location.position == [1.0, 2.0, 0.0]
+    navigate, = parser.parse("go to 1.5 2").actions.models
+    assert navigate.target_location.position == [1.5, 2.0, 0.0]
+
+
+@pytest.mark.parametrize("instruction", [
+    "take the apple out of the bowl",
+    "pick up the cup but not the bowl",
+    "get me the milk",
+    "put the cup next to the bowl on the table",
+    "pick up the cup near the sink",
+    "grab the milk behind the cereal",
+])
+def test_relations_negations_and_pronouns_go_to_the_llm(parser, instruction):
+    assert parser.parse_confident(instruction) is None
+
+
+@pytest.mark.parametrize("instruction", [
+    "make me a sandwich",
+    "pick up the thingamajig",
+    "place it on the table",
+    "go to the moon",
+])
+def test_unsupported_shapes_go_to_the_llm(parser, instruction):
+    assert parser.parse_confident(instruction) is None
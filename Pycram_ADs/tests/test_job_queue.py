@@ -0,0 +1,95 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+
+from Pycram_ADs.ad_updater.src.job_queue import JobQueue
+
+
+@pytest.fixture
+def callbacks():
+    received = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            received.append((self.path, json.loads(self.rfile.read(int(self.headers["Content-Length"])))))
+            if self.path == "/redirect":
+                self.send_response(307)
+                self.send_header("Location", f"http://localhost:{self.server.server_port}/internal")
+            else:
+                self.send_response(200)
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}", received
+    server.shutdown()
+
+
+def make_queue(tmp_path, **kwargs):
+    return JobQueue(str(tmp_path / "jobs.sqlite3"), handler=lambda payload: {"echo": payload}, poll_interval=0.05,
+                    **kwargs)
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.02)
+    return condition()
+
+
+@pytest.mark.parametrize("callback_url", [
+    "http://169.254.169.254/latest/meta-data",
+    "file:///etc/passwd",
+    "gopher://127.0.0.1:6379/_FLUSHALL",
+    "http://127.0.0.1.evil.example/",
+    "not a url",
+])
+def test_callbacks_outside_the_allowlist_are_rejected(tmp_path, callback_url):
+    queue = make_queue(tmp_path, callback_hosts=["127.0.0.1", "*.lab.local"])
+    with pytest.raises(ValueError):
+        queue.submit({"instruction": "pick up the cup"}, callback_url=callback_url)
+    assert queue.stats().get("queued") is None
+
+
+def test_no_callbacks_without_an_allowlist(tmp_path):
+    with pytest.raises(ValueError):
+        make_queue(tmp_path).submit({"instruction": "pick up the cup"}, callback_url="http://127.0.0.1/done")
+
+
+def test_wildcard_hosts(tmp_path):
+    queue = make_queue(tmp_path, callback_hosts=["*.lab.local"])
+    queue.check_callback_url("https://robot-1.lab.local:8443/jobs")
+
+
+def test_finished_job_is_posted_to_an_allowed_callback(tmp_path, callbacks):
+    base_url, received = callbacks
+    queue = make_queue(tmp_path, callback_hosts=["127.0.0.1"])
+    job_id = queue.submit({"instruction": "pick up the cup"}, callback_url=f"{base_url}/done")
+    queue.start()
+    try:
+        assert wait_for(lambda: received)
+    finally:
+        queue.stop()
+    path, job = received[0]
+    assert path == "/done"
+    assert (job["job_id"], job["status"]) == (job_id, "done")
+    assert job["result"] == {"echo": {"instruction": "pick up the cup"}}
+
+
+def test_callback_redirects_are_not_followed(tmp_path, callbacks):
+    base_url, received = callbacks
+    queue = make_queue(tmp_path, callback_hosts=["127.0.0.1"])
+    queue.submit({"instruction": "pick up the cup"}, callback_url=f"{base_url}/redirect")
+    queue.start()
+    try:
+        assert wait_for(lambda: queue.stats().get("done") == 1)
+        time.sleep(0.2)
+    finally:
+        queue.stop()
+    assert [path for path, _ in received] == ["/redirect"]
@@ -0,0 +1,81 @@
+import pytest
+
+from Pycram_ADs.ad_updater.resources.action_designators import *
+from Pycram_ADs.ad_updater.src import plan_graph
+from Pycram_ADs.ad_updater.src.frame_transforms import TransformTree
+from Pycram_ADs.ad_updater.src.plan_graph import plan_changes, plan_grapher
+
+CUP = Object(name='Cup', concept='Cup', color='blue')
+BOWL = Object(name='Bowl', concept='Bowl')
+GRASP = GraspDescription(approach_direction=Grasp.FRONT, vertical_alignment=Grasp.TOP, rotate_gripper=False)
+TARGET = PoseStamped(pose=Pose(position=Vector3(x=2.0, y=1.0, z=0.8)), header=Header(frame_id='map'))
+
+PICK_UP = PickUpAction(object_designator=CUP, arm=Arms.LEFT, grasp_description=GRASP)
+PLAN = [
+    PICK_UP,
+    NavigateAction(target_location=PoseStampedModel(position=[2.0, 1.0, 0.8])),
+    PlaceAction(object_designator=CUP, target_location=TARGET, arm=Arms.LEFT),
+    PickUpAction(object_designator=BOWL, arm=Arms.LEFT, grasp_description=GRASP),
+]
+
+
+def correct_plan(plan, failed_index, corrected, insert_after_failed=False):
+    return plan_grapher.invoke({"plan": plan, "failed_index": failed_index, "reason_for_failure": "",
+                                "human_comment": "", "updated_action_designator": corrected,
+                                "insert_after_failed": insert_after_failed})
+
+
+def test_arm_and_object_changes_follow_the_object():
+    corrected = PICK_UP.model_copy(update={"arm": Arms.RIGHT, "object_designator": CUP.model_copy(
+        update={"color": "yellow"})})
+    state = correct_plan(PLAN, 0, corrected)
+    updated = state["updated_plan"]
+    assert updated[0] == corrected
+    assert updated[2].arm == Arms.RIGHT
+    assert updated[2].object_designator.color == "yellow"
+    # Another object keeps its arm
+    assert updated[3] == PLAN[3]
+    assert [change["index"] for change in state["propagated_changes"]] == [2]
+
+
+def test_pose_changes_follow_the_poses_that_had_the_old_value():
+    plan = [PLAN[2], PLAN[1]]
+    moved = TARGET.model_copy(update={"pose": Pose(position=Vector3(x=2.1, y=1.0, z=0.8))})
+    state = correct_plan(plan, 0, PLAN[2].model_copy(update={"target_location": moved}))
+    navigate = state["updated_plan"][1]
+    # The step keeps its own pose type
+    assert isinstance(navigate.target_location, PoseStampedModel)
+    assert navigate.target_location.position == [2.1, 1.0, 0.8]
+
+
+def test_pose_in_another_frame_is_matched_and_keeps_its_frame(monkeypatch):
+    tree = TransformTree()
+    tree.add_transform("table", "map", [2.0, 1.0, 0.8])
+    monkeypatch.setattr(plan_graph, "transform_tree", tree)
+    on_table = PoseStamped(pose=Pose(position=Vector3(x=0.0, y=0.0, z=0.0)), header=Header(frame_id='table'))
+    plan = [PLAN[2], PlaceAction(object_designator=BOWL, target_location=on_table, arm=Arms.RIGHT)]
+    moved = TARGET.model_copy(update={"pose": Pose(position=Vector3(x=2.1, y=1.0, z=0.8))})
+    later = correct_plan(plan, 0, PLAN[2].model_copy(update={"target_location": moved}))["updated_plan"][1]
+    assert later.target_location.header.frame_id == "table"
+    assert later.target_location.position.to_list() == pytest.approx([0.1, 0.0, 0.0])
+
+
+def test_unchanged_correction_propagates_nothing():
+    state = correct_plan(PLAN, 0, PICK_UP)
+    assert state["updated_plan"] == PLAN
+    assert state["propagated_changes"] == []
+    assert plan_changes(PICK_UP, PICK_UP) == {}
+
+
+def test_earlier_steps_are_kept():
+    corrected = PLAN[2].model_copy(update={"arm": Arms.RIGHT})
+    state = correct_plan(PLAN, 2, corrected)
+    assert state["updated_plan"][:2] == PLAN[:2]
+    assert state["updated_plan"][2] == corrected
+
+
+def test_inserted_step_goes_after_the_failed_one():
+    open_gripper = SetGripperAction(gripper=Arms.LEFT, motion=GripperState.OPEN)
+    state = correct_plan(PLAN, 2, open_gripper, insert_after_failed=True)
+    assert state["updated_plan"] == PLAN[:3] + [open_gripper] + PLAN[3:]
+    assert state["propagated_changes"] == []
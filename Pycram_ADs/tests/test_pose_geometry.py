@@ -0,0 +1,83 @@
+import math
+
+import numpy as np
+import pytest
+
+from Pycram_ADs.ad_updater.resources.action_designators import *
+from Pycram_ADs.ad_updater.src.pose_geometry import (IDENTITY, angular_errors, check_updated_poses, compose_poses,
+                                                     invert_poses, multiply_quaternions, normalize_quaternions,
+                                                     pose_changes, poses_to_arrays, rotate_vectors, same_position,
+                                                     valid_poses)
+
+# 90 degrees about z
+YAW_90 = np.array([0.0, 0.0, math.sqrt(0.5), math.sqrt(0.5)])
+
+
+def stamped(x, y, z, orientation=(0, 0, 0, 1), frame="map"):
+    return PoseStamped(pose=Pose(position=Vector3(x=x, y=y, z=z),
+                                 orientation=Quaternion(**dict(zip("xyzw", orientation)))),
+                       header=Header(frame_id=frame))
+
+
+def test_mixed_pose_types_become_rows():
+    positions, orientations = poses_to_arrays([stamped(1, 2, 3), Pose(position=Vector3(x=4, y=5, z=6)),
+                                               PoseStampedModel(position=[7.0, 8.0, 9.0])])
+    assert positions.tolist() == [[1, 2, 3], [4, 5, 6], [7, 8, 9]]
+    assert orientations.tolist() == [IDENTITY.tolist()] * 3
+
+
+def test_rotation_and_composition():
+    assert np.allclose(rotate_vectors(YAW_90, [1.0, 0.0, 0.0]), [0.0, 1.0, 0.0])
+    assert np.allclose(multiply_quaternions(YAW_90, YAW_90), [0.0, 0.0, 1.0, 0.0])
+    positions, orientations = compose_poses([1.0, 0.0, 0.0], YAW_90, [1.0, 0.0, 0.0], IDENTITY)
+    assert np.allclose(positions, [1.0, 1.0, 0.0])
+    assert np.allclose(orientations, YAW_90)
+
+
+def test_inverse_composes_to_the_identity():
+    position, orientation = np.array([1.0, -2.0, 0.5]), YAW_90
+    positions, orientations = compose_poses(*invert_poses(position, orientation), position, orientation)
+    assert np.allclose(positions, 0.0)
+    assert np.allclose(orientations, IDENTITY)
+
+
+def test_q_and_minus_q_are_the_same_rotation():
+    assert angular_errors(YAW_90, -YAW_90) == pytest.approx(0.0, abs=1e-6)
+    assert angular_errors(IDENTITY, YAW_90) == pytest.approx(math.pi / 2)
+
+
+def test_undefined_and_non_finite_orientations():
+    assert normalize_quaternions([0.0, 0.0, 0.0, 0.0]).tolist() == IDENTITY.tolist()
+    positions, orientations = poses_to_arrays([stamped(0, 0, 0, (0, 0, 0, 0)), stamped(math.nan, 0, 0),
+                                               PoseStampedModel(position=[1.0, 2.0]), stamped(0, 0, 0, (0, 0, 0, 2))])
+    assert valid_poses(positions, orientations).tolist() == [False, False, False, True]
+
+
+def test_pose_changes_use_distance_and_angle_thresholds():
+    original = [stamped(1, 0, 0)] * 3
+    updated = [stamped(1.001, 0, 0), stamped(1.1, 0, 0), stamped(1, 0, 0, YAW_90)]
+    assert [change.changed for change in pose_changes(original, updated)] == [False, True, True]
+
+
+def test_poses_in_other_frames_are_not_comparable_without_transforms():
+    change, = pose_changes([stamped(1, 0, 0)], [stamped(1, 0, 0, frame="table")])
+    assert change.changed and not change.comparable
+    assert math.isnan(change.distance)
+    assert not same_position(stamped(1, 0, 0), stamped(1, 0, 0, frame="table"))
+
+
+def test_check_updated_poses():
+    original = PlaceAction(object_designator=Object(name='Cup', concept='Cup'), target_location=stamped(1, 0, 0),
+                           arm=Arms.LEFT)
+    checked, problems = check_updated_poses(original, original.model_copy(
+        update={"target_location": stamped(2, 0, 0, (0, 0, 0, 2))}))
+    assert problems == {}
+    assert checked.target_location.orientation.to_list() == [0, 0, 0, 1]
+
+    checked, problems = check_updated_poses(original, original.model_copy(
+        update={"target_location": stamped(math.nan, 0, 0)}))
+    assert problems == {"target_location": "invalid pose, kept the original"}
+    assert checked.target_location == original.target_location
+
+    _, problems = check_updated_poses(original, original)
+    assert problems == {"target_location": "unchanged"}
@@ -0,0 +1,37 @@
+from Pycram_ADs.ad_updater.src.warmup import Readiness
+
+
+def ok():
+    pass
+
+
+def fail():
+    raise RuntimeError("model call failed")
+
+
+def run(steps):
+    readiness = Readiness()
+    readiness.run(steps)
+    return readiness
+
+
+def test_ready_when_a_canned_request_succeeds():
+    readiness = run([("load", ok, True), ("correction request", fail, False), ("instruction request", ok, False)])
+    assert readiness.ready
+    assert [step["ok"] for step in readiness.snapshot()["steps"]] == [True, False, True]
+
+
+def test_not_ready_when_every_canned_request_fails():
+    readiness = run([("load", ok, True), ("correction request", fail, False), ("instruction request", fail, False)])
+    assert not readiness.ready
+    assert readiness.snapshot()["state"] == "failed"
+
+
+def test_not_ready_when_a_required_step_fails():
+    readiness = run([("load", fail, True), ("correction request", ok, False)])
+    assert readiness.snapshot()["state"] == "failed"
+    assert len(readiness.snapshot()["steps"]) == 1
+
+
+def test_ready_without_canned_requests():
+    assert run([("load", ok, True)]).ready
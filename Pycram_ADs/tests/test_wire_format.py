@@ -0,0 +1,73 @@
+import pytest
+
+from Pycram_ADs.ad_updater.resources.action_designators import *
+from Pycram_ADs.ad_updater.resources.failures import *
+from Pycram_ADs.ad_updater.src.wire_format import FAILURE_TYPES, designator_from_json, designator_to_json
+
+CUP = Object(name='Cup', concept='Cup', color='blue')
+ROBOT = Object(name='robot', concept='Robot')
+POSE = PoseStamped(pose=Pose(position=Vector3(x=1.0, y=0.5, z=0.8)), header=Header(frame_id='map'))
+
+FAILURES = [
+    ObjectNotGraspedError(obj=CUP, robot=ROBOT, arm=Arms.LEFT, grasp=Grasp.TOP),
+    ObjectNotGraspedError(obj=CUP, robot=ROBOT, arm=Arms.RIGHT),
+    ObjectStillInContact(obj=CUP, placing_pose=POSE, robot=ROBOT, arm=Arms.LEFT,
+                         contact_links=[Link(name='left_gripper_finger')]),
+    ObjectNotPlacedAtTargetLocation(obj=CUP, placing_pose=POSE, robot=ROBOT, arm=Arms.RIGHT),
+]
+
+
+def test_every_failure_type_is_covered():
+    assert {type(failure).__name__ for failure in FAILURES} == set(FAILURE_TYPES)
+
+
+@pytest.mark.parametrize("failure", FAILURES, ids=lambda f: f.message)
+def test_failure_round_trip(failure):
+    decoded = designator_from_json(designator_to_json(failure))
+    assert type(decoded) is type(failure)
+    assert decoded == failure
+
+
+@pytest.mark.parametrize("failure", FAILURES, ids=lambda f: f.message)
+def test_failure_message_is_built_from_typed_values(failure):
+    data = designator_to_json(failure)
+    data.pop('message', None)
+    assert designator_from_json(data).message == failure.message
+
+
+def test_client_message_is_replaced():
+    data = designator_to_json(FAILURES[0])
+    data['message'] = "object {'name': 'Cup'} was not grasped by 0 arm"
+    assert designator_from_json(data).message == FAILURES[0].message
+
+
+@pytest.mark.parametrize("change", [{'grasp': 'sideways'}, {'arm': 'left'}, {'obj': None}, {'robot': 'robot'}])
+def test_invalid_failure_raises_value_error(change):
+    data = {**designator_to_json(FAILURES[0]), **change}
+    with pytest.raises(ValueError):
+        designator_from_json(data)
+
+
+def test_missing_required_field_raises_value_error():
+    data = designator_to_json(FAILURES[2])
+    data.pop('placing_pose')
+    with pytest.raises(ValueError):
+        designator_from_json(data)
+
+
+@pytest.mark.parametrize("designator", [
+    PickUpAction(object_designator=CUP, arm=Arms.LEFT,
+                 grasp_description=GraspDescription(approach_direction=Grasp.TOP, vertical_alignment=Grasp.TOP,
+                                                    rotate_gripper=True)),
+    PlaceAction(object_designator=CUP, target_location=POSE, arm=Arms.RIGHT),
+    ParkArmsAction(arm=Arms.BOTH),
+])
+def test_action_round_trip(designator):
+    assert designator_from_json(designator_to_json(designator)) == designator
+
+
+def test_unknown_types_raise_value_error():
+    with pytest.raises(ValueError):
+        designator_from_json({'action_type': 'FlyAction'})
+    with pytest.raises(ValueError):
+        designator_from_json({'failure_type': 'RobotTired'})
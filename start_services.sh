@@ -2,9 +2,16 @@
 
 echo "Starting Ollama service..."
 
-python3 -m ad_updater.main &
-
 # Start Ollama in the background
 ollama serve &
 
-wait -n
\ No newline at end of file
+# The service warms up against Ollama at startup, so only start it once Ollama answers
+until ollama list > /dev/null 2>&1; do
+    sleep 1
+done
+
+echo "Starting PyCRAM designator service..."
+
+python3 -m ad_updater.main &
+
+wait -n